@@ -3,141 +3,32 @@
  * Enables offline play and auto-updates
  * 
  * Features:
- * - Caches all game assets for offline use
+ * - Precaches the hub from precache-manifest.json (tools/build_precache.py)
+ * - Precaches a game's files the first time it is opened
+ * - Delta updates: only files whose content hash changed are re-downloaded
  * - Network-first for Supabase (sync when online)
  * - Cache-first for game files (fast offline loading)
  * - Auto-updates when new version is deployed
  */
 
-const CACHE_VERSION = 'v1.6.0';
-const CACHE_NAME = `noyola-games-${CACHE_VERSION}`;
+const CACHE_VERSION = 'v1.7.0';
+// Written by tools/build_precache.py; changes whenever any precached file changes
+const PRECACHE_VERSION = 'ad5f322bf214';
+// Stable names: updates patch the cache in place instead of starting a new one
+const CACHE_NAME = 'noyola-games-assets';
+const META_CACHE = 'noyola-games-precache-meta';
+const MANIFEST_URL = '/precache-manifest.json';
+const STATE_KEY = '/__precache-state__';
+const MANIFEST_KEY = '/__precache-manifest__';
+const DOWNLOAD_CONCURRENCY = 6;
 const DEV_BYPASS_CACHE = self.location.hostname === 'localhost' || self.location.hostname === '127.0.0.1';
 
-// Critical files that MUST be cached for offline play
-const CRITICAL_ASSETS = [
-  // Root
+// Precached on install when precache-manifest.json can't be fetched
+const FALLBACK_ASSETS = [
   '/',
   '/index.html',
   '/manifest.json',
-  
-  // Shared Core Scripts
-  '/shared/lumina-core.js',
-  '/shared/lumina-cloud.js',
-  '/shared/supabase-config.js',
-  
-  // Shared Hub Scripts
-  '/shared/scripts/hub-config.js',
-  '/shared/scripts/hub-theme.js',
-  '/shared/scripts/hub-ui.js',
-  '/shared/scripts/hub-games.js',
-  '/shared/scripts/hub-modals.js',
-  '/shared/scripts/hub-tutorial.js',
-  '/shared/scripts/hub-init.js',
-  
-  // Shared Hub Styles
-  '/shared/styles/hub-themes.css',
-  '/shared/styles/hub-base.css',
-  '/shared/styles/hub-animations.css',
-  '/shared/styles/hub-layout.css',
-  '/shared/styles/hub-components.css',
-  
-  // Profile Images
-  '/assets/emma_profile.png',
-  '/assets/liam_profile.png',
-  '/assets/guest-avatar.svg',
-  '/assets/mario_step_profile.png',
-  '/assets/adriana_terra_profile.png',
-  '/assets/noyola_hub_animated.mp4',
-  
-  // === SPELL SIEGE ===
-  '/spell-siege/index.html',
-  '/spell-siege/styles/game-base.css',
-  '/spell-siege/scripts/game-config.js',
-  '/spell-siege/scripts/game-audio.js',
-  '/spell-siege/scripts/game-speech.js',
-  '/spell-siege/scripts/game-main.js',
-  '/spell-siege/scripts/game-init.js',
-  
-  // === CANADA ADVENTURE ===
-  '/canada-adventure/index.html',
-  '/canada-adventure/styles/game-base.css',
-  '/canada-adventure/scripts/game-data.js',
-  '/canada-adventure/scripts/game-sprites.js',
-  '/canada-adventure/scripts/game-components.js',
-  '/canada-adventure/scripts/game-audio.js',
-  '/canada-adventure/scripts/game-main.js',
-  '/canada-adventure/scripts/game-init.js',
-  
-  // === LUMINA RACER ===
-  '/lumina-racer/index.html',
-  '/lumina-racer/styles/game-base.css',
-  '/lumina-racer/scripts/game-config.js',
-  '/lumina-racer/scripts/game-speech.js',
-  '/lumina-racer/scripts/game-main.js',
-  '/lumina-racer/scripts/game-init.js',
-  '/lumina-racer/scripts/game-audio.js',
-  
-  // === WORD FORGE ===
-  '/word-forge/index.html',
-  '/word-forge/styles/game-base.css',
-  '/word-forge/scripts/game-config.js',
-  '/word-forge/scripts/game-components.js',
-  '/word-forge/scripts/game-main.js',
-  '/word-forge/scripts/game-init.js',
-  '/word-forge/scripts/game-audio.js',
-  
-  // === MATH QUEST ===
-  '/math-quest/index.html',
-  '/math-quest/styles/game-base.css',
-  '/math-quest/scripts/game-config.js',
-  '/math-quest/scripts/game-audio.js',
-  '/math-quest/scripts/game-juice.js',
-  '/math-quest/scripts/game-main.js',
-  '/math-quest/scripts/game-init.js',
-  
-  // === PIXEL QUEST ===
-  '/pixel-quest/index.html',
-  '/pixel-quest/styles/game-base.css',
-  '/pixel-quest/scripts/game-config.js',
-  '/pixel-quest/scripts/game-audio.js',
-  '/pixel-quest/scripts/game-juice.js',
-  '/pixel-quest/scripts/game-physics.js',
-  '/pixel-quest/scripts/game-main.js',
-  '/pixel-quest/scripts/game-init.js',
-  
-  // === RHYTHM ACADEMY ===
-  '/rhythm-academy/index.html',
-  '/rhythm-academy/styles/game-base.css',
-  '/rhythm-academy/scripts/game-config.js',
-  '/rhythm-academy/scripts/game-audio.js',
-  '/rhythm-academy/scripts/game-juice.js',
-  '/rhythm-academy/scripts/game-rhythm.js',
-  '/rhythm-academy/scripts/game-main.js',
-  '/rhythm-academy/scripts/game-init.js',
-  
-  // === PIANO PATH ===
-  '/piano-path/index.html',
-  '/piano-path/styles/game-base.css',
-  '/piano-path/scripts/game-config.js',
-  '/piano-path/scripts/game-audio.js',
-  '/piano-path/scripts/game-main.js',
-  '/piano-path/scripts/game-init.js',
-  
-  // === SHADOWS IN THE HALLS ===
-  '/shadows-in-the-halls/index.html',
-  '/shadows-in-the-halls/styles/game-base.css',
-  '/shadows-in-the-halls/scripts/game-config.js',
-  '/shadows-in-the-halls/scripts/game-audio.js',
-  '/shadows-in-the-halls/scripts/game-components.js',
-  '/shadows-in-the-halls/scripts/game-main.js',
-  '/shadows-in-the-halls/scripts/game-init.js',
-
-  // === 99 NIGHTS IN SPACE ===
-  '/99-nights-in-space/index.html',
-  '/99-nights-in-space/styles/game-base.css',
-  '/99-nights-in-space/scripts/game-config.js',
-  '/99-nights-in-space/scripts/game-main.js',
-  '/99-nights-in-space/scripts/game-init.js',
+  '/offline.html',
 ];
 
 // Audio files (cached on-demand to avoid long initial load)
@@ -163,16 +54,177 @@ const ASSET_PREFIXES = [
 ];
 
 /**
- * Install Event: Cache critical assets
+ * Precache state, kept in META_CACHE:
+ * - state: { files: { url: hash }, games: [gameId, ...] } for what CACHE_NAME holds
+ * - manifest: the last precache-manifest.json, so games can be precached offline-first
+ */
+function readJson(key) {
+  return caches.open(META_CACHE)
+    .then((cache) => cache.match(key))
+    .then((response) => (response ? response.json() : null));
+}
+
+function writeJson(key, value) {
+  return caches.open(META_CACHE).then((cache) => cache.put(key, new Response(JSON.stringify(value), {
+    headers: { 'Content-Type': 'application/json' }
+  })));
+}
+
+function loadState() {
+  return readJson(STATE_KEY).then((state) => state || { files: {}, games: [] });
+}
+
+// Install and lazy game precaching both rewrite the state; run them one at a time
+let stateLock = Promise.resolve();
+function withStateLock(task) {
+  const run = stateLock.then(task, task);
+  stateLock = run.catch(() => {});
+  return run;
+}
+
+/**
+ * Download entries ({ url: [hash, size] }) into the cache, DOWNLOAD_CONCURRENCY at a time.
+ * Records each successful download's hash in state.files; failures are retried next sync.
+ */
+function downloadEntries(cache, state, entries) {
+  const urls = Object.keys(entries);
+  let next = 0;
+  let failed = 0;
+
+  function worker() {
+    if (next >= urls.length) {
+      return Promise.resolve();
+    }
+    const url = urls[next++];
+    return fetch(url, { cache: 'reload' })
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error('HTTP ' + response.status);
+        }
+        return cache.put(url, response);
+      })
+      .then(() => {
+        state.files[url] = entries[url][0];
+      })
+      .catch((error) => {
+        failed++;
+        console.warn('⚠️ Service Worker: Could not precache', url, error);
+      })
+      .then(worker);
+  }
+
+  const workers = [];
+  for (let i = 0; i < Math.min(DOWNLOAD_CONCURRENCY, urls.length); i++) {
+    workers.push(worker());
+  }
+  return Promise.all(workers).then(() => failed);
+}
+
+/**
+ * Bring the cache in line with the manifest: download changed files for the core and
+ * every game already precached, and drop cached copies that are stale or no longer deployed.
+ */
+function syncPrecache(manifest, extraGames) {
+  return withStateLock(() => caches.open(CACHE_NAME)
+    .then((cache) => Promise.all([cache, loadState(), cache.keys()]))
+    .then(([cache, state, cachedRequests]) => {
+      const games = state.games.concat(extraGames || []).filter((game, i, all) => manifest.games[game] && all.indexOf(game) === i);
+      const deployed = Object.assign({}, manifest.core);
+      games.forEach((game) => Object.assign(deployed, manifest.games[game].files));
+      const everything = Object.assign({}, deployed);
+      Object.values(manifest.games).forEach((group) => Object.assign(everything, group.files));
+
+      const changed = {};
+      Object.keys(deployed).forEach((url) => {
+        if (state.files[url] !== deployed[url][0]) {
+          changed[url] = deployed[url];
+        }
+      });
+
+      // Cached copies (including on-demand ones) whose content is no longer what is deployed
+      const removals = [];
+      cachedRequests.forEach((request) => {
+        const url = new URL(request.url);
+        if (url.origin !== self.location.origin || changed[url.pathname]) {
+          return;
+        }
+        const entry = everything[url.pathname];
+        const stale = entry ? state.files[url.pathname] !== entry[0] : url.pathname in state.files;
+        if (stale) {
+          removals.push(cache.delete(request));
+          delete state.files[url.pathname];
+        }
+      });
+      Object.keys(state.files).forEach((url) => {
+        if (!everything[url]) {
+          delete state.files[url];
+        }
+      });
+
+      const bytes = Object.values(changed).reduce((total, entry) => total + entry[1], 0);
+      console.log(`📦 Service Worker: Precache ${manifest.version}: ${Object.keys(changed).length} changed file(s), ` +
+        `${(bytes / 1048576).toFixed(1)} MB, ${removals.length} stale removed`);
+
+      return Promise.all(removals)
+        .then(() => downloadEntries(cache, state, changed))
+        .then((failed) => {
+          state.games = games;
+          state.version = failed ? null : manifest.version;
+          return writeJson(STATE_KEY, state);
+        });
+    }));
+}
+
+/**
+ * Fetch the deployed manifest, remember it and sync the cache against it.
+ */
+function updatePrecache() {
+  return fetch(MANIFEST_URL, { cache: 'no-store' })
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error('HTTP ' + response.status);
+      }
+      return response.json();
+    })
+    .then((manifest) => {
+      if (manifest.version !== PRECACHE_VERSION) {
+        console.warn('⚠️ Service Worker: Manifest', manifest.version, 'does not match', PRECACHE_VERSION);
+      }
+      return writeJson(MANIFEST_KEY, manifest).then(() => syncPrecache(manifest));
+    });
+}
+
+/**
+ * Precache a game's files the first time it is opened (no-op once they are current)
+ */
+function precacheGame(game) {
+  return Promise.all([readJson(MANIFEST_KEY), loadState()])
+    .then(([manifest, state]) => {
+      if (!manifest || !manifest.games[game]) {
+        return;
+      }
+      if (state.games.includes(game) && state.version === manifest.version) {
+        return;
+      }
+      console.log('🎮 Service Worker: Precaching', game);
+      return syncPrecache(manifest, [game]);
+    })
+    .catch((error) => {
+      console.error('❌ Service Worker: Precaching', game, 'failed', error);
+    });
+}
+
+/**
+ * Install Event: Download what changed since the installed version
  */
 self.addEventListener('install', (event) => {
-  console.log('🔧 Service Worker: Installing v' + CACHE_VERSION);
+  console.log('🔧 Service Worker: Installing v' + CACHE_VERSION + ' (' + PRECACHE_VERSION + ')');
   
   event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then((cache) => {
-        console.log('📦 Service Worker: Caching critical assets');
-        return cache.addAll(CRITICAL_ASSETS);
+    updatePrecache()
+      .catch((error) => {
+        console.error('❌ Service Worker: Precache manifest unavailable, caching fallback assets', error);
+        return caches.open(CACHE_NAME).then((cache) => cache.addAll(FALLBACK_ASSETS));
       })
       .then(() => {
         console.log('✅ Service Worker: Installation complete');
@@ -185,7 +237,7 @@ self.addEventListener('install', (event) => {
 });
 
 /**
- * Activate Event: Clean up old caches
+ * Activate Event: Clean up caches from before delta updates (noyola-games-v*)
  */
 self.addEventListener('activate', (event) => {
   console.log('🔧 Service Worker: Activating v' + CACHE_VERSION);
@@ -197,7 +249,7 @@ self.addEventListener('activate', (event) => {
           cacheNames
             .filter((cacheName) => {
               // Delete old versions
-              return cacheName.startsWith('noyola-games-') && cacheName !== CACHE_NAME;
+              return cacheName.startsWith('noyola-games-') && cacheName !== CACHE_NAME && cacheName !== META_CACHE;
             })
             .map((cacheName) => {
               console.log('🗑️ Service Worker: Deleting old cache', cacheName);
@@ -228,6 +280,14 @@ self.addEventListener('fetch', (event) => {
     event.respondWith(fetch(event.request));
     return;
   }
+
+  // Opening a game: precache the rest of its files in the background
+  if (event.request.mode === 'navigate' && url.origin === self.location.origin) {
+    const game = url.pathname.split('/')[1];
+    if (game) {
+      event.waitUntil(precacheGame(game));
+    }
+  }
   
   // Network-first for Supabase (always try to sync when online)
   if (url.hostname.includes('supabase')) {
@@ -348,6 +408,10 @@ self.addEventListener('message', (event) => {
       cache.add(audioUrl);
     });
   }
+
+  if (event.data && event.data.type === 'PRECACHE_GAME') {
+    event.waitUntil(precacheGame(event.data.game));
+  }
 });
 
 console.log('🚀 Service Worker: Loaded v' + CACHE_VERSION);
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Shared asyncio HTTP layer for provider clients (ElevenLabs, Cartesia, Vertex AI).
+
+One pooled aiohttp session per provider keeps TCP+TLS connections alive
+between requests, so a batch of sound effects pays one handshake instead of
+one per asset. Connection pools are sized from PROVIDER_LIMITS.
+
+Every request goes through request_policy.call_with_retry(): the provider's
+token bucket, retries with jittered backoff on 429/5xx/connection errors
+(honouring Retry-After) and its circuit breaker. Each attempt also holds one
+of the provider's process-wide concurrency slots (request_policy.get_limit). Retryable failures that
+outlast the policy surface as RateLimitError / TransientError; other non-200
+responses are returned for the caller to turn into error_for_status().
+
+Sync callers go through run_sync(), which runs coroutines on a single
+background event loop shared by the whole process (and by every thread in
+generate_game_assets' worker pools), so the pooled sessions survive between
+calls. Async callers simply await the generate_*_async functions.
+
+Usage:
+    response = await request("elevenlabs", "POST", url, headers=headers, json=data)
+    response = await download("elevenlabs", "POST", url, output_path, headers=headers, json=data)
+    result = run_sync(generate_sfx_async(...))
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import HTTP_DEFAULTS, PROVIDER_LIMITS
+from provider_errors import RETRYABLE_STATUSES, ConfigurationError, ProviderError, TransientError, error_for_status
+from request_policy import call_with_retry, get_limit, parse_retry_after
+from streaming import CHUNK_SIZE, AtomicFile
+
+# Error bodies are small JSON documents; never buffer more than this
+ERROR_BODY_LIMIT = 64 * 1024
+
+T = TypeVar("T")
+
+# loop -> {provider: ClientSession}; sessions are bound to the loop that created them
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+_portal_loop: Optional[asyncio.AbstractEventLoop] = None
+_portal_thread: Optional[threading.Thread] = None
+_portal_lock = threading.Lock()
+
+
+def require_aiohttp():
+    """Import aiohttp, or raise ConfigurationError with install instructions."""
+    try:
+        import aiohttp
+    except ImportError:
+        raise ConfigurationError("aiohttp package not installed. Run: pip install -r tools/requirements.txt")
+    return aiohttp
+
+
+@dataclass
+class HttpResponse:
+    """A response. Streamed responses carry only the error body (if any) in `body`."""
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    bytes_streamed: int = 0
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def error_detail(self) -> str:
+        """Best-effort error description, mirroring what the CLIs used to print."""
+        try:
+            return str(self.json())
+        except ValueError:
+            return self.text[:200]
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        return next((value for key, value in self.headers.items() if key.lower() == name), None)
+
+    def error(self, provider: str, prefix: str = "API returned") -> ProviderError:
+        """Typed error for this (non-200) response, for `raise response.error(...)`."""
+        return error_for_status(
+            self.status,
+            f"{prefix} {self.status}: {self.error_detail()}",
+            provider=provider,
+            retry_after=parse_retry_after(self.header("Retry-After")),
+        )
+
+
+def _check_retryable(provider: str, response: HttpResponse) -> HttpResponse:
+    """Raise for statuses the retry policy should handle; return everything else."""
+    if response.status in RETRYABLE_STATUSES:
+        raise response.error(provider, prefix=f"{provider} returned")
+    return response
+
+
+def _connection_error(provider: str, e: BaseException) -> TransientError:
+    return TransientError(f"Request to {provider} failed: {e or type(e).__name__}", provider=provider)
+
+
+async def get_session(provider: str):
+    """Return the pooled keep-alive session for `provider` on the running loop."""
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    sessions = _sessions.setdefault(loop, {})
+    session = sessions.get(provider)
+    if session is None or session.closed:
+        limits = PROVIDER_LIMITS.get(provider, {})
+        connector = aiohttp.TCPConnector(
+            limit=max(HTTP_DEFAULTS["pool_size"], int(limits.get("concurrency", 0))),
+            keepalive_timeout=HTTP_DEFAULTS["keepalive_seconds"],
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_DEFAULTS["timeout_seconds"]),
+        )
+        sessions[provider] = session
+    return session
+
+
+async def request(
+    provider: str,
+    method: str,
+    url: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    json: Any = None,
+    timeout: Optional[float] = None,
+) -> HttpResponse:
+    """Send a request on the provider's pooled session and read the whole body (with retries)."""
+    import aiohttp
+
+    session = await get_session(provider)
+    kwargs = {}
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+    async def attempt() -> HttpResponse:
+        try:
+            async with get_limit(provider).slot():
+                async with session.request(method, url, headers=headers, json=json, **kwargs) as response:
+                    body = await response.read()
+                    result = HttpResponse(response.status, body, dict(response.headers))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _connection_error(provider, e) from e
+        return _check_retryable(provider, result)
+
+    return await call_with_retry(provider, attempt)
+
+
+async def request_stream(
+    provider: str,
+    method: str,
+    url: str,
+    sink: Callable[[bytes], None],
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    json: Any = None,
+    timeout: Optional[float] = None,
+    restart: Optional[Callable[[], None]] = None,
+) -> HttpResponse:
+    """
+    Send a request and hand a successful (200) body to `sink` chunk by chunk.
+
+    Error responses are read into `body` (capped) and never reach the sink.
+    A connection dropped mid-body is only retried if `restart` is given: it is
+    called first so the sink can throw away the partial body.
+    """
+    import aiohttp
+
+    session = await get_session(provider)
+    kwargs = {}
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    streamed = 0
+
+    async def attempt() -> HttpResponse:
+        nonlocal streamed
+        if streamed:
+            restart()
+            streamed = 0
+        try:
+            async with get_limit(provider).slot():
+                async with session.request(method, url, headers=headers, json=json, **kwargs) as response:
+                    if response.status != 200:
+                        body = await response.content.read(ERROR_BODY_LIMIT)
+                        return _check_retryable(provider, HttpResponse(response.status, body, dict(response.headers)))
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        sink(chunk)
+                        streamed += len(chunk)
+                    return HttpResponse(response.status, b"", dict(response.headers), bytes_streamed=streamed)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if streamed and restart is None:
+                raise ProviderError(
+                    f"Connection to {provider} dropped after {streamed} bytes: {e or type(e).__name__}",
+                    provider=provider,
+                ) from e
+            raise _connection_error(provider, e) from e
+
+    return await call_with_retry(provider, attempt)
+
+
+async def download(
+    provider: str,
+    method: str,
+    url: str,
+    output_path: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    json: Any = None,
+    timeout: Optional[float] = None,
+) -> HttpResponse:
+    """Stream a binary response straight to `output_path` (atomically, only on 200)."""
+    target = AtomicFile(output_path)
+    try:
+        response = await request_stream(
+            provider, method, url, target.write, headers=headers, json=json, timeout=timeout, restart=target.reset
+        )
+    except BaseException:
+        target.discard()
+        raise
+    if response.status == 200:
+        target.commit()
+    else:
+        target.discard()
+    return response
+
+
+async def close_sessions() -> None:
+    """Close every session created on the running loop."""
+    loop = asyncio.get_running_loop()
+    for session in _sessions.pop(loop, {}).values():
+        await session.close()
+
+
+def _portal() -> asyncio.AbstractEventLoop:
+    """Start the background loop that sync wrappers submit to (again, if the last one died)."""
+    global _portal_loop, _portal_thread
+    with _portal_lock:
+        if _portal_loop is None or _portal_thread is None or not _portal_thread.is_alive():
+            if _portal_loop is None:
+                atexit.register(_shutdown_portal)
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-http", daemon=True)
+            thread.start()
+            _portal_loop, _portal_thread = loop, thread
+        return _portal_loop
+
+
+def _shutdown_portal() -> None:
+    global _portal_loop
+    loop = _portal_loop
+    if loop is None or not _portal_thread.is_alive():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_sessions(), loop).result(timeout=5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    _portal_loop = None
+
+
+class _Escaped(Exception):
+    """Carries a SystemExit/KeyboardInterrupt out of the portal loop, which would otherwise stop it."""
+
+    def __init__(self, error: BaseException):
+        super().__init__(repr(error))
+        self.error = error
+
+
+async def _contained(coro: Awaitable[T]) -> T:
+    try:
+        return await coro
+    except (Exception, asyncio.CancelledError, GeneratorExit):
+        raise
+    except BaseException as e:
+        raise _Escaped(e) from None
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the shared background loop and block until it finishes (exceptions propagate)."""
+    require_aiohttp()
+    loop = _portal()
+    thread = _portal_thread
+    future = asyncio.run_coroutine_threadsafe(_contained(coro), loop)
+    # A child task can still stop the loop (SystemExit in a gather); don't wait on a dead one forever
+    while not concurrent.futures.wait([future], timeout=1.0).done:
+        if not thread.is_alive():
+            raise RuntimeError("The async-http event loop stopped before the call finished")
+    try:
+        return future.result()
+    except _Escaped as e:
+        # Re-raised on the calling thread, where SystemExit/KeyboardInterrupt mean what they should
+        raise e.error from None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call overhead of a fresh genai.Client vs the shared registry.
+
+Both paths send the same generate_content request to a local stub of the
+Gemini API (aiohttp, returns a tiny inline PNG), so the numbers isolate
+client-side cost: import, client construction, auth setup and connection
+handling. "Before" reproduces the old generate_image/generate_video code
+(import + genai.Client(...) inside every call); "after" goes through
+genai_client.get_client(). The stub also counts TCP connections opened.
+
+Cold import time of google.genai is measured in a fresh interpreter.
+
+Usage:
+    python tools/bench/bench_genai_client.py
+    python tools/bench/bench_genai_client.py --calls 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import genai_client
+
+# 1x1 transparent PNG
+PIXEL_PNG = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)).decode()
+
+API_KEY = "bench-key"
+
+
+def start_stub_server():
+    """Serve :generateContent on a random local port. Returns (base_url, connection_counter)."""
+    from aiohttp import web
+
+    connections = {"count": 0, "peers": set()}
+
+    async def generate_content(request: web.Request) -> web.Response:
+        await request.read()
+        # A new client port means a new TCP connection
+        peer = request.transport.get_extra_info("peername")
+        if peer not in connections["peers"]:
+            connections["peers"].add(peer)
+            connections["count"] += 1
+        return web.json_response({
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"inlineData": {"mimeType": "image/png", "data": PIXEL_PNG}}]},
+                "finishReason": "STOP",
+            }]
+        })
+
+    app = web.Application()
+    app.router.add_post("/{version}/models/{model}:generateContent", generate_content)
+
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        state["port"] = runner.addresses[0][1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{state['port']}", connections
+
+
+def call_before(base_url: str) -> None:
+    """Old pattern: import and build a client inside every call."""
+    from google import genai
+    from google.genai import types
+    client = genai.Client(api_key=API_KEY, http_options=types.HttpOptions(base_url=base_url))
+    client.models.generate_content(
+        model="bench-model",
+        contents="golden coin",
+        config=types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
+    )
+
+
+def call_after(base_url: str) -> None:
+    """New pattern: shared client from the registry."""
+    client = genai_client.get_client(API_KEY)
+    _, types = genai_client.get_genai()
+    client.models.generate_content(
+        model="bench-model",
+        contents="golden coin",
+        config=types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
+    )
+
+
+def measure(label: str, call, calls: int, connections: dict) -> float:
+    opened = connections["count"]
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    median = statistics.median(samples)
+    print(
+        f"  {label:<22} median {median:7.2f} ms   mean {statistics.mean(samples):7.2f} ms   "
+        f"connections {connections['count'] - opened}"
+    )
+    return median
+
+
+def cold_import_ms() -> float:
+    code = "import time; t = time.perf_counter(); from google import genai; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure genai client reuse overhead against a local stub")
+    parser.add_argument("--calls", type=int, default=30, help="Requests per variant")
+    args = parser.parse_args()
+
+    try:
+        genai_client.get_genai()
+    except ImportError:
+        print("Error: google-genai package not installed.")
+        sys.exit(1)
+
+    base_url, connections = start_stub_server()
+
+    # The registry keys clients by API key; point the shared one at the stub
+    _, types = genai_client.get_genai()
+    from google import genai
+    genai_client._clients[API_KEY] = genai.Client(api_key=API_KEY, http_options=types.HttpOptions(base_url=base_url))
+
+    # Warm both paths once so neither pays the first import
+    call_before(base_url)
+    call_after(base_url)
+
+    print(f"Per-call overhead, {args.calls} calls each (stub at {base_url}):")
+    before = measure("before: client per call", lambda: call_before(base_url), args.calls, connections)
+    after = measure("after: shared client", lambda: call_after(base_url), args.calls, connections)
+    print(f"  Saved {before - after:.2f} ms per call ({before / after:.1f}x)")
+    print(f"\nCold 'from google import genai': {cold_import_ms():.0f} ms (now paid only when an image/video job runs)")
+
+
+if __name__ == "__main__":
+    main()
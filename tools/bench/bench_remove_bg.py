@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark chroma-key background removal against rembg on assets/sprites/.
+
+Every source sprite (files without the _rgba suffix) is decoded once and cut
+out by both engines; times exclude PNG decode/encode. Where a committed
+<name>_rgba.png exists (earlier rembg output) the chroma matte is compared to
+it as mask IoU (alpha > 127), so speed and agreement are reported together.
+
+rembg is skipped with a note if it is not installed or its model cannot be
+loaded (it downloads u2net on first use).
+
+Usage:
+    python tools/bench/bench_remove_bg.py
+    python tools/bench/bench_remove_bg.py --model u2netp --limit 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chroma_key import MIN_CONFIDENCE, chroma_key
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def mask_iou(a, b) -> float:
+    import numpy as np
+
+    mask_a = np.asarray(a.getchannel("A")) > 127
+    mask_b = np.asarray(b.getchannel("A")) > 127
+    union = np.count_nonzero(mask_a | mask_b)
+    return np.count_nonzero(mask_a & mask_b) / union if union else 1.0
+
+
+def load_rembg(model: str):
+    """Return (remove, session) or (None, reason)."""
+    try:
+        from rembg import new_session, remove
+    except ImportError:
+        return None, "rembg not installed (pip install -r tools/requirements-rembg.txt)"
+    try:
+        start = time.perf_counter()
+        session = new_session(model)
+    except Exception as e:
+        return None, f"could not load model '{model}': {e}"
+    print(f"rembg model '{model}' loaded in {time.perf_counter() - start:.1f}s (paid once per run)")
+    return (remove, session), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chroma-key and rembg background removal speed")
+    parser.add_argument("--sprites", default=str(PROJECT_ROOT / "assets" / "sprites"), help="Sprite root folder")
+    parser.add_argument("--model", default="u2net", help="rembg model (default: u2net)")
+    parser.add_argument("--limit", type=int, help="Only benchmark the first N sprites")
+    parser.add_argument("--no-rembg", action="store_true", help="Only time the chroma key")
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    sources = sorted(p for p in Path(args.sprites).rglob("*.png") if not p.stem.endswith("_rgba"))
+    if args.limit:
+        sources = sources[:args.limit]
+    if not sources:
+        print(f"No sprites found under {args.sprites}")
+        sys.exit(1)
+
+    rembg, reason = (None, "--no-rembg") if args.no_rembg else load_rembg(args.model)
+    if rembg is None:
+        print(f"rembg skipped: {reason}")
+
+    chroma_ms, rembg_ms, ious = [], [], []
+    accepted = 0
+    print(f"\n{'Sprite':<48} {'Chroma':>8} {'Conf':>5} {'rembg':>8} {'IoU':>6}")
+    for path in sources:
+        with Image.open(path) as src:
+            src.load()
+
+            start = time.perf_counter()
+            keyed = chroma_key(src)
+            chroma_ms.append((time.perf_counter() - start) * 1000)
+            accepted += keyed.confidence >= MIN_CONFIDENCE
+
+            rembg_cell = "-"
+            if rembg:
+                remove, session = rembg
+                start = time.perf_counter()
+                remove(src, session=session)
+                rembg_ms.append((time.perf_counter() - start) * 1000)
+                rembg_cell = f"{rembg_ms[-1]:.0f}ms"
+
+        iou_cell = "-"
+        reference = path.with_name(f"{path.stem}_rgba.png")
+        if reference.exists() and keyed.confidence >= MIN_CONFIDENCE:
+            with Image.open(reference) as ref:
+                ious.append(mask_iou(keyed.image, ref.convert("RGBA")))
+            iou_cell = f"{ious[-1]:.3f}"
+
+        name = str(path.relative_to(args.sprites))
+        print(f"{name:<48} {chroma_ms[-1]:>6.0f}ms {keyed.confidence:>5.2f} {rembg_cell:>8} {iou_cell:>6}")
+
+    chroma_median = statistics.median(chroma_ms)
+    print(f"\n{len(sources)} sprites")
+    print(f"  Chroma key: median {chroma_median:.0f} ms/image, {accepted} confident (>= {MIN_CONFIDENCE}), "
+          f"{len(sources) - accepted} would fall back to rembg in --engine auto")
+    if ious:
+        print(f"  Agreement with committed *_rgba.png (confident sprites): mean IoU {statistics.mean(ious):.3f}, "
+              f"median {statistics.median(ious):.3f}")
+    if rembg_ms:
+        rembg_median = statistics.median(rembg_ms)
+        print(f"  rembg ({args.model}): median {rembg_median:.0f} ms/image -> chroma is {rembg_median / chroma_median:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batch job scheduler against the old serial loop.
+
+Runs every GAME_TEMPLATES entry through generate_game_assets' scheduling code
+with fake providers that sleep a fixed latency instead of calling an API.
+The serial baseline reproduces the old behaviour: one asset at a time plus
+time.sleep(1) after each call.
+
+Times are simulated: --scale compresses every latency, sleep and rate limit
+by the same factor so the benchmark finishes in seconds while the reported
+numbers stay in "real API" seconds.
+
+Usage:
+    python tools/bench/bench_scheduler.py
+    python tools/bench/bench_scheduler.py --latency 8 --scale 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import request_policy
+from config import PROVIDER_LIMITS
+from generate_game_assets import GAME_TEMPLATES, prepare_assets, run_jobs, schedule_assets
+from job_scheduler import JobScheduler
+
+# Old main() slept this long after every asset
+SERIAL_SLEEP_SECONDS = 1.0
+
+
+# Which provider's token bucket each generator draws from (as in schedule_assets)
+GENERATOR_PROVIDERS = {"image": "gemini", "music": "elevenlabs", "sfx": "elevenlabs", "voice": "cartesia"}
+
+
+def fake_generator(latency: float, provider: str = None):
+    """
+    Build a stand-in generator that 'renders' for `latency` seconds and writes nothing.
+
+    With a provider it first takes a token from that provider's bucket, like a
+    real request going through request_policy.
+    """
+    def generate(output_path: str, **kwargs) -> str:
+        if provider:
+            request_policy.get_bucket(provider).acquire()
+        time.sleep(latency)
+        return output_path
+    return generate
+
+
+def fake_generators(latency: float, rate_limited: bool = False) -> dict:
+    return {
+        kind: fake_generator(latency, provider if rate_limited else None)
+        for kind, provider in GENERATOR_PROVIDERS.items()
+    }
+
+
+def scale_limits(scale: float) -> None:
+    """Speed up every provider's request rate by 1/`scale` to match the compressed clock."""
+    for limits in PROVIDER_LIMITS.values():
+        limits["requests_per_minute"] = limits["requests_per_minute"] / scale
+    request_policy.reset()
+
+
+def all_template_assets() -> list[dict]:
+    return [
+        prepare_assets(template, "benchmark theme", f"bench-{game}")
+        for game, template in GAME_TEMPLATES.items()
+    ]
+
+
+def run_serial(latency: float, scale: float) -> tuple[int, float]:
+    """Old behaviour: generate each asset in turn, sleeping after every call."""
+    generators = fake_generators(latency * scale)
+    # A single-worker scheduler runs jobs strictly in submission order
+    scheduler = JobScheduler(limits={p: {"concurrency": 1} for p in PROVIDER_LIMITS})
+    for assets in all_template_assets():
+        schedule_assets(scheduler, assets, generators)
+    jobs = scheduler.jobs
+    start = time.perf_counter()
+    for job in jobs:
+        job.func(**job.kwargs)
+        time.sleep(SERIAL_SLEEP_SECONDS * scale)
+    return len(jobs), (time.perf_counter() - start) / scale
+
+
+def run_scheduled(latency: float, scale: float) -> tuple[int, float]:
+    """New behaviour: per-provider worker pools, request rates held by the token buckets."""
+    generators = fake_generators(latency * scale, rate_limited=True)
+    scale_limits(scale)
+    scheduler = JobScheduler()
+    for assets in all_template_assets():
+        schedule_assets(scheduler, assets, generators)
+    count = len(scheduler.jobs)
+    start = time.perf_counter()
+    generated = run_jobs(scheduler)
+    elapsed = (time.perf_counter() - start) / scale
+    produced = sum(len(paths) for paths in generated.values())
+    if produced != count:
+        print(f"Warning: {count - produced} fake jobs failed")
+    return count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial vs scheduled asset generation")
+    parser.add_argument("--latency", type=float, default=5.0, help="Simulated seconds per API call (default: 5)")
+    parser.add_argument("--scale", type=float, default=0.02, help="Real seconds per simulated second (default: 0.02)")
+    args = parser.parse_args()
+
+    print(f"Fake provider latency: {args.latency}s per asset, all {len(GAME_TEMPLATES)} templates")
+    for provider, limits in PROVIDER_LIMITS.items():
+        print(f"  {provider}: {limits['concurrency']} workers, {limits['requests_per_minute']} req/min")
+
+    count, serial = run_serial(args.latency, args.scale)
+    print(f"\nSerial (old loop):   {count} assets in {serial:7.1f}s")
+
+    count, scheduled = run_scheduled(args.latency, args.scale)
+    print(f"Scheduled (pools):   {count} assets in {scheduled:7.1f}s")
+
+    print(f"\nSpeedup: {serial / scheduled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the asset pipeline, run against the local mock providers.
+
+Every provider call goes to an in-process tools/mock_providers.py server, so
+the suite needs no network access or API keys and costs nothing.
+
+Benchmarks (pick with --only / --skip):
+  startup    import time and `--help` wall time of every CLI in tools/ (fresh interpreters)
+  requests   per-provider request overhead: tiny responses, zero server latency, cache off
+  decode     response decode + write throughput: streamed PCM download, Lyria base64 WAVs,
+             Cartesia websocket chunks into WAV
+  remove_bg  background removal per image (chroma key; rembg too with --rembg)
+  optimize   optimize_images throughput on copies of assets/sprites
+  e2e        generate_game_assets on a template: cold (every request), then warm (generation cache)
+
+Rate limits are lifted (requests_per_minute = 0) so the numbers show client
+cost rather than PROVIDER_LIMITS pacing; --real-limits keeps them. The mock
+server shares the interpreter, so throughput numbers include its send cost.
+
+Each run appends one JSON record (commit, machine, settings, metrics) to
+.cache/bench/results.jsonl. Metric names end in their unit: *_ms and *_s are
+lower-is-better, *_per_s and *_mb_s higher-is-better. --compare prints the
+change against the previous run (e.g. on the parent commit) or a saved record.
+
+Usage:
+    python tools/bench/bench_suite.py
+    python tools/bench/bench_suite.py --only requests decode --compare
+    python tools/bench/bench_suite.py --template spelling --latency 0.5 --output bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+TOOLS_DIR = Path(__file__).resolve().parent.parent
+PROJECT_ROOT = TOOLS_DIR.parent
+sys.path.insert(0, str(TOOLS_DIR))
+# Nothing that imports config may load before the mock's URLs are in the environment
+from mock_providers import MOCK_ENV, MockProviders, MockSettings
+
+RESULTS_FILE = PROJECT_ROOT / ".cache" / "bench" / "results.jsonl"
+RECORD_VERSION = 1
+BENCHMARKS = ["startup", "requests", "decode", "remove_bg", "optimize", "e2e"]
+# Relative change beyond which --compare flags a metric
+NOTABLE_CHANGE = 0.10
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the tools' progress output (worker threads included) while timing them."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def timed(func: Callable, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def latency_metrics(prefix: str, seconds: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in seconds]
+    return {
+        f"{prefix}.median_ms": round(statistics.median(ms), 3),
+        f"{prefix}.p95_ms": round(percentile(ms, 0.95), 3),
+    }
+
+
+def lift_rate_limits() -> None:
+    """Let every provider start requests back to back (the scheduler and token buckets read PROVIDER_LIMITS)."""
+    from config import PROVIDER_LIMITS
+    import request_policy
+
+    for limits in PROVIDER_LIMITS.values():
+        limits["requests_per_minute"] = 0
+    request_policy.reset()
+
+
+def dir_bytes(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+class Suite:
+    """Runs the selected benchmarks against one mock server inside a scratch directory."""
+
+    def __init__(self, args: argparse.Namespace, mock: MockProviders, workdir: Path):
+        self.args = args
+        self.mock = mock
+        self.workdir = workdir
+
+    def configure_mock(self, **changes) -> None:
+        self.mock.settings = dataclasses.replace(MockSettings(latency=0.0, jitter=0.0), **changes)
+        self.mock.reset_stats()
+
+    def out(self, *parts: str) -> Path:
+        path = self.workdir.joinpath(*parts)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    # -- startup -----------------------------------------------------------
+
+    def startup(self) -> dict:
+        """Import time (python -X importtime, cumulative) and `--help` wall time per CLI."""
+        clis = sorted(
+            path for path in TOOLS_DIR.glob("*.py")
+            if '__name__ == "__main__"' in path.read_text(encoding="utf-8", errors="replace")
+        )
+        metrics = {}
+        baseline = [timed(subprocess.run, [sys.executable, "-c", "pass"], check=True) for _ in range(self.args.runs)]
+        metrics["python.median_ms"] = round(statistics.median(baseline) * 1000, 1)
+        for path in clis:
+            name = path.stem
+            imports, helps = [], []
+            for _ in range(self.args.runs):
+                result = subprocess.run(
+                    [sys.executable, "-X", "importtime", "-c", f"import {name}"],
+                    cwd=TOOLS_DIR, capture_output=True, text=True,
+                )
+                cumulative = self._import_cumulative_us(result.stderr, name)
+                if cumulative is not None:
+                    imports.append(cumulative / 1000)
+                helps.append(timed(subprocess.run, [sys.executable, str(path), "--help"], cwd=PROJECT_ROOT, capture_output=True))
+            if imports:
+                metrics[f"{name}.import_ms"] = round(statistics.median(imports), 1)
+            metrics[f"{name}.help_ms"] = round(statistics.median(helps) * 1000, 1)
+            print(f"  {name:<28} import {metrics.get(f'{name}.import_ms', float('nan')):7.1f} ms   "
+                  f"--help {metrics[f'{name}.help_ms']:7.1f} ms")
+        return metrics
+
+    @staticmethod
+    def _import_cumulative_us(stderr: str, module: str) -> Optional[float]:
+        # "import time:       self [us] |  cumulative | imported package"
+        for line in stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            fields = line[len("import time:"):].split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                return float(fields[1])
+        return None
+
+    # -- requests ----------------------------------------------------------
+
+    def requests(self) -> dict:
+        """Median/p95 client time per call with a zero-latency, near-empty response."""
+        from async_http import request, run_sync
+        from config import PROVIDER_LIMITS
+        from genai_client import genai_error, require_client
+        from generate_image import generate_image
+        from generate_music_vertex import generate_music as generate_lyria
+        from generate_sfx import generate_sfx
+        from generate_voice import generate_voice
+        from generation_cache import configure
+        from request_policy import call_with_retry_sync
+
+        self.configure_mock(payload_kb=1, audio_seconds=0.1, image_size=64)
+        configure(enabled=False)
+        PROVIDER_LIMITS.setdefault("bench", {"concurrency": 4, "requests_per_minute": 0})
+        client, types = require_client()
+
+        def veo_submit(i: int):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                call_with_retry_sync("veo", lambda: client.models.generate_videos(
+                    model="veo-bench", prompt=f"bench clip {i}",
+                    config=types.GenerateVideosConfig(duration_seconds="4"),
+                ), classify=lambda e: genai_error(e, provider="veo"))
+
+        calls = {
+            "http_floor": lambda i: run_sync(request("bench", "GET", f"{self.mock.url}/_mock/stats")),
+            "elevenlabs": lambda i: generate_sfx(f"bench click {i}", str(self.out("requests", f"sfx_{i}.mp3")), duration=1),
+            "cartesia": lambda i: generate_voice(f"Bench line {i}", str(self.out("requests", f"voice_{i}.mp3"))),
+            "vertex": lambda i: generate_lyria(f"bench loop {i}", str(self.out("requests", f"lyria_{i}.wav"))),
+            "gemini": lambda i: generate_image(f"bench coin {i}", str(self.out("requests", f"image_{i}.png")), resize=False),
+            "veo": veo_submit,
+        }
+        metrics = {}
+        try:
+            for provider, call in calls.items():
+                with quiet():
+                    # The first call pays for imports, session/client setup and the TCP connect
+                    first = timed(call, 0)
+                    samples = [timed(call, i) for i in range(1, self.args.requests + 1)]
+                metrics[f"{provider}.first_ms"] = round(first * 1000, 3)
+                metrics.update(latency_metrics(provider, samples))
+                print(f"  {provider:<12} first {first * 1000:7.1f} ms   median {metrics[f'{provider}.median_ms']:7.2f} ms   "
+                      f"p95 {metrics[f'{provider}.p95_ms']:7.2f} ms")
+        finally:
+            configure(enabled=True)
+        return metrics
+
+    # -- decode ------------------------------------------------------------
+
+    def decode(self) -> dict:
+        """Throughput of streaming large responses to disk, best of --runs."""
+        from generate_music_vertex import generate_music as generate_lyria
+        from generate_sfx import generate_sfx
+        from generate_voice import generate_voice_batch
+        from generation_cache import configure
+
+        configure(enabled=False)
+        metrics = {}
+
+        def best(label: str, run: Callable[[int], int]) -> None:
+            """`run(i)` performs one transfer and returns the bytes written."""
+            with quiet():
+                run(0)  # Warm the mock's clip cache and the connection
+                results = [self._timed_bytes(run, i) for i in range(1, self.args.runs + 1)]
+            seconds, written = min(results)
+            metrics[f"{label}.mb_s"] = round(written / seconds / 1024 ** 2, 2)
+            metrics[f"{label}.best_ms"] = round(seconds * 1000, 1)
+            print(f"  {label:<16} {written / 1024 ** 2:6.1f} MB in {seconds * 1000:7.1f} ms   "
+                  f"{metrics[f'{label}.mb_s']:7.1f} MB/s")
+
+        try:
+            self.configure_mock(payload_kb=16 * 1024)
+            best("pcm_download", lambda i: dir_bytes([generate_sfx(
+                f"bench stream {i}", str(self.out("decode", f"stream_{i}.pcm")), output_format="pcm_44100")]))
+
+            self.configure_mock(audio_seconds=30.0)
+
+            def lyria(i: int) -> int:
+                paths = generate_lyria(f"bench track {i}", str(self.out("decode", f"lyria_{i}.wav")), sample_count=4)
+                return dir_bytes(paths if isinstance(paths, list) else [paths])
+            best("lyria_base64", lyria)
+
+            self.configure_mock()
+            text = "The quick brown fox jumps over the lazy dog while the wizard counts to one hundred. " * 2
+
+            def websocket(i: int) -> int:
+                lines = [{"text": text, "output": str(self.out("decode", f"ws_{i}", f"line_{n}.wav"))} for n in range(16)]
+                results = generate_voice_batch(lines)
+                failed = [r for r in results if r["status"] == "failed"]
+                if failed:
+                    raise RuntimeError(f"voice batch failed: {failed[0]['error']}")
+                return sum(r["bytes"] for r in results)
+            best("voice_websocket", websocket)
+        finally:
+            configure(enabled=True)
+        return metrics
+
+    @staticmethod
+    def _timed_bytes(run: Callable[[int], int], i: int):
+        start = time.perf_counter()
+        written = run(i)
+        return time.perf_counter() - start, written
+
+    # -- images ------------------------------------------------------------
+
+    def sample_images(self) -> List[Path]:
+        """Source sprites (not *_rgba cut-outs) from --images, copied into the scratch dir."""
+        sources = sorted(p for p in Path(self.args.images).rglob("*.png") if not p.stem.endswith("_rgba"))
+        if not sources:
+            raise RuntimeError(f"no PNGs under {self.args.images}")
+        sources = sources[:self.args.limit]
+        target = self.out("images", "src")
+        target.mkdir(parents=True, exist_ok=True)
+        copies = []
+        for index, path in enumerate(sources):
+            copy = target / f"{index:03d}_{path.name}"
+            shutil.copyfile(path, copy)
+            copies.append(copy)
+        return copies
+
+    def remove_bg(self) -> dict:
+        """Per-image cut-out time: decode + key + PNG encode, and the key alone."""
+        from PIL import Image
+
+        from chroma_key import MIN_CONFIDENCE, chroma_key
+        from remove_bg import _process, _RembgSession
+
+        images = self.sample_images()
+        session = _RembgSession("u2net")
+        metrics = {}
+        engines = ["chroma"] + (["rembg"] if self.args.rembg else [])
+        for engine in engines:
+            samples = []
+            with quiet():
+                for path in images:
+                    out_path = self.out("images", engine, path.name)
+                    start = time.perf_counter()
+                    _, error = _process(session, path, out_path, verify=False, engine=engine)
+                    samples.append(time.perf_counter() - start)
+                    if error:
+                        raise RuntimeError(error)
+            if engine == "rembg":
+                # The one-off model load is reported on its own
+                samples[0] -= session.load_seconds
+                metrics["rembg.load_s"] = round(session.load_seconds, 2)
+            metrics.update(latency_metrics(engine, samples))
+            metrics[f"{engine}.images_per_s"] = round(len(samples) / sum(samples), 2)
+            print(f"  {engine:<8} {len(samples)} images   median {metrics[f'{engine}.median_ms']:7.1f} ms   "
+                  f"p95 {metrics[f'{engine}.p95_ms']:7.1f} ms")
+
+        key_only, confident = [], 0
+        for path in images:
+            with Image.open(path) as src:
+                src.load()
+                start = time.perf_counter()
+                keyed = chroma_key(src)
+                key_only.append(time.perf_counter() - start)
+                confident += keyed.confidence >= MIN_CONFIDENCE
+        metrics.update(latency_metrics("key_only", key_only))
+        metrics["confident_fraction"] = round(confident / len(images), 3)
+        print(f"  key only  median {metrics['key_only.median_ms']:7.1f} ms, {confident}/{len(images)} confident")
+        return metrics
+
+    def optimize(self) -> dict:
+        """optimize_paths() over copies of the sample images: serial, then the default process pool."""
+        from optimize_images import optimize_paths
+
+        images = self.sample_images()
+        input_bytes = dir_bytes(images)
+        metrics = {}
+        pools = [1] + ([os.cpu_count()] if (os.cpu_count() or 1) > 1 else [])
+        for workers in pools:
+            # Fresh copies each pass: optimization rewrites the PNGs in place
+            copies = []
+            for path in images:
+                copy = self.out("images", f"optimize_{workers}", path.name)
+                shutil.copyfile(path, copy)
+                copies.append(str(copy))
+            with quiet():
+                start = time.perf_counter()
+                results = optimize_paths(copies, workers=workers, force=True)
+                seconds = time.perf_counter() - start
+            label = f"workers_{workers}"
+            metrics[f"{label}.images_per_s"] = round(len(copies) / seconds, 2)
+            metrics[f"{label}.input_mb_s"] = round(input_bytes / seconds / 1024 ** 2, 2)
+            metrics[f"{label}.total_s"] = round(seconds, 2)
+            saved = sum(r.original_bytes - r.png_bytes for r in results)
+            metrics["png_saved_fraction"] = round(saved / input_bytes, 3) if input_bytes else 0.0
+            print(f"  {workers} worker(s): {len(copies)} images in {seconds:.2f}s "
+                  f"({metrics[f'{label}.images_per_s']:.1f}/s, PNG bytes -{metrics['png_saved_fraction']:.0%})")
+        return metrics
+
+    # -- end to end --------------------------------------------------------
+
+    def e2e(self) -> dict:
+        """A full template through the scheduler: cold against the mock, then warm from the generation cache."""
+        from generate_game_assets import GAME_TEMPLATES, default_generators, prepare_assets, run_jobs, schedule_assets
+        from generation_cache import configure
+        from job_scheduler import JobScheduler
+
+        template = GAME_TEMPLATES[self.args.template]
+        configure(enabled=True, refresh=False)
+        metrics = {}
+        for phase in ("cold", "warm"):
+            self.configure_mock(latency=self.args.latency, jitter=0.3, image_size=1024, audio_seconds=2.0)
+            assets = prepare_assets(template, "benchmark theme", f"bench-{self.args.template}")
+            scheduler = JobScheduler()
+            schedule_assets(scheduler, assets, default_generators())
+            count = len(scheduler.jobs)
+            failures = []
+            with quiet():
+                start = time.perf_counter()
+                generated = run_jobs(scheduler, failures=failures)
+                seconds = time.perf_counter() - start
+            produced = sum(len(paths) for paths in generated.values())
+            requests = sum(counts["requests"] for counts in self.mock.stats().values())
+            metrics[f"{phase}.total_s"] = round(seconds, 3)
+            metrics[f"{phase}.assets_per_s"] = round(count / seconds, 2)
+            metrics[f"{phase}.requests"] = requests
+            metrics[f"{phase}.failures"] = len(failures)
+            print(f"  {phase}: {count} assets ({produced} files) in {seconds:.2f}s, "
+                  f"{requests} provider requests, {len(failures)} failed")
+            for label, error in failures:
+                print(f"    - {label}: {type(error).__name__}: {error}")
+        return metrics
+
+
+# -- results ---------------------------------------------------------------
+
+def git_state() -> dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip()
+
+    try:
+        commit = git("rev-parse", "--short", "HEAD")
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    except FileNotFoundError:
+        return {"commit": None, "dirty": None}
+    return {"commit": commit or None, "dirty": dirty}
+
+
+def load_records(path: Path) -> List[dict]:
+    """Records from a .jsonl history or a single-record .json file."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return [json.loads(text)]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def find_baseline(compare: str, results_file: Path) -> Optional[dict]:
+    """The last record in `compare` (a results file), or the previous run in the history for "last"."""
+    path = results_file if compare == "last" else Path(compare)
+    if not path.exists():
+        return None
+    records = load_records(path)
+    return records[-1] if records else None
+
+
+def lower_is_better(metric: str) -> Optional[bool]:
+    if metric.endswith(("_ms", "_s")) and not metric.endswith("_per_s"):
+        return True
+    if metric.endswith(("_per_s", "_mb_s")):
+        return False
+    return None
+
+
+def print_comparison(baseline: dict, record: dict) -> None:
+    label = baseline.get("commit") or "baseline"
+    print(f"\n=== Compared with {label}{' (dirty)' if baseline.get('dirty') else ''} from {baseline.get('timestamp', '?')} ===")
+    for name, result in record["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name, {}).get("metrics", {})
+        rows = []
+        for metric, value in result.get("metrics", {}).items():
+            old = before.get(metric)
+            direction = lower_is_better(metric)
+            if not isinstance(old, (int, float)) or not old or direction is None:
+                continue
+            change = (value - old) / old
+            better = change < 0 if direction else change > 0
+            flag = ("better" if better else "WORSE") if abs(change) >= NOTABLE_CHANGE else ""
+            rows.append(f"    {metric:<36} {old:>10g} -> {value:<10g} {change:+7.1%}  {flag}")
+        if rows:
+            print(f"  {name}")
+            print("\n".join(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asset tools against local mock providers")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run (default: all)")
+    parser.add_argument("--skip", nargs="+", choices=BENCHMARKS, default=[], help="Benchmarks to leave out")
+    parser.add_argument("--runs", type=int, default=3, help="Repeats for startup and decode timings (default: 3)")
+    parser.add_argument("--requests", type=int, default=20, help="Timed calls per provider (default: 20)")
+    parser.add_argument("--template", default="math", help="GAME_TEMPLATES entry for e2e (default: math)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Median mock latency in seconds for e2e (default: 0.2)")
+    parser.add_argument("--real-limits", action="store_true", help="Keep PROVIDER_LIMITS request rates")
+    parser.add_argument("--images", default=str(PROJECT_ROOT / "assets" / "sprites"), help="PNG source folder for remove_bg/optimize")
+    parser.add_argument("--limit", type=int, default=12, help="Images used by remove_bg/optimize (default: 12)")
+    parser.add_argument("--rembg", action="store_true", help="Also time rembg (needs tools/requirements-rembg.txt)")
+    parser.add_argument("--results", default=str(RESULTS_FILE), help="History file the run is appended to")
+    parser.add_argument("--output", help="Also write this run's record to a JSON file (e.g. a CI artifact)")
+    parser.add_argument("--compare", nargs="?", const="last", help="Compare with the previous run in --results, or the last record of a given file")
+    parser.add_argument("--label", help="Free-form note stored with the record")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    args = parser.parse_args()
+
+    selected = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+    workdir = Path(tempfile.mkdtemp(prefix="noyola-bench-"))
+    mock = MockProviders(MockSettings(latency=0.0, jitter=0.0), seed=0)
+    mock.start()
+    os.environ.update(MOCK_ENV)
+    os.environ.update({
+        "NOYOLA_MOCK_PROVIDERS": mock.url,
+        "NOYOLA_CACHE_DIR": str(workdir / "cache"),
+        "NOYOLA_MANIFEST_DIR": str(workdir / "manifests"),
+    })
+    for name in ("ELEVENLABS_BASE_URL", "CARTESIA_BASE_URL", "CARTESIA_WS_URL", "GOOGLE_GEMINI_BASE_URL", "VERTEX_BASE_URL"):
+        os.environ.pop(name, None)
+    if not args.real_limits:
+        lift_rate_limits()
+
+    print(f"Mock providers at {mock.url}, scratch dir {workdir}")
+    suite = Suite(args, mock, workdir)
+    record = {
+        "version": RECORD_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **git_state(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: getattr(args, key) for key in ("runs", "requests", "template", "latency", "real_limits", "limit", "rembg")},
+        "benchmarks": {},
+    }
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # generate_game_assets writes assets/ relative to the working directory
+    failed = False
+    try:
+        for name in selected:
+            print(f"\n=== {name} ===")
+            start = time.perf_counter()
+            try:
+                metrics = getattr(suite, name)()
+            except Exception as e:
+                failed = True
+                print(f"  [FAILED] {type(e).__name__}: {e}")
+                record["benchmarks"][name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            record["benchmarks"][name] = {"seconds": round(time.perf_counter() - start, 2), "metrics": metrics}
+    finally:
+        os.chdir(cwd)
+        mock.stop()
+        if args.keep:
+            print(f"\nScratch dir kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results_file = Path(args.results)
+    baseline = find_baseline(args.compare, results_file) if args.compare else None
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+    print(f"\nResults appended to {results_file}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(record, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Record written to {args.output}")
+
+    if args.compare:
+        if baseline:
+            print_comparison(baseline, record)
+        else:
+            print("\nNo earlier run to compare with")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
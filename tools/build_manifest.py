@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Persisted build manifest for incremental asset generation.
+
+One JSON file per game ID records, for every asset, the fingerprint of the
+inputs that produced it (template entry, theme, style, generator settings)
+plus the output path, byte size, SHA-256 and status. Like make/ninja, a later
+run only rebuilds assets that are missing, failed, changed on disk, or whose
+inputs changed.
+
+Usage:
+    manifest = BuildManifest.load("spell-wizard")
+    fingerprint = input_fingerprint("sfx", kwargs)
+    if manifest.needs_build(output_path, fingerprint):
+        ...generate...
+        manifest.record(output_path, fingerprint, [output_path])
+        manifest.save()
+
+    python tools/build_manifest.py spell-wizard           # Show manifest status
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import BUILD_MANIFEST_DIR
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+MANIFEST_VERSION = 1
+
+
+def input_fingerprint(category: str, params: dict) -> str:
+    """Hash everything that determines an asset's content."""
+    canonical = json.dumps({"category": category, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path(game_id: str) -> Path:
+    root = Path(BUILD_MANIFEST_DIR)
+    if not root.is_absolute():
+        root = PROJECT_ROOT / root
+    return root / f"{game_id}.json"
+
+
+class BuildManifest:
+    """Per-game record of what was generated, from which inputs, and whether it succeeded."""
+
+    def __init__(self, game_id: str, path: Optional[Path] = None, assets: Optional[Dict[str, dict]] = None):
+        self.game_id = game_id
+        self.path = path or manifest_path(game_id)
+        self.assets: Dict[str, dict] = assets or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, game_id: str, path: Optional[Path] = None) -> "BuildManifest":
+        path = path or manifest_path(game_id)
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(game_id, path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(game_id, path)
+        return cls(game_id, path, data.get("assets", {}))
+
+    def needs_build(self, key: str, fingerprint: str, verify_hash: bool = False) -> bool:
+        """
+        Decide whether an asset must be (re)generated.
+
+        Args:
+            key: Primary output path of the asset
+            fingerprint: input_fingerprint() of the current template entry
+            verify_hash: Also re-hash outputs instead of trusting the recorded size
+
+        Returns:
+            True if the asset is missing, failed, stale, or changed on disk
+        """
+        entry = self.assets.get(key)
+        if not entry or entry.get("status") != "ok" or entry.get("fingerprint") != fingerprint:
+            return True
+        for output in entry.get("outputs", []):
+            try:
+                if os.path.getsize(output["path"]) != output["bytes"]:
+                    return True
+            except OSError:
+                return True
+            if verify_hash and file_sha256(output["path"]) != output["sha256"]:
+                return True
+        return False
+
+    def record(self, key: str, fingerprint: str, outputs: List[str], seconds: float = 0.0) -> None:
+        """Mark an asset as successfully generated."""
+        entry = {
+            "fingerprint": fingerprint,
+            "status": "ok",
+            "outputs": [
+                {"path": path, "bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+                for path in outputs
+            ],
+            "seconds": round(seconds, 3),
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            self.assets[key] = entry
+
+    def record_failure(self, key: str, fingerprint: str, error: BaseException) -> None:
+        """Mark an asset as failed so the next run retries it."""
+        entry = {
+            "fingerprint": fingerprint,
+            "status": "failed",
+            "error": str(error) or type(error).__name__,
+            "outputs": [],
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            self.assets[key] = entry
+
+    def save(self) -> None:
+        """Write atomically so a crash mid-run never leaves a truncated manifest."""
+        with self._lock:
+            data = {
+                "version": MANIFEST_VERSION,
+                "game_id": self.game_id,
+                "assets": dict(sorted(self.assets.items())),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(data, indent=2))
+            os.replace(tmp, self.path)
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.assets.values():
+            counts[entry.get("status", "unknown")] = counts.get(entry.get("status", "unknown"), 0) + 1
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the build manifest for a generated game")
+    parser.add_argument("game_id", help="Game ID used with generate_game_assets.py --id")
+    parser.add_argument("--verify", action="store_true", help="Re-hash outputs and report changed files")
+    args = parser.parse_args()
+
+    manifest = BuildManifest.load(args.game_id)
+    if not manifest.assets:
+        print(f"No manifest for {args.game_id} at {manifest.path}")
+        sys.exit(1)
+
+    print(f"Manifest: {manifest.path}")
+    for key, entry in manifest.assets.items():
+        status = entry.get("status")
+        if status == "ok" and manifest.needs_build(key, entry["fingerprint"], verify_hash=args.verify):
+            status = "changed"
+        size = sum(output["bytes"] for output in entry.get("outputs", []))
+        detail = f"{size / 1024:.1f} KB" if status != "failed" else entry.get("error", "")
+        print(f"  [{status:>7}] {key} ({detail})")
+
+    print(f"\nTotals: " + ", ".join(f"{count} {status}" for status, count in sorted(manifest.summary().items())))
+
+
+if __name__ == "__main__":
+    main()
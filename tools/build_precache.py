@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Build the service worker's precache manifest (URL -> content hash + size).
+
+Scans the deployed tree and writes precache-manifest.json:
+
+    {
+      "version": "3f2a9c01b7de",               # changes when any listed file changes
+      "core":  {"/index.html": ["<hash>", 18231], ...},
+      "games": {"pixel-quest": {"bytes": 123, "files": {"/pixel-quest/index.html": [...], ...}}}
+    }
+
+- core: the hub (root files, shared/, and the other assets/ files the hub
+  references). The service worker precaches it on install.
+- games: everything under <game>/ plus assets/<kind>/<game>/, and other
+  assets/ files (assets/<name>, flat template output like
+  assets/sprites/<name>) that only games reference, in each of those games.
+  Precached lazily the first time a game is opened.
+
+assets/ files outside a game's folder that no page or script names (old
+banners, assets for a game that has no index.html yet) are left out; the
+service worker still caches them if requested.
+
+service-worker.js compares these hashes with what it already has cached and
+re-downloads only the files whose hash changed, instead of throwing the whole
+cache away on every CACHE_VERSION bump. The manifest version is also written
+into service-worker.js (PRECACHE_VERSION) so browsers see a new worker
+whenever any asset changes.
+
+Hashes are remembered by size + mtime in .cache/precache-hashes.json, so a
+re-run only hashes files that changed.
+
+Usage:
+    python tools/build_precache.py
+    python tools/build_precache.py --check        # exit 1 if the manifest is out of date (CI)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from config import PRECACHE
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SERVICE_WORKER = "service-worker.js"
+HASH_LENGTH = 16
+VERSION_PATTERN = re.compile(r"^const PRECACHE_VERSION = '[^']*';", re.MULTILINE)
+ASSET_REFERENCE = re.compile(r"assets/([\w.\-/]+)")
+REFERENCE_EXTENSIONS = {".html", ".js", ".css", ".json"}
+
+
+def game_ids(root: Path) -> List[str]:
+    """Top-level folders with their own index.html are games."""
+    return sorted(
+        p.name for p in root.iterdir()
+        if p.is_dir() and (p / "index.html").exists() and p.name not in PRECACHE["exclude_dirs"]
+    )
+
+
+def deployed_files(root: Path) -> List[Path]:
+    """Files the site serves, minus tooling, authoring formats and the build outputs themselves."""
+    exclude_dirs = set(PRECACHE["exclude_dirs"])
+    exclude_ext = set(PRECACHE["exclude_extensions"])
+    skip = {PRECACHE["manifest"], SERVICE_WORKER}
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in exclude_dirs and not d.startswith("."))
+        for name in sorted(filenames):
+            path = Path(dirpath) / name
+            relative = path.relative_to(root).as_posix()
+            if name.startswith(".") or path.suffix.lower() in exclude_ext or relative in skip:
+                continue
+            if any(relative.startswith(prefix) for prefix in PRECACHE["on_demand_prefixes"]):
+                continue
+            files.append(path)
+    return files
+
+
+def group_for(relative: str, games: List[str]) -> Optional[str]:
+    """Game a file belongs to (its folder or assets/<kind>/<game>/), or None for the hub core."""
+    parts = relative.split("/")
+    if parts[0] in games:
+        return parts[0]
+    if parts[0] == "assets" and len(parts) >= 4 and parts[2] in games:
+        return parts[2]
+    return None
+
+
+def is_shared_asset(relative: str, games: List[str]) -> bool:
+    """An assets/ file outside every game's own folder (portraits, hub video, flat template output)."""
+    return relative.startswith("assets/") and group_for(relative, games) is None
+
+
+def asset_references(root: Path, files: List[Path], games: List[str]) -> Dict[str, set]:
+    """Map each referenced assets/ path to the groups whose pages or scripts name it (None = hub core)."""
+    references: Dict[str, set] = {}
+    for path in files:
+        if path.suffix.lower() not in REFERENCE_EXTENSIONS:
+            continue
+        group = group_for(path.relative_to(root).as_posix(), games)
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        for name in set(ASSET_REFERENCE.findall(text)):
+            references.setdefault(f"assets/{name}", set()).add(group)
+    return references
+
+
+class HashCache:
+    """sha256 per file, reused while size and mtime are unchanged."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries: Dict[str, list] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def hashes(self, files: List[Path], workers: int = 8) -> Dict[Path, Tuple[str, int]]:
+        results = {}
+        todo = []
+        for path in files:
+            stat = path.stat()
+            cached = self.entries.get(str(path))
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                results[path] = (cached[2], stat.st_size)
+            else:
+                todo.append((path, stat))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for (path, stat), digest in zip(todo, pool.map(lambda item: file_sha256(str(item[0])), todo)):
+                self.entries[str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+                results[path] = (digest, stat.st_size)
+        # Forget files that no longer exist
+        live = {str(p) for p in files}
+        self.entries = {k: v for k, v in self.entries.items() if k in live}
+        return results
+
+    def save(self) -> None:
+        with AtomicFile(str(self.path)) as f:
+            f.write(json.dumps(self.entries).encode("utf-8"))
+
+
+def build_manifest(root: Path = PROJECT_ROOT, save_hashes: bool = True) -> Tuple[dict, int]:
+    """
+    Scan the tree and build the manifest.
+
+    Args:
+        root: Site root
+        save_hashes: Update .cache/precache-hashes.json (False for --check, which writes nothing)
+
+    Returns:
+        (manifest dict, number of files that had to be hashed)
+    """
+    games = game_ids(root)
+    files = deployed_files(root)
+    cache = HashCache(root / PRECACHE["hash_cache"])
+    before = dict(cache.entries)
+    hashes = cache.hashes(files)
+    if save_hashes:
+        cache.save()
+    rehashed = sum(1 for p in files if before.get(str(p)) != cache.entries.get(str(p)))
+    references = asset_references(root, files, games)
+
+    core: Dict[str, list] = {}
+    grouped: Dict[str, Dict[str, list]] = {game: {} for game in games}
+    for path in files:
+        digest, size = hashes[path]
+        if size > PRECACHE["max_file_bytes"]:
+            continue
+        relative = path.relative_to(root).as_posix()
+        entry = [digest[:HASH_LENGTH], size]
+        if is_shared_asset(relative, games):
+            owners = references.get(relative, set())
+            # Anything the hub uses is core; otherwise only the games that use it fetch it
+            targets = [core] if None in owners else [grouped[game] for game in sorted(owners)]
+        else:
+            group = group_for(relative, games)
+            targets = [grouped[group] if group else core]
+        for target in targets:
+            target["/" + relative] = entry
+            # Folder URLs serve their index.html
+            if path.name == "index.html":
+                folder = path.parent.relative_to(root).as_posix()
+                target["/" if folder == "." else f"/{folder}/"] = entry
+
+    lines = [f"{url} {entry[0]}" for url, entry in sorted(core.items())]
+    lines += [f"{url} {entry[0]}" for game in games for url, entry in sorted(grouped[game].items())]
+    manifest = {
+        "version": hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:12],
+        "core": dict(sorted(core.items())),
+        "games": {
+            game: {"bytes": sum(size for _, size in entries.values()), "files": dict(sorted(entries.items()))}
+            for game, entries in grouped.items()
+        },
+    }
+    return manifest, rehashed
+
+
+def stamp_service_worker(version: str, root: Path = PROJECT_ROOT) -> bool:
+    """Write PRECACHE_VERSION into service-worker.js. Returns True if the file changed."""
+    path = root / SERVICE_WORKER
+    text = path.read_text(encoding="utf-8")
+    if not VERSION_PATTERN.search(text):
+        raise ValueError(f"{path} has no PRECACHE_VERSION line to update")
+    updated = VERSION_PATTERN.sub(f"const PRECACHE_VERSION = '{version}';", text, count=1)
+    if updated == text:
+        return False
+    with AtomicFile(str(path)) as f:
+        f.write(updated.encode("utf-8"))
+    return True
+
+
+def write_manifest(manifest: dict, root: Path = PROJECT_ROOT) -> Path:
+    path = root / PRECACHE["manifest"]
+    with AtomicFile(str(path)) as f:
+        f.write(json.dumps(manifest, indent=1).encode("utf-8"))
+    return path
+
+
+def build(root: Path = PROJECT_ROOT, quiet: bool = False) -> dict:
+    """Build, write and stamp in one step (used by generate_game_assets.py after generating)."""
+    start = time.perf_counter()
+    manifest, rehashed = build_manifest(root)
+    previous = load_manifest(root)
+    path = write_manifest(manifest, root)
+    stamp_service_worker(manifest["version"], root)
+    if not quiet:
+        print_summary(manifest, previous, rehashed, time.perf_counter() - start, path)
+    return manifest
+
+
+def load_manifest(root: Path = PROJECT_ROOT) -> Optional[dict]:
+    try:
+        with open(root / PRECACHE["manifest"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _all_files(manifest: Optional[dict]) -> Dict[str, list]:
+    if not manifest:
+        return {}
+    files = dict(manifest["core"])
+    for group in manifest["games"].values():
+        files.update(group["files"])
+    return files
+
+
+def print_summary(manifest: dict, previous: Optional[dict], rehashed: int, seconds: float, path: Path) -> None:
+    def mb(size: int) -> str:
+        return f"{size / (1024 * 1024):.1f} MB"
+
+    core_bytes = sum(size for _, size in manifest["core"].values())
+    print(f"Precache manifest {manifest['version']} -> {path} ({rehashed} file(s) hashed, {seconds:.1f}s)")
+    print(f"  core: {len(manifest['core'])} URLs, {mb(core_bytes)} (precached on install)")
+    for game, group in manifest["games"].items():
+        print(f"  {game:<24} {len(group['files']):>5} URLs, {mb(group['bytes']):>9} (precached when first opened)")
+
+    old, new = _all_files(previous), _all_files(manifest)
+    if previous:
+        changed = [url for url, entry in new.items() if url in old and old[url][0] != entry[0]]
+        added = [url for url in new if url not in old]
+        removed = [url for url in old if url not in new]
+        delta = sum(new[url][1] for url in changed + added)
+        print(f"  Delta vs previous manifest: {len(changed)} changed, {len(added)} added, {len(removed)} removed "
+              f"-> clients download {mb(delta)} instead of everything")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write precache-manifest.json for service-worker.js delta updates")
+    parser.add_argument("--root", default=str(PROJECT_ROOT), help="Site root (default: the project root)")
+    parser.add_argument("--check", action="store_true", help="Don't write; exit 1 if the manifest is out of date")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    if args.check:
+        manifest, _ = build_manifest(root, save_hashes=False)
+        current = load_manifest(root)
+        if not current or current.get("version") != manifest["version"]:
+            print("Precache manifest is out of date (run python tools/build_precache.py)")
+            sys.exit(1)
+        print(f"Precache manifest {manifest['version']} is up to date")
+        return
+
+    try:
+        build(root)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
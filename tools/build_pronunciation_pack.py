@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Build one pronunciation pack (spoken words) shared by the word-list games.
+
+Word lists are read straight from each game's config (PRONUNCIATION_PACK
+sources in config.py) and/or extra word files, deduplicated across games
+(case-insensitive) and spoken by Cartesia over one websocket
+(generate_voice.generate_voice_batch). Clips are trimmed and
+loudness-normalized (process_audio.py), encoded once and concatenated into
+a single archive:
+
+    assets/audio/shared/pronunciations/words.bin    every clip, back to back
+    assets/audio/shared/pronunciations/words.json   offset table:
+        words["dragon"] = [offset, length, seconds]   byte range of a complete MP3
+        games["spell-siege"] = ["arrow", "battle", ...]
+
+A game fetches words.bin once and plays a word by slicing its byte range:
+audioCtx.decodeAudioData(pack.slice(offset, offset + length)).
+
+Re-runs are incremental: words already in the pack (rendered with the same
+voice settings) are copied from the existing archive and only new words are
+rendered. Words no longer in any list are dropped.
+
+Usage:
+    python tools/build_pronunciation_pack.py
+    python tools/build_pronunciation_pack.py --games spell-siege word-forge
+    python tools/build_pronunciation_pack.py --words extra-words.txt --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import AUDIO_PROCESS, PRONUNCIATION_PACK, VOICE_DEFAULTS
+from provider_errors import ProviderError
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PACK_VERSION = 1
+STRING_LITERAL = re.compile(r"'((?:[^'\\\n]|\\.)*)'|\"((?:[^\"\\\n]|\\.)*)\"")
+
+
+def _bracketed(text: str, start: int) -> str:
+    """The [...] or {...} block opening at text[start], brackets balanced (string contents ignored)."""
+    depth = 0
+    quote = None
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    raise ValueError("Unbalanced brackets")
+
+
+def extract_words(js_path: Path, lists: List[str]) -> List[str]:
+    """
+    String literals inside the named JS arrays/objects (`const NAME = [...]` or `name: {...}`).
+
+    A name that appears several times (e.g. each theme's `words:`) contributes every occurrence.
+    """
+    text = js_path.read_text(encoding="utf-8-sig")
+    words = []
+    for name in lists:
+        found = False
+        for match in re.finditer(rf"(?<![\w.$]){re.escape(name)}\s*[:=]\s*(?=[\[{{])", text):
+            block = _bracketed(text, match.end())
+            words += [single or double for single, double in STRING_LITERAL.findall(block)]
+            found = True
+        if not found:
+            raise ValueError(f"{js_path}: no word list named {name}")
+    return words
+
+
+def load_word_file(path: str) -> List[str]:
+    """Words from a JSON list or a text file (one per line, # comments ignored)."""
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return list(json.loads(text))
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+
+def normalize(word: str) -> str:
+    return " ".join(word.replace("\\'", "'").strip().lower().split())
+
+
+def collect_words(games: List[str], extra_files: List[str]) -> Dict[str, List[str]]:
+    """
+    Deduplicated, sorted words per game (plus "extra" for word files).
+
+    Raises:
+        ValueError: For an unknown game or a word list that can't be found
+    """
+    sources = PRONUNCIATION_PACK["sources"]
+    grouped: Dict[str, List[str]] = {}
+    for game in games:
+        if game not in sources:
+            raise ValueError(f"Unknown game '{game}'. Configured: {', '.join(sources)}")
+        words = extract_words(PROJECT_ROOT / sources[game]["file"], sources[game]["lists"])
+        grouped[game] = sorted({normalize(w) for w in words} - {""})
+    extra = {normalize(w) for path in extra_files for w in load_word_file(path)} - {""}
+    if extra:
+        grouped["extra"] = sorted(extra)
+    return grouped
+
+
+def pack_settings() -> dict:
+    """Everything that changes how a word sounds; a change re-renders the whole pack."""
+    from generate_voice import resolve_voice_id
+
+    return {
+        "model_id": VOICE_DEFAULTS["model_id"],
+        "voice_id": resolve_voice_id(PRONUNCIATION_PACK["voice"]),
+        "speed": PRONUNCIATION_PACK["speed"],
+        "sample_rate": VOICE_DEFAULTS["sample_rate"],
+        "target_lufs": AUDIO_PROCESS["target_lufs"]["voice"],
+        "mp3_bitrate_kbps": AUDIO_PROCESS["mp3_bitrate_kbps"],
+    }
+
+
+class PronunciationPack:
+    """The words.bin archive and its words.json offset table."""
+
+    def __init__(self, out_dir: Path, name: str = None):
+        name = name or PRONUNCIATION_PACK["name"]
+        self.archive_path = out_dir / f"{name}.bin"
+        self.table_path = out_dir / f"{name}.json"
+
+    def load_table(self) -> Optional[dict]:
+        try:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if table.get("pack_version") != PACK_VERSION or not self.archive_path.exists():
+            return None
+        if self.archive_path.stat().st_size != table.get("bytes"):
+            return None
+        return table
+
+    def reusable(self, settings: dict) -> Dict[str, list]:
+        """Entries of the existing pack that were rendered with these settings."""
+        table = self.load_table()
+        if not table or table.get("settings") != settings:
+            return {}
+        return table["words"]
+
+    def write(self, clips: Dict[str, bytes], seconds: Dict[str, float], games: Dict[str, List[str]], settings: dict) -> dict:
+        """Write the archive (sorted by word) and then its offset table."""
+        words = {}
+        digest = hashlib.sha256()
+        with AtomicFile(str(self.archive_path)) as archive:
+            for word in sorted(clips):
+                data = clips[word]
+                words[word] = [archive.bytes_written, len(data), round(seconds[word], 3)]
+                digest.update(data)
+                archive.write(data)
+            total = archive.bytes_written
+        table = {
+            "pack_version": PACK_VERSION,
+            "version": digest.hexdigest()[:12],
+            "file": self.archive_path.name,
+            "format": "mp3",
+            "bytes": total,
+            "settings": settings,
+            "words": words,
+            "games": games,
+        }
+        with AtomicFile(str(self.table_path)) as f:
+            f.write(json.dumps(table, indent=1, ensure_ascii=False).encode("utf-8"))
+        return table
+
+    def read_clips(self, entries: Dict[str, list]) -> Dict[str, bytes]:
+        clips = {}
+        if not entries:
+            return clips
+        with open(self.archive_path, "rb") as f:
+            for word, (offset, length, _) in entries.items():
+                f.seek(offset)
+                clips[word] = f.read(length)
+        return clips
+
+
+def render_words(words: List[str], workers: int, url: Optional[str] = None) -> tuple:
+    """
+    Speak words over one websocket, then trim/normalize and encode each to MP3.
+
+    Returns:
+        (clips {word: mp3 bytes}, seconds {word: duration}, results from generate_voice_batch)
+    """
+    from generate_voice import generate_voice_batch
+    from process_audio import encoder_params, load_soundfile, process_paths
+
+    soundfile = load_soundfile()
+    voice_id = pack_settings()["voice_id"]
+    clips, seconds = {}, {}
+    with tempfile.TemporaryDirectory(prefix="pronunciations-") as work_dir:
+        # Render to WAV so trimming/normalizing doesn't cost an extra lossy encode
+        lines = [
+            {"text": word, "output": os.path.join(work_dir, f"{index}.wav"), "voice": None,
+             "voice_id": voice_id, "speed": PRONUNCIATION_PACK["speed"]}
+            for index, word in enumerate(words)
+        ]
+        results = generate_voice_batch(lines, max_in_flight=workers, url=url)
+        done = [(word, line["output"]) for word, line, result in zip(words, lines, results) if result["status"] != "failed"]
+        for processed in process_paths([path for _, path in done], audio_type="voice"):
+            if processed.error:
+                print(f"  Warning: could not process {processed.path}: {processed.error}")
+        params = encoder_params(Path("clip.mp3"))
+        for word, path in done:
+            samples, rate = soundfile.read(path, dtype="float32")
+            buffer = io.BytesIO()
+            soundfile.write(buffer, samples, rate, **params)
+            clips[word] = buffer.getvalue()
+            seconds[word] = len(samples) / rate
+    for word, result in zip(words, results):
+        result["word"] = word
+    return clips, seconds, results
+
+
+def build_pack(
+    games: List[str],
+    extra_files: List[str] = (),
+    out_dir: Path = None,
+    workers: int = None,
+    url: str = None,
+    force: bool = False,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Collect, diff against the existing pack, render what's missing and rewrite the pack.
+
+    Returns:
+        Summary dict: words, kept, rendered, failed (list of {word, error}), removed, bytes, table
+    """
+    out_dir = out_dir or PROJECT_ROOT / PRONUNCIATION_PACK["output_dir"]
+    workers = workers or PRONUNCIATION_PACK["workers"]
+    grouped = collect_words(games, list(extra_files))
+    wanted = sorted({word for words in grouped.values() for word in words})
+    pack = PronunciationPack(out_dir)
+    settings = pack_settings()
+    existing = {} if force else pack.reusable(settings)
+    previous = pack.load_table()
+
+    kept = {word: existing[word] for word in wanted if word in existing}
+    missing = [word for word in wanted if word not in existing]
+    removed = sorted(set(previous["words"]) - set(wanted)) if previous else []
+    summary = {
+        "words": len(wanted),
+        "per_game": {game: len(words) for game, words in grouped.items()},
+        "kept": len(kept),
+        "missing": missing,
+        "rendered": 0,
+        "failed": [],
+        "removed": removed,
+        "bytes": previous["bytes"] if previous else 0,
+        "table": None,
+    }
+    if dry_run or (not missing and not removed and previous and previous["games"] == grouped):
+        return summary
+
+    clips = pack.read_clips(kept)
+    seconds = {word: entry[2] for word, entry in kept.items()}
+    if missing:
+        print(f"Rendering {len(missing)} new word(s) ({len(kept)} already in the pack)...")
+        new_clips, new_seconds, results = render_words(missing, workers, url)
+        clips.update(new_clips)
+        seconds.update(new_seconds)
+        summary["rendered"] = len(new_clips)
+        summary["failed"] = [{"word": r["word"], "error": r["error"]} for r in results if r["status"] == "failed"]
+
+    # Failed words are left out of the table so the next run retries them
+    games = {game: [word for word in words if word in clips] for game, words in grouped.items()}
+    table = pack.write(clips, seconds, games, settings)
+    summary.update(bytes=table["bytes"], table=table)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build one pronunciation pack (words.bin + words.json) for the word-list games",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python build_pronunciation_pack.py                          # every game in PRONUNCIATION_PACK
+  python build_pronunciation_pack.py --games spell-siege
+  python build_pronunciation_pack.py --words weekly-list.txt  # extra words (text or JSON list)
+  python build_pronunciation_pack.py --dry-run                # show what would be rendered
+        """,
+    )
+    parser.add_argument("--games", nargs="+", default=list(PRONUNCIATION_PACK["sources"]),
+                        help="Games whose word lists to include (default: all configured)")
+    parser.add_argument("--words", nargs="+", default=[], help="Extra word files (one per line, or a JSON list)")
+    parser.add_argument("--out-dir", help=f"Output folder (default: {PRONUNCIATION_PACK['output_dir']})")
+    parser.add_argument("--workers", type=int, default=PRONUNCIATION_PACK["workers"],
+                        help="Words synthesized at once (default: %(default)s)")
+    parser.add_argument("--url", help="Websocket URL (default: CARTESIA_WS_URL or Cartesia's endpoint)")
+    parser.add_argument("--force", action="store_true", help="Re-render every word")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which words would be rendered")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        summary = build_pack(
+            args.games,
+            args.words,
+            out_dir=Path(args.out_dir) if args.out_dir else None,
+            workers=args.workers,
+            url=args.url,
+            force=args.force,
+            dry_run=args.dry_run,
+        )
+    except (ProviderError, ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    per_game = ", ".join(f"{game} {count}" for game, count in summary["per_game"].items())
+    print(f"{summary['words']} unique word(s) ({per_game})")
+    if args.dry_run:
+        print(f"  Already in pack: {summary['kept']}")
+        print(f"  Would render: {len(summary['missing'])}" + (f" ({', '.join(summary['missing'][:20])}"
+              f"{', ...' if len(summary['missing']) > 20 else ''})" if summary["missing"] else ""))
+        print(f"  Would drop: {len(summary['removed'])}")
+        return
+    if summary["table"] is None:
+        print(f"  Pack is up to date ({summary['bytes'] // 1024} KB)")
+        return
+    print(f"  Kept {summary['kept']}, rendered {summary['rendered']}, dropped {len(summary['removed'])} "
+          f"in {time.perf_counter() - start:.1f}s")
+    for failure in summary["failed"]:
+        print(f"  FAILED: {failure['word']} ({failure['error']})")
+    pack = PronunciationPack(Path(args.out_dir) if args.out_dir else PROJECT_ROOT / PRONUNCIATION_PACK["output_dir"])
+    print(f"  Archive: {pack.archive_path} ({summary['bytes'] // 1024} KB, {len(summary['table']['words'])} words)")
+    print(f"  Offset table: {pack.table_path}")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+NumPy chroma-key background removal for sprites generated on a solid background.
+
+Sprites are generated on a flat, high-contrast background (pure green/magenta,
+or the plain white/grey the image model tends to pick). For those a neural
+matting pass is overkill: the dominant border colour is the key, distance from
+it gives a soft alpha matte, and soft edge pixels are un-mixed from the key
+colour so no green/magenta fringe is left behind ("despill").
+
+Only background connected to the image border is removed (scipy, if
+installed), so white eyes on a white background survive. The result carries a
+confidence score; remove_bg.py falls back to rembg when it is low.
+
+Usage (see remove_bg.py --engine):
+    result = chroma_key(Image.open("sprite.png"))
+    if result.confidence >= MIN_CONFIDENCE:
+        result.image.save("sprite_rgba.png")
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+# RGB distance from the key: below INNER is fully transparent, above OUTER fully opaque
+INNER_TOLERANCE = 24.0
+OUTER_TOLERANCE = 64.0
+# Border band (pixels) sampled to find the key colour
+BORDER_WIDTH = 4
+# A second key colour must cover this share of the border (checkerboard backgrounds)
+SECOND_KEY_SHARE = 0.2
+# Fraction of border pixels that must match the key for the result to be trusted
+MIN_CONFIDENCE = 0.9
+# More semi-transparent than this (share of visible pixels) means glow/smoke, not a clean cut-out
+MAX_SOFT_SHARE = 0.25
+
+
+@dataclass
+class KeyResult:
+    """Chroma-key output: the RGBA image plus how much to trust it."""
+    image: "Image.Image"
+    key_colors: List[Tuple[int, int, int]]
+    confidence: float
+    transparent_fraction: float
+
+
+def _border_sides(pixels: np.ndarray, width: int) -> List[np.ndarray]:
+    """Pixels within `width` of each image edge (top, bottom, left, right), each flattened to (N, channels)."""
+    channels = pixels.shape[-1]
+    return [
+        pixels[:width].reshape(-1, channels),
+        pixels[-width:].reshape(-1, channels),
+        pixels[:, :width].reshape(-1, channels),
+        pixels[:, -width:].reshape(-1, channels),
+    ]
+
+
+def _distance(pixels: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """RGB distance from each pixel to its nearest key colour."""
+    pixels = pixels.astype(np.float32, copy=False)
+    nearest = None
+    for key in keys:
+        diff = pixels - key
+        squared = np.einsum("...k,...k->...", diff, diff)
+        nearest = squared if nearest is None else np.minimum(nearest, squared)
+    return np.sqrt(nearest)
+
+
+def _nearest_key(pixels: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Index of the nearest key colour for each pixel."""
+    diff = pixels.astype(np.float32)[..., None, :] - keys
+    return (diff * diff).sum(axis=-1).argmin(axis=-1)
+
+
+def _dominant_color(samples: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Median colour of the most populated 16-level-per-channel histogram bin, and its pixel count."""
+    bins = samples >> 4
+    codes = (bins[:, 0].astype(np.int32) << 8) | (bins[:, 1].astype(np.int32) << 4) | bins[:, 2]
+    counts = np.bincount(codes, minlength=4096)
+    dominant = counts.argmax()
+    return np.median(samples[codes == dominant], axis=0).astype(np.float32), int(counts[dominant])
+
+
+def detect_key_colors(sides: List[np.ndarray], tolerance: float = INNER_TOLERANCE) -> Tuple[np.ndarray, float]:
+    """
+    Find the background colour(s) from the border.
+
+    A second key is added when the border is a two-tone pattern, such as the
+    grey/white checkerboard image models paint for "transparent background".
+
+    Args:
+        sides: (N, 3) uint8 pixels of each border band (top, bottom, left, right)
+        tolerance: RGB distance counted as "the same colour" for the confidence
+
+    Returns:
+        (K x 3 float32 key colours, confidence). Confidence is the mean match
+        rate of the best three sides, so a subject cropped by one edge (a
+        portrait's shoulders) does not count against it.
+    """
+    samples = np.concatenate(sides)
+    if not len(samples):
+        return np.zeros((1, 3), dtype=np.float32), 0.0
+    key, _ = _dominant_color(samples)
+    keys = key[None, :]
+    unmatched = samples[_distance(samples, keys) >= tolerance]
+    if len(unmatched):
+        second, count = _dominant_color(unmatched)
+        if count >= SECOND_KEY_SHARE * len(samples):
+            keys = np.stack([key, second])
+
+    rates = sorted(
+        (float(np.count_nonzero(_distance(side, keys) < tolerance)) / len(side) for side in sides if len(side)),
+        reverse=True,
+    )
+    return keys, float(np.mean(rates[:3]))
+
+
+def _border_connected(mask: np.ndarray) -> np.ndarray:
+    """Keep only the parts of `mask` that touch the image edge (needs scipy; otherwise mask as-is)."""
+    try:
+        from scipy import ndimage
+    except ImportError:
+        return mask
+    labels, count = ndimage.label(mask)
+    if count == 0:
+        return mask
+    edge_labels = np.unique(np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]]))
+    keep = np.zeros(count + 1, dtype=bool)
+    keep[edge_labels] = True
+    keep[0] = False
+    return keep[labels]
+
+
+def chroma_key(
+    img,
+    inner: float = INNER_TOLERANCE,
+    outer: float = OUTER_TOLERANCE,
+    border: int = BORDER_WIDTH,
+) -> KeyResult:
+    """
+    Key out the dominant border colour of an image.
+
+    Args:
+        img: PIL image (any mode; existing alpha is preserved and combined)
+        inner: Distance from the key below which pixels become fully transparent
+        outer: Distance above which pixels stay fully opaque (soft ramp in between)
+        border: Width of the border band used to detect the key
+
+    Returns:
+        KeyResult with an RGBA image, the key colour(s) and a 0-1 confidence
+    """
+    from PIL import Image
+
+    rgba = np.asarray(img.convert("RGBA"))
+    rgb = rgba[..., :3]
+    existing_alpha = rgba[..., 3]
+
+    # Ignore border pixels that are already transparent
+    sides = [side[side[:, 3] > 0, :3] for side in _border_sides(rgba, border)]
+    if not any(len(side) for side in sides):
+        transparent = float(np.count_nonzero(existing_alpha == 0)) / existing_alpha.size
+        return KeyResult(img.convert("RGBA"), [], 1.0, transparent)
+    keys, confidence = detect_key_colors(sides, inner)
+
+    distance = _distance(rgb, keys)
+    alpha = np.clip((distance - inner) / (outer - inner), 0.0, 1.0)
+
+    # Key-coloured regions enclosed by the sprite stay opaque
+    background = _border_connected(alpha < 1.0)
+    alpha[~background] = 1.0
+
+    # Despill: soft pixels are a mix of foreground and key; un-mix the nearest key back out
+    soft = (alpha > 0.0) & (alpha < 1.0)
+    soft_rgb = rgb[soft].astype(np.float32)
+    nearest = keys[_nearest_key(soft_rgb, keys)]
+    a = alpha[soft][:, None]
+    out = rgba.copy()
+    out[soft, :3] = np.clip((soft_rgb - (1.0 - a) * nearest) / a, 0, 255).astype(np.uint8)
+
+    final_alpha = np.minimum(alpha * 255.0 + 0.5, existing_alpha).astype(np.uint8)
+    out[..., 3] = final_alpha
+    transparent = float(np.count_nonzero(final_alpha == 0)) / final_alpha.size
+    visible = np.count_nonzero(final_alpha)
+    soft_share = float(np.count_nonzero(soft)) / max(visible, 1)
+    if soft_share > MAX_SOFT_SHARE:
+        confidence = min(confidence, 1.0 - soft_share)
+    # Keying away (nearly) everything means the "background" was really the subject
+    if transparent > 0.995:
+        confidence = 0.0
+
+    return KeyResult(
+        Image.fromarray(out, "RGBA"),
+        [tuple(int(round(c)) for c in key) for key in keys],
+        confidence,
+        transparent,
+    )
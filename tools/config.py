@@ -26,6 +26,16 @@ ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY")
 SUNO_API_KEY = os.getenv("SUNO_API_KEY")  # From third-party provider like sunoapi.org
 
+# Provider base URLs. NOYOLA_MOCK_PROVIDERS points every provider at one local stand-in
+# (tools/mock_providers.py); the per-provider variables override it
+MOCK_PROVIDERS_URL = os.getenv("NOYOLA_MOCK_PROVIDERS")
+PROVIDER_URLS = {
+    "elevenlabs": os.getenv("ELEVENLABS_BASE_URL") or MOCK_PROVIDERS_URL or "https://api.elevenlabs.io",
+    "cartesia": os.getenv("CARTESIA_BASE_URL") or MOCK_PROVIDERS_URL or "https://api.cartesia.ai",
+    "gemini": os.getenv("GOOGLE_GEMINI_BASE_URL") or MOCK_PROVIDERS_URL,  # None = the google-genai default
+    "vertex": os.getenv("VERTEX_BASE_URL") or MOCK_PROVIDERS_URL,  # None = https://{location}-aiplatform.googleapis.com
+}
+
 # Default output directories (matches Noyola Hub structure)
 DEFAULT_SPRITE_DIR = "assets/sprites"
 DEFAULT_BACKGROUND_DIR = "assets/backgrounds"
@@ -33,6 +43,17 @@ DEFAULT_MUSIC_DIR = "assets/audio"      # Music goes in assets/audio/[game-id]/m
 DEFAULT_SFX_DIR = "assets/audio"        # SFX goes in assets/audio/[game-id]/sfx/
 DEFAULT_VOICE_DIR = "assets/audio"      # Voice goes in assets/audio/[game-id]/voice/
 
+# Local generation cache: identical requests are served from disk instead of the paid API
+# Objects are stored by content hash; least-recently-used entries are evicted past max_bytes
+CACHE_DEFAULTS = {
+    "dir": os.getenv("NOYOLA_CACHE_DIR", ".cache/generation"),  # Relative to the project root
+    "max_bytes": 2 * 1024 ** 3,   # 2 GB
+    "link_mode": "hardlink",      # "hardlink" or "copy" when materializing cached files
+}
+
+# Per-game build manifests for incremental generate_game_assets.py runs
+BUILD_MANIFEST_DIR = os.getenv("NOYOLA_MANIFEST_DIR", ".cache/manifests")  # Relative to the project root
+
 # Image generation defaults (Google Gemini / Nano Banana)
 IMAGE_DEFAULTS = {
     # Gemini 2.5 Flash with image generation - good balance of speed/cost (~$0.04/image)
@@ -42,6 +63,65 @@ IMAGE_DEFAULTS = {
     "size": "1024x1024",
     "game_sprite_size": "512x512",
     "pixel_art_size": "256x256",
+    # Display size per asset type (resize_images.py); sprites use game_sprite_size / pixel_art_size
+    "type_sizes": {
+        "background": "1024x1024",
+        "ui": "512x512",
+        "icon": "64x64",
+        "tileset": "256x256",
+    },
+}
+
+# Image post-processing (tools/optimize_images.py)
+IMAGE_OPTIMIZE = {
+    # Indexed palette size per pixel style (see STYLE_MODIFIERS in generate_image.py)
+    "palette_sizes": {"8-bit": 32, "pixel-art": 64, "16-bit": 256},
+    "webp_quality": 85,    # Lossy WebP for painted/realistic art (pixel styles use lossless)
+    "avif_quality": 60,
+}
+
+# 3D model packing (tools/optimize_models.py)
+MODEL_OPTIMIZE = {
+    "max_texture_size": 1024,     # Longest texture side; 2048px source maps are 4x the GPU memory
+    "quantize": True,             # KHR_mesh_quantization: int16 positions, int8 normals, uint16 UVs
+    "embed_textures": False,      # Shared textures stay external so many GLBs don't each carry a copy
+}
+
+# Audio post-processing (tools/process_audio.py)
+AUDIO_PROCESS = {
+    "target_lufs": {"music": -18.0, "sfx": -16.0, "voice": -16.0},  # Music sits under SFX and voice
+    "peak_dbfs": -1.0,            # Gain is capped so sample peaks stay below this
+    "silence_dbfs": -50.0,        # Leading/trailing audio quieter than this is trimmed
+    "pad_ms": 10,                 # Silence kept before/after the trimmed sound
+    "fade_ms": 5,                 # Fade at cut edges so trimming never clicks
+    "gain_tolerance_db": 0.5,     # Smaller corrections aren't worth a lossy re-encode
+    "max_gain_db": 12.0,          # Don't lift deliberately quiet clips (footsteps) into noise
+    "loop_window_ms": 100,        # Opening audio matched against the end of the track
+    "loop_min_seconds": 4.0,      # Shortest loop accepted for music
+    "loop_min_score": 0.3,        # Weaker matches are reported as "no clean loop point"
+    "mp3_bitrate_kbps": 128,
+}
+
+# Video generation defaults (Veo, generate_video.py)
+VIDEO_DEFAULTS = {
+    "model": "veo-3.1-generate-preview",
+    "resolution": "720p",
+    "poll_initial_seconds": 2,    # First status check after submitting
+    "poll_backoff": 1.5,          # Multiply the interval after each unfinished poll
+    "poll_max_seconds": 20,       # Never wait longer than this between polls
+    "state_file": ".cache/veo-operations.json",  # In-flight operations, re-attached unless --fresh
+}
+
+# Service worker precache manifest (tools/build_precache.py)
+PRECACHE = {
+    "manifest": "precache-manifest.json",   # Written to the project root, served as /precache-manifest.json
+    "hash_cache": ".cache/precache-hashes.json",
+    "exclude_dirs": ["tools", ".git", ".cache", "node_modules", "__pycache__"],
+    # Source/authoring files that are deployed but never requested by a game
+    "exclude_extensions": [".md", ".py", ".jsonl", ".txt", ".zip", ".url", ".fbx", ".dae", ".stl", ".blend", ".psd", ".patch"],
+    # Still cached by the service worker on first use, but too large to precache a whole game's worth
+    "on_demand_prefixes": ["assets/models/"],
+    "max_file_bytes": 25 * 1024 ** 2,
 }
 
 # Music generation defaults (ElevenLabs)
@@ -49,6 +129,25 @@ MUSIC_DEFAULTS = {
     "duration_seconds": 20,      # Max 22 seconds (ElevenLabs limit), good for loops
     "output_format": "mp3_44100_128",  # Standard MP3 format
     "instrumental": True,        # No vocals for game music (hint for prompts)
+    # Longer tracks are stitched from concurrently generated segments (generate_music.py)
+    "max_segment_seconds": 22,         # ElevenLabs per-request limit
+    "crossfade_seconds": 2.0,          # Overlap between segments (and from the end back to the start)
+    "max_align_seconds": 1.0,          # Furthest a segment is shifted to line its beats up
+    "segment_format": "pcm_44100",     # Raw 16-bit mono PCM: stitched without a decoder
+}
+
+# Music generation defaults (Vertex AI Lyria 2, generate_music_vertex.py)
+VERTEX_MUSIC_DEFAULTS = {
+    "max_instances_per_request": 4,  # Prompts packed into one :predict call in --batch mode
+    "decode_workers": 4,             # Threads decoding/writing returned clips in parallel
+}
+
+# gcloud access token cache for Vertex AI (tools/gcloud_auth.py)
+VERTEX_AUTH = {
+    "cache_file": ".cache/gcloud-token.json",  # Relative to the project root
+    "token_lifetime_seconds": 3600,            # Assumed only if gcloud doesn't report the expiry
+    "refresh_margin_seconds": 300,             # Refresh this long before expiry
+    "access_token": os.getenv("VERTEX_ACCESS_TOKEN"),  # Fixed token instead of gcloud (CI, local stand-in)
 }
 
 # Sound effects defaults (ElevenLabs)
@@ -62,6 +161,56 @@ VOICE_DEFAULTS = {
     "model_id": "sonic-2",  # Cartesia's latest model
     "output_format": "mp3",
     "sample_rate": 44100,
+    # Batch mode (generate_voice.py --batch/--template) streams over one websocket
+    "ws_url": os.getenv("CARTESIA_WS_URL") or PROVIDER_URLS["cartesia"].replace("http", "ws", 1) + "/tts/websocket",
+    "max_in_flight": 8,           # Lines (websocket contexts) being synthesized at once
+}
+
+# Pronunciation pack for word-list games (tools/build_pronunciation_pack.py)
+# Each source names a game's config file and the JS word-list constants (or object keys) to read
+PRONUNCIATION_PACK = {
+    "output_dir": "assets/audio/shared/pronunciations",  # words.bin + words.json
+    "name": "words",
+    "voice": "cheerful_female",   # Preset from CARTESIA_VOICES
+    "speed": 1.0,
+    "workers": 8,                 # Words being synthesized at once
+    "sources": {
+        "spell-siege": {"file": "spell-siege/scripts/game-config.js", "lists": ["DEFAULT_WORDS", "LIAM_DEFAULT_WORDS"]},
+        "word-forge": {"file": "word-forge/scripts/game-config.js", "lists": ["WORD_LISTS", "COMBAT_WORDS"]},
+        "word-hunt": {"file": "word-hunt/scripts/game-config.js", "lists": ["words"]},
+    },
+}
+
+# Batch generation limits per provider (used by generate_game_assets.py and the
+# per-request token buckets in tools/request_policy.py)
+# concurrency: max requests in flight at once
+# requests_per_minute: max requests started per rolling minute
+# burst: requests that may start back to back before the rate applies (default: concurrency)
+PROVIDER_LIMITS = {
+    "gemini": {"concurrency": 4, "requests_per_minute": 10},
+    "elevenlabs": {"concurrency": 3, "requests_per_minute": 60},
+    "cartesia": {"concurrency": 4, "requests_per_minute": 120},
+    "vertex": {"concurrency": 2, "requests_per_minute": 30},
+    "veo": {"concurrency": 4, "requests_per_minute": 10},
+    "veo-poll": {"concurrency": 4, "requests_per_minute": 60},      # operations.get, separate from the generate quota
+    "veo-download": {"concurrency": 4, "requests_per_minute": 60},
+}
+
+# Shared async HTTP client (tools/async_http.py): one keep-alive pool per provider
+HTTP_DEFAULTS = {
+    "pool_size": 10,            # Minimum connections per provider pool
+    "keepalive_seconds": 60,    # Keep idle connections open between assets
+    "timeout_seconds": 120,     # Default total timeout per request
+}
+
+# Retries and circuit breaking for every provider request (tools/request_policy.py)
+REQUEST_POLICY = {
+    "max_attempts": 5,              # Tries per request, including the first
+    "backoff_base_seconds": 1.0,    # Backoff ceiling doubles per retry: 1, 2, 4, 8...
+    "backoff_max_seconds": 30.0,    # ...up to this (the actual wait is a random fraction: full jitter)
+    "max_retry_after_seconds": 120.0,  # Longest Retry-After we'll wait; longer ones are capped
+    "breaker_failures": 5,          # Consecutive retryable failures that open a provider's circuit
+    "breaker_cooldown_seconds": 30.0,  # Fail fast this long, then let one trial request through
 }
 
 # Cartesia voice presets (add more as needed)
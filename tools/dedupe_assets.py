@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Find duplicate files in an asset tree and formats no game loads.
+
+Asset packs such as assets/models/99-nights-in-space/ copy the same texture
+into several folders (Textures/, glTF/Props/, glTF/Aliens/ ...) and ship
+every model in six formats. This tool:
+
+- Hashes the tree in parallel (only files whose size collides with another
+  file are hashed) and reports duplicate groups and reclaimable bytes.
+- --rewrite-gltf points every glTF image/buffer uri at one shared copy per
+  group (the shallowest path, e.g. Textures/), and with --delete removes the
+  copies nothing references any more.
+- --formats lists model formats that no game's JS/HTML loads, plus textures
+  no loadable model (glTF uri, OBJ .mtl map) refers to.
+
+Usage:
+    python tools/dedupe_assets.py assets/models
+    python tools/dedupe_assets.py assets/models/99-nights-in-space --rewrite-gltf --dry-run
+    python tools/dedupe_assets.py assets/models --rewrite-gltf --delete
+    python tools/dedupe_assets.py assets/models --formats
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import quote, unquote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+MODEL_FORMATS = {".glb", ".gltf", ".obj", ".fbx", ".dae", ".stl", ".blend", ".3ds", ".ply", ".usdz"}
+TEXTURE_FORMATS = {".png", ".jpg", ".jpeg", ".webp", ".ktx2", ".tga", ".bmp"}
+# Files a loaded format pulls in by reference
+DEPENDENCIES = {".gltf": {".bin"}, ".obj": {".mtl"}}
+# Scanned for runtime references; tools/ and assets/ are not game code
+SKIP_CODE_DIRS = {"tools", "assets", "node_modules", ".git", ".cache"}
+
+
+@dataclass
+class DuplicateGroup:
+    """Files with identical content."""
+    sha256: str
+    size: int
+    paths: List[Path]
+
+    @property
+    def canonical(self) -> Path:
+        """The copy to keep: shallowest path, then alphabetical (shared Textures/ folders win)."""
+        return min(self.paths, key=lambda p: (len(p.parts), p.as_posix()))
+
+    @property
+    def reclaimable(self) -> int:
+        return self.size * (len(self.paths) - 1)
+
+
+def walk_files(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*") if p.is_file())
+
+
+def find_duplicates(files: Iterable[Path], workers: Optional[int] = None) -> List[DuplicateGroup]:
+    """
+    Group files by content.
+
+    Args:
+        files: Files to compare
+        workers: Hashing threads (hashlib releases the GIL, so threads scale with disks/cores)
+
+    Returns:
+        Groups of 2+ identical files, largest reclaimable bytes first
+    """
+    by_size: Dict[int, List[Path]] = defaultdict(list)
+    for path in files:
+        by_size[path.stat().st_size].append(path)
+    # A file with a unique size cannot have a duplicate: skip hashing it
+    candidates = [path for size, paths in by_size.items() if len(paths) > 1 and size > 0 for path in paths]
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda p: file_sha256(str(p)), candidates))
+
+    by_hash: Dict[str, List[Path]] = defaultdict(list)
+    for path, digest in zip(candidates, digests):
+        by_hash[digest].append(path)
+    groups = [
+        DuplicateGroup(digest, paths[0].stat().st_size, sorted(paths))
+        for digest, paths in by_hash.items() if len(paths) > 1
+    ]
+    return sorted(groups, key=lambda g: (-g.reclaimable, g.canonical.as_posix()))
+
+
+def _load_gltf(path: Path):
+    """Returns (data, indent) so a rewrite keeps the file's formatting style."""
+    text = path.read_text(encoding="utf-8")
+    return json.loads(text), (2 if "\n" in text.strip() else None)
+
+
+def _gltf_uris(data: dict) -> Iterable[dict]:
+    """Entries of a glTF that reference external files (images and buffers)."""
+    for key in ("images", "buffers"):
+        for entry in data.get(key, []):
+            uri = entry.get("uri")
+            if uri and not uri.startswith("data:"):
+                yield entry
+
+
+def rewrite_gltf_uris(root: Path, groups: List[DuplicateGroup], write: bool = True) -> Dict[Path, int]:
+    """
+    Point glTF uris at the canonical copy of each duplicate group.
+
+    Returns:
+        {gltf path: number of uris rewritten}
+    """
+    canonical = {}
+    for group in groups:
+        for path in group.paths:
+            canonical[path.resolve()] = group.canonical.resolve()
+
+    rewritten = {}
+    for gltf in root.rglob("*.gltf"):
+        data, indent = _load_gltf(gltf)
+        count = 0
+        for entry in _gltf_uris(data):
+            target = (gltf.parent / unquote(entry["uri"])).resolve()
+            keep = canonical.get(target)
+            if keep is None or keep == target:
+                continue
+            entry["uri"] = quote(Path(os.path.relpath(keep, gltf.parent.resolve())).as_posix(), safe="/")
+            count += 1
+        if count:
+            rewritten[gltf] = count
+            if write:
+                separators = None if indent else (",", ":")
+                with AtomicFile(str(gltf)) as f:
+                    f.write(json.dumps(data, indent=indent, separators=separators).encode("utf-8"))
+    return rewritten
+
+
+def _mtl_maps(mtl: Path) -> Iterable[Path]:
+    """Textures an .mtl refers to. Exporters often write absolute Windows paths; loaders use the file name."""
+    for line in mtl.read_text(encoding="utf-8", errors="replace").splitlines():
+        parts = line.strip().split(None, 1)
+        if len(parts) == 2 and (parts[0].lower().startswith("map_") or parts[0].lower() in ("bump", "disp", "norm")):
+            name = re.split(r"[\\/]+", parts[1].strip())[-1]
+            yield mtl.parent / name
+
+
+def referenced_files(root: Path) -> Set[Path]:
+    """Every file a glTF uri or .mtl texture map points at."""
+    referenced = set()
+    for gltf in root.rglob("*.gltf"):
+        data, _ = _load_gltf(gltf)
+        referenced.update((gltf.parent / unquote(e["uri"])).resolve() for e in _gltf_uris(data))
+    for mtl in root.rglob("*.mtl"):
+        referenced.update(path.resolve() for path in _mtl_maps(mtl))
+    return referenced
+
+
+def delete_unreferenced_copies(root: Path, groups: List[DuplicateGroup], write: bool = True) -> List[Path]:
+    """Remove non-canonical copies that no glTF/.mtl/game code references. Returns the removed paths."""
+    referenced = referenced_files(root)
+    code_names = _code_file_names()
+    removed = []
+    for group in groups:
+        for path in group.paths:
+            if path == group.canonical or path.resolve() in referenced or _named_in_code(path, code_names):
+                continue
+            removed.append(path)
+            if write:
+                path.unlink()
+    return removed
+
+
+def _read_code(project_root: Path) -> List[str]:
+    texts = []
+    for path in project_root.rglob("*"):
+        if path.suffix.lower() not in (".js", ".html") or SKIP_CODE_DIRS & set(path.relative_to(project_root).parts):
+            continue
+        texts.append(path.read_text(encoding="utf-8", errors="replace"))
+    return texts
+
+
+def _code_file_names() -> Set[str]:
+    """File names mentioned anywhere in game JS/HTML."""
+    return set(re.findall(r"[\w%.\-\[\]]+\.\w+", "\n".join(_read_code(PROJECT_ROOT))))
+
+
+def _named_in_code(path: Path, code_names: Set[str]) -> bool:
+    return path.name in code_names or quote(path.name) in code_names
+
+
+def loaded_formats(project_root: Path = PROJECT_ROOT) -> Set[str]:
+    """Model extensions that appear in game JS/HTML (e.g. 'rover.obj', 'Props/Prop_Chest.gltf')."""
+    pattern = re.compile(r"\.(" + "|".join(ext[1:] for ext in MODEL_FORMATS) + r")\b", re.IGNORECASE)
+    found = set()
+    for text in _read_code(project_root):
+        found.update(f".{match.lower()}" for match in pattern.findall(text))
+    return found
+
+
+def format_report(root: Path, files: List[Path]) -> List[dict]:
+    """Per-extension file counts and bytes with a status: loaded, dependency, texture, unreferenced or unused."""
+    loaded = loaded_formats()
+    needed = set(loaded)
+    for ext in loaded:
+        needed |= DEPENDENCIES.get(ext, set())
+    referenced = referenced_files(root)
+    code_names = _code_file_names()
+
+    rows = defaultdict(lambda: {"files": 0, "bytes": 0})
+    for path in files:
+        ext = path.suffix.lower()
+        if ext in TEXTURE_FORMATS:
+            used = path.resolve() in referenced or _named_in_code(path, code_names)
+            status = "texture" if used else "unreferenced texture"
+        elif ext in needed:
+            status = "loaded" if ext in loaded else "dependency"
+        else:
+            status = "unused"
+        row = rows[(ext or "(none)", status)]
+        row["files"] += 1
+        row["bytes"] += path.stat().st_size
+    return [
+        {"extension": ext, "status": status, **counts}
+        for (ext, status), counts in sorted(rows.items(), key=lambda item: -item[1]["bytes"])
+    ]
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report duplicate asset files and unused model formats")
+    parser.add_argument("root", nargs="?", default=str(PROJECT_ROOT / "assets" / "models"), help="Asset folder (default: assets/models)")
+    parser.add_argument("--workers", type=int, help="Hashing threads")
+    parser.add_argument("--top", type=int, default=15, help="Duplicate groups to list (default: 15)")
+    parser.add_argument("--rewrite-gltf", action="store_true", help="Point glTF uris at one shared copy per duplicate group")
+    parser.add_argument("--delete", action="store_true", help="With --rewrite-gltf: delete copies nothing references any more")
+    parser.add_argument("--formats", action="store_true", help="List formats/textures no game loads at runtime")
+    parser.add_argument("--dry-run", action="store_true", help="Report what --rewrite-gltf/--delete would change")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.delete and not args.rewrite_gltf:
+        parser.error("--delete requires --rewrite-gltf (copies are only unreferenced after the rewrite)")
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"Error: not a directory: {root}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    files = walk_files(root)
+    groups = find_duplicates(files, args.workers)
+    total = sum(p.stat().st_size for p in files)
+    reclaimable = sum(g.reclaimable for g in groups)
+    print(f"{root}: {len(files)} files, {_mb(total)}, hashed in {time.perf_counter() - start:.1f}s")
+    print(f"Duplicates: {len(groups)} groups, {sum(len(g.paths) - 1 for g in groups)} extra copies, "
+          f"{_mb(reclaimable)} reclaimable ({reclaimable / max(total, 1):.0%})")
+    for group in groups[:args.top]:
+        print(f"  {_mb(group.reclaimable):>9}  {len(group.paths)} x {group.canonical.name}")
+        for path in group.paths:
+            marker = "keep" if path == group.canonical else "    "
+            print(f"      {marker} {path.relative_to(root)}")
+
+    report = {
+        "root": str(root),
+        "files": len(files),
+        "bytes": total,
+        "reclaimable_bytes": reclaimable,
+        "groups": [
+            {"sha256": g.sha256, "size": g.size, "keep": str(g.canonical), "paths": [str(p) for p in g.paths]}
+            for g in groups
+        ],
+    }
+
+    write = not args.dry_run
+    if args.rewrite_gltf:
+        rewritten = rewrite_gltf_uris(root, groups, write=write)
+        verb = "Would rewrite" if args.dry_run else "Rewrote"
+        print(f"\n{verb} {sum(rewritten.values())} uri(s) in {len(rewritten)} glTF file(s)")
+        report["rewritten_gltf"] = {str(path): count for path, count in rewritten.items()}
+        if args.delete:
+            if args.dry_run:
+                print("  (--delete skipped in a dry run: references only change after the rewrite)")
+            else:
+                removed = delete_unreferenced_copies(root, groups)
+                freed = sum(next(g.size for g in groups if p in g.paths) for p in removed)
+                print(f"Deleted {len(removed)} unreferenced duplicate(s), {_mb(freed)} freed")
+                report["deleted"] = [str(p) for p in removed]
+
+    if args.formats:
+        rows = format_report(root, walk_files(root))
+        print(f"\n{'Extension':<10} {'Status':<22} {'Files':>6} {'Size':>10}")
+        for row in rows:
+            print(f"{row['extension']:<10} {row['status']:<22} {row['files']:>6} {_mb(row['bytes']):>10}")
+        unused = sum(r["bytes"] for r in rows if r["status"] in ("unused", "unreferenced texture"))
+        print(f"Not loaded by any game: {_mb(unused)} of {_mb(total)} ({unused / max(total, 1):.0%})")
+        report["formats"] = rows
+
+    if args.json:
+        with AtomicFile(args.json) as f:
+            f.write(json.dumps(report, indent=2).encode("utf-8"))
+        print(f"\nReport: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Cached gcloud access tokens for Vertex AI calls.
+
+Each gcloud call costs hundreds of milliseconds to seconds of Python/gcloud
+startup. The token provider runs `gcloud config config-helper` once, keeps
+the token in memory and on disk (.cache/gcloud-token.json, owner-only
+permissions) with the expiry gcloud reports, and refreshes it shortly before
+it expires. Every Vertex call in a process, and every process within the
+token lifetime, shares it. gcloud hands out its own cached token, which may
+already be part-used, so the reported expiry matters; after a 401 the next
+refresh forces gcloud to mint a new one.
+
+Usage:
+    token = get_token_provider().get_token()
+
+    python tools/gcloud_auth.py            # Print token status
+    python tools/gcloud_auth.py --refresh  # Force a new token
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import VERTEX_AUTH
+from provider_errors import ConfigurationError, ProviderError
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Try common gcloud paths on Windows
+GCLOUD_PATHS = [
+    "gcloud",  # If in PATH
+    r"C:\Program Files (x86)\Google\Cloud SDK\google-cloud-sdk\bin\gcloud.cmd",
+    r"C:\Users\mnoyo\AppData\Local\Google\Cloud SDK\google-cloud-sdk\bin\gcloud.cmd",
+]
+
+
+def parse_token_expiry(value: Optional[str]) -> Optional[float]:
+    """config-helper's credential.token_expiry (ISO 8601, e.g. 2026-01-01T12:00:00Z) as a Unix time."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class AccessTokenProvider:
+    """Thread-safe, disk-backed cache around `gcloud config config-helper`."""
+
+    def __init__(
+        self,
+        cache_file: Optional[str] = None,
+        lifetime: Optional[float] = None,
+        refresh_margin: Optional[float] = None,
+    ):
+        path = Path(cache_file or VERTEX_AUTH["cache_file"])
+        self.cache_file = path if path.is_absolute() else PROJECT_ROOT / path
+        self.lifetime = lifetime if lifetime is not None else VERTEX_AUTH["token_lifetime_seconds"]
+        self.refresh_margin = refresh_margin if refresh_margin is not None else VERTEX_AUTH["refresh_margin_seconds"]
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._gcloud: Optional[str] = None
+        self._force_refresh = False
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    def get_token(self) -> str:
+        """Return a valid token, refreshing from gcloud only when near expiry."""
+        if VERTEX_AUTH.get("access_token"):
+            return VERTEX_AUTH["access_token"]
+        with self._lock:
+            if not self._fresh():
+                self._load()
+            if not self._fresh():
+                self._refresh()
+            return self._token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """
+        Drop the cached token (e.g. after a 401) so the next call fetches a new one from gcloud.
+
+        Args:
+            token: The token that was rejected. If another caller already replaced it,
+                nothing happens, so concurrent 401s cause a single refresh.
+        """
+        with self._lock:
+            if token is not None and token != self._token:
+                return
+            # gcloud would hand back the same cached token otherwise
+            self._force_refresh = True
+            self._token = None
+            self._expires_at = 0.0
+            try:
+                self.cache_file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.cache_file.read_text())
+        except (OSError, ValueError):
+            return
+        self._token = data.get("access_token")
+        self._expires_at = float(data.get("expires_at", 0))
+        self._gcloud = data.get("gcloud") or self._gcloud
+
+    def _save(self) -> None:
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_suffix(".tmp")
+        # Owner-only: this is a live credential
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"access_token": self._token, "expires_at": self._expires_at, "gcloud": self._gcloud}, f)
+        os.replace(tmp, self.cache_file)
+
+    def _candidates(self) -> List[str]:
+        # The path that worked last time goes first
+        if self._gcloud:
+            return [self._gcloud] + [p for p in GCLOUD_PATHS if p != self._gcloud]
+        return list(GCLOUD_PATHS)
+
+    def _refresh(self) -> None:
+        args = ["config", "config-helper", "--format=json"]
+        if self._force_refresh:
+            args.append("--force-auth-refresh")
+        for gcloud_cmd in self._candidates():
+            try:
+                result = subprocess.run(
+                    [gcloud_cmd] + args,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    # Bare "gcloud" is a .cmd shim on Windows; a list + shell=True drops the args on POSIX
+                    shell=gcloud_cmd == "gcloud" and os.name == "nt",
+                )
+                credential = json.loads(result.stdout).get("credential") or {}
+            except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+                continue
+            token = credential.get("access_token")
+            if not token:
+                continue
+            self._token = token
+            # Fall back to a full lifetime only if gcloud doesn't say when its token expires
+            expires_at = parse_token_expiry(credential.get("token_expiry"))
+            self._expires_at = expires_at if expires_at is not None else time.time() + self.lifetime
+            self._gcloud = gcloud_cmd
+            self._force_refresh = False
+            self._save()
+            return
+
+        raise ConfigurationError(
+            "Could not find gcloud command. Make sure you're authenticated with: gcloud auth login",
+            provider="vertex",
+        )
+
+    def seconds_remaining(self) -> float:
+        return max(0.0, self._expires_at - time.time())
+
+
+_default_provider: Optional[AccessTokenProvider] = None
+_default_lock = threading.Lock()
+
+
+def get_token_provider() -> AccessTokenProvider:
+    """Process-wide token provider shared by all Vertex calls."""
+    global _default_provider
+    with _default_lock:
+        if _default_provider is None:
+            _default_provider = AccessTokenProvider()
+        return _default_provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or refresh the cached gcloud access token")
+    parser.add_argument("--refresh", action="store_true", help="Discard the cached token and fetch a new one")
+    args = parser.parse_args()
+
+    provider = get_token_provider()
+    if args.refresh:
+        provider.invalidate()
+    start = time.perf_counter()
+    try:
+        provider.get_token()
+    except ProviderError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    print(f"Token cache: {provider.cache_file}")
+    print(f"  gcloud:    {provider._gcloud}")
+    print(f"  Expires in {provider.seconds_remaining() / 60:.0f} min (fetched in {elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
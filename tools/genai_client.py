@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Shared, lazily created google-genai clients for image and video generation.
+
+Importing google.genai costs the better part of a second and every
+genai.Client builds its own HTTP connection pool and auth setup. The registry
+imports the package on first use only and keeps one client per API key for
+the whole process, so a batch of sprites reuses one client (and its
+keep-alive connections) instead of building one per asset.
+
+SDK exceptions are mapped onto provider_errors by genai_error(), so image and
+video calls share the retry/circuit-breaker policy in request_policy.py.
+
+Usage:
+    client, types = require_client()
+    response = call_with_retry_sync("gemini", lambda: client.models.generate_content(...), classify=genai_error)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import GOOGLE_API_KEY, PROVIDER_URLS
+from provider_errors import ConfigurationError, ProviderError, TransientError, error_for_status
+from request_policy import parse_retry_after
+
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def get_genai() -> Tuple[Any, Any]:
+    """Import google.genai on first use. Raises ImportError if it is not installed."""
+    from google import genai
+    from google.genai import types
+    return genai, types
+
+
+def get_client(api_key: Optional[str] = None):
+    """Return the process-wide client for `api_key` (default GOOGLE_API_KEY), creating it once."""
+    api_key = api_key or GOOGLE_API_KEY
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                genai, types = get_genai()
+                # PROVIDER_URLS["gemini"] redirects image and video calls (e.g. to tools/mock_providers.py)
+                http_options = types.HttpOptions(base_url=PROVIDER_URLS["gemini"]) if PROVIDER_URLS["gemini"] else None
+                client = genai.Client(api_key=api_key, http_options=http_options)
+                _clients[api_key] = client
+    return client
+
+
+def require_client(api_key: Optional[str] = None) -> Tuple[Any, Any]:
+    """Return (client, types), or raise ConfigurationError with setup instructions."""
+    try:
+        _, types = get_genai()
+    except ImportError:
+        raise ConfigurationError("google-genai package not installed. Run: pip install google-genai", provider="gemini")
+
+    if not (api_key or GOOGLE_API_KEY):
+        raise ConfigurationError("GOOGLE_API_KEY not set in .env or environment", provider="gemini")
+
+    return get_client(api_key), types
+
+
+def genai_error(e: Exception, provider: str = "gemini") -> Optional[ProviderError]:
+    """Typed ProviderError for a google-genai API or transport exception (None for anything else)."""
+    try:
+        import httpx
+        from google.genai import errors
+    except ImportError:
+        return None
+    if isinstance(e, errors.APIError):
+        headers = getattr(getattr(e, "response", None), "headers", None) or {}
+        return error_for_status(
+            int(e.code or 0),
+            f"{provider} returned {e.code}: {e.message or e.status}",
+            provider=provider,
+            retry_after=parse_retry_after(headers.get("retry-after")),
+        )
+    if isinstance(e, httpx.TransportError):
+        return TransientError(f"Request to {provider} failed: {e or type(e).__name__}", provider=provider)
+    return None
+
+
+def reset_clients() -> None:
+    """Drop cached clients (e.g. after rotating the API key)."""
+    with _lock:
+        _clients.clear()
@@ -12,9 +12,13 @@ This generates a standard set of assets appropriate for educational games in the
 import argparse
 import os
 import sys
+import time
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generation_cache import add_cache_arguments, apply_cache_arguments
+from build_manifest import BuildManifest, input_fingerprint
+from job_scheduler import JobScheduler
 
 # Educational game templates for Noyola Hub
 # Designed for Emma (10) and Liam (8)
@@ -201,6 +205,154 @@ def apply_theme(items: list[dict], theme: str, style: str = None) -> list[dict]:
     return themed
 
 
+def prepare_assets(template: dict, theme: str, game_id: str, style: str = None) -> dict:
+    """Expand a template into themed asset lists with game-ID-prefixed audio paths."""
+    assets = {
+        "sprites": apply_theme(template.get("sprites", []), theme, style),
+        "backgrounds": apply_theme(template.get("backgrounds", []), theme, style),
+        "music": [item.copy() for item in template.get("music", [])],
+        "sfx": [item.copy() for item in template.get("sfx", [])],
+        "voice": [item.copy() for item in template.get("voice", [])],
+    }
+
+    # Update music/sfx/voice paths to include game ID
+    for item in assets["music"]:
+        item["filename"] = f"{game_id}/{item['filename']}"
+        item["prompt"] = f"{theme}, {item['prompt']}"
+    for item in assets["sfx"]:
+        item["filename"] = f"{game_id}/{item['filename']}"
+    for item in assets["voice"]:
+        item["filename"] = f"{game_id}/{item['filename']}"
+
+    return assets
+
+
+def default_generators() -> dict:
+    """Import the real provider-backed generators (deferred so --dry-run needs no API packages)."""
+    from generate_image import generate_image
+    from generate_music import generate_music
+    from generate_sfx import generate_sfx
+    from generate_voice import generate_voice
+
+    return {"image": generate_image, "music": generate_music, "sfx": generate_sfx, "voice": generate_voice}
+
+
+def schedule_assets(
+    scheduler: JobScheduler,
+    assets: dict,
+    generators: dict,
+    skip_images: bool = False,
+    skip_music: bool = False,
+    skip_sfx: bool = False,
+    skip_voice: bool = False,
+    manifest: BuildManifest = None,
+    force: bool = False,
+    optimize_images: bool = False,
+    process_audio: bool = False,
+) -> int:
+    """
+    Queue one job per asset on the provider that generates it.
+    
+    With a manifest, assets whose inputs and outputs are unchanged since the
+    last successful run are skipped. With optimize_images, generated PNGs are
+    palette-optimized and get WebP variants; with process_audio, audio clips
+    are trimmed and loudness-normalized (music also gets loop points).
+    Returns the number of skipped assets.
+    """
+    skipped = 0
+    
+    def queue(provider: str, func, category: str, **kwargs):
+        nonlocal skipped
+        output = kwargs["output_path"]
+        if manifest is not None and not force:
+            if not manifest.needs_build(output, input_fingerprint(category, kwargs)):
+                skipped += 1
+                return
+        scheduler.submit(provider, func, label=output, category=category, **kwargs)
+    
+    if not skip_images:
+        # Only passed when set, so manifests written without --optimize stay valid
+        image_options = {"optimize": True} if optimize_images else {}
+        for category, asset_type in (("sprites", "sprite"), ("backgrounds", "background")):
+            for item in assets[category]:
+                queue(
+                    "gemini", generators["image"], category,
+                    prompt=item["prompt"],
+                    output_path=f"assets/{category}/{item['filename']}",
+                    style=item.get("style"),
+                    asset_type=asset_type,
+                    **image_options,
+                )
+    
+    audio_options = {"process": True} if process_audio else {}
+    
+    if not skip_music:
+        # Tracks over 22s are generated as concurrent segments and stitched into one loop
+        for item in assets["music"]:
+            queue(
+                "elevenlabs", generators["music"], "music",
+                prompt=item["prompt"],
+                output_path=f"assets/audio/{item['filename']}",
+                duration=item.get("duration"),
+                **audio_options,
+            )
+    
+    if not skip_sfx:
+        for item in assets["sfx"]:
+            queue(
+                "elevenlabs", generators["sfx"], "sfx",
+                prompt=item["prompt"],
+                output_path=f"assets/audio/{item['filename']}",
+                duration=item.get("duration"),
+                **audio_options,
+            )
+    
+    if not skip_voice:
+        for item in assets["voice"]:
+            queue(
+                "cartesia", generators["voice"], "voice",
+                text=item["text"],
+                output_path=f"assets/audio/{item['filename']}",
+                voice="cheerful_female",
+                **audio_options,
+            )
+    
+    return skipped
+
+
+def run_jobs(scheduler: JobScheduler, manifest: BuildManifest = None, failures: list = None) -> dict:
+    """
+    Run all queued jobs, collect generated paths per category and update the manifest.
+
+    Jobs that still fail after the request layer's retries are recorded in the
+    manifest (so the next run retries them) and appended to `failures` as
+    (label, error).
+    """
+    generated = {"sprites": [], "backgrounds": [], "music": [], "sfx": [], "voice": []}
+    for result in scheduler.run():
+        job = result.job
+        fingerprint = input_fingerprint(job.category, job.kwargs)
+        paths = result.value if isinstance(result.value, list) else [result.value]
+        paths = [p for p in paths if p] if result.ok else []
+        
+        if not paths:
+            error = result.error or RuntimeError("no output produced")
+            print(f"  Error ({result.label}): {type(error).__name__}: {error}")
+            if failures is not None:
+                failures.append((result.label, error))
+            if manifest is not None:
+                manifest.record_failure(job.label, fingerprint, error)
+                manifest.save()
+            continue
+        
+        generated[job.category].extend(paths)
+        if manifest is not None:
+            # Saved after every asset so a crash keeps everything finished so far
+            manifest.record(job.label, fingerprint, paths, seconds=result.seconds)
+            manifest.save()
+    return generated
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate assets for a new Noyola Hub educational game",
@@ -234,8 +386,14 @@ Assets are saved to: assets/audio/[game-id]/ and assets/sprites/, assets/backgro
     parser.add_argument("--skip-sfx", action="store_true", help="Skip sound effect generation")
     parser.add_argument("--skip-voice", action="store_true", help="Skip voice generation")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be generated without doing it")
+    parser.add_argument("--force", action="store_true", help="Regenerate every asset, even if the build manifest says it is up to date")
+    parser.add_argument("--optimize", action="store_true", help="Optimize generated images (palette PNG + WebP variants)")
+    parser.add_argument("--process-audio", action="store_true", help="Trim and loudness-normalize generated audio (music also gets loop points)")
+    parser.add_argument("--precache", action="store_true", help="Rebuild precache-manifest.json and service-worker.js afterwards (tools/build_precache.py)")
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
+    apply_cache_arguments(args)
     
     template = GAME_TEMPLATES[args.game]
     game_id = args.id
@@ -247,20 +405,12 @@ Assets are saved to: assets/audio/[game-id]/ and assets/sprites/, assets/backgro
     print()
     
     # Prepare all assets with theme applied
-    sprites = apply_theme(template.get("sprites", []), args.theme, args.style)
-    backgrounds = apply_theme(template.get("backgrounds", []), args.theme, args.style)
-    music = template.get("music", [])
-    sfx = template.get("sfx", [])
-    voice = template.get("voice", [])
-    
-    # Update music/sfx/voice paths to include game ID
-    for item in music:
-        item["filename"] = f"{game_id}/{item['filename']}"
-        item["prompt"] = f"{args.theme}, {item['prompt']}"
-    for item in sfx:
-        item["filename"] = f"{game_id}/{item['filename']}"
-    for item in voice:
-        item["filename"] = f"{game_id}/{item['filename']}"
+    assets = prepare_assets(template, args.theme, game_id, args.style)
+    sprites = assets["sprites"]
+    backgrounds = assets["backgrounds"]
+    music = assets["music"]
+    sfx = assets["sfx"]
+    voice = assets["voice"]
     
     if args.dry_run:
         print("DRY RUN - Would generate:")
@@ -281,91 +431,47 @@ Assets are saved to: assets/audio/[game-id]/ and assets/sprites/, assets/backgro
             print(f"  - {v['filename'].split('/')[-1]}: \"{v['text'][:40]}...\"")
         
         print(f"\n--- Estimated Cost ---")
+        from generate_music import plan_segments
         image_count = len(sprites) + len(backgrounds)
+        # Tracks over 22s cost one request per stitched segment
+        music_requests = sum(plan_segments(m["duration"])[0] if m.get("duration", 0) > 22 else 1 for m in music)
         print(f"Images (Gemini): ~${image_count * 0.04:.2f} ({image_count} × $0.04)")
-        print(f"Music (Suno):    ~${len(music) * 0.03:.2f} ({len(music)} × $0.03)")
+        print(f"Music (11Labs):  ~${music_requests * 0.03:.2f} ({music_requests} segments × $0.03)")
         print(f"SFX (11Labs):    ~${len(sfx) * 0.02:.2f} ({len(sfx)} × $0.02)")
         print(f"Voice (Cartesia):~${len(voice) * 0.01:.2f} ({len(voice)} × $0.01)")
-        print(f"Total:           ~${image_count * 0.04 + len(music) * 0.03 + len(sfx) * 0.02 + len(voice) * 0.01:.2f}")
+        print(f"Total:           ~${image_count * 0.04 + music_requests * 0.03 + len(sfx) * 0.02 + len(voice) * 0.01:.2f}")
         return
     
-    from generate_image import generate_image
-    from generate_sfx import generate_sfx
-    from generate_voice import generate_voice
-    import time
-    
-    generated = {"sprites": [], "backgrounds": [], "music": [], "sfx": [], "voice": []}
-    
-    # Generate sprites
-    if not args.skip_images and sprites:
-        print(f"\n--- Generating {len(sprites)} sprites ---")
-        for item in sprites:
-            output = f"assets/sprites/{item['filename']}"
-            try:
-                path = generate_image(
-                    prompt=item["prompt"],
-                    output_path=output,
-                    style=item.get("style"),
-                    asset_type="sprite",
-                )
-                generated["sprites"].extend(path if isinstance(path, list) else [path])
-                time.sleep(1)
-            except Exception as e:
-                print(f"  Error: {e}")
-    
-    # Generate backgrounds
-    if not args.skip_images and backgrounds:
-        print(f"\n--- Generating {len(backgrounds)} backgrounds ---")
-        for item in backgrounds:
-            output = f"assets/backgrounds/{item['filename']}"
-            try:
-                path = generate_image(
-                    prompt=item["prompt"],
-                    output_path=output,
-                    style=item.get("style"),
-                    asset_type="background",
-                )
-                generated["backgrounds"].extend(path if isinstance(path, list) else [path])
-                time.sleep(1)
-            except Exception as e:
-                print(f"  Error: {e}")
+    manifest = BuildManifest.load(game_id)
+    scheduler = JobScheduler()
+    skipped = schedule_assets(
+        scheduler,
+        assets,
+        default_generators(),
+        skip_images=args.skip_images,
+        skip_music=args.skip_music,
+        skip_sfx=args.skip_sfx,
+        skip_voice=args.skip_voice,
+        manifest=manifest,
+        force=args.force,
+        optimize_images=args.optimize,
+        process_audio=args.process_audio,
+    )
     
-    # Generate music (requires Suno API key)
-    if not args.skip_music and music:
-        print(f"\n--- Music generation requires SUNO_API_KEY ---")
-        print(f"  Skipping {len(music)} tracks. Use Lyria 2 manually or add SUNO_API_KEY to .env")
+    if skipped:
+        print(f"\n--- {skipped} assets up to date (manifest: {manifest.path}) ---")
     
-    # Generate SFX
-    if not args.skip_sfx and sfx:
-        print(f"\n--- Generating {len(sfx)} sound effects ---")
-        for item in sfx:
-            output = f"assets/audio/{item['filename']}"
-            try:
-                path = generate_sfx(
-                    prompt=item["prompt"],
-                    output_path=output,
-                    duration=item.get("duration"),
-                )
-                generated["sfx"].append(path)
-                time.sleep(1)
-            except Exception as e:
-                print(f"  Error: {e}")
+    # Independent assets run in parallel, bounded per provider by PROVIDER_LIMITS
+    print(f"\n--- Generating {len(scheduler.jobs)} assets ---")
+    for provider in sorted({job.provider for job in scheduler.jobs}):
+        limits = scheduler.provider_limits(provider)
+        count = sum(1 for job in scheduler.jobs if job.provider == provider)
+        print(f"  {provider}: {count} jobs, {limits['concurrency']} workers, {limits['requests_per_minute']} req/min")
     
-    # Generate voice
-    if not args.skip_voice and voice:
-        print(f"\n--- Generating {len(voice)} voice lines ---")
-        for item in voice:
-            output = f"assets/audio/{item['filename']}"
-            try:
-                path = generate_voice(
-                    text=item["text"],
-                    output_path=output,
-                    voice="cheerful_female",
-                )
-                generated["voice"].append(path)
-                time.sleep(1)
-            except Exception as e:
-                print(f"  Error: {e}")
+    start = time.perf_counter()
+    failures = []
+    generated = run_jobs(scheduler, manifest, failures)
+    elapsed = time.perf_counter() - start
     
     # Summary
     print("\n" + "=" * 50)
@@ -373,14 +479,31 @@ Assets are saved to: assets/audio/[game-id]/ and assets/sprites/, assets/backgro
     print("=" * 50)
     print(f"Sprites:     {len(generated['sprites'])}")
     print(f"Backgrounds: {len(generated['backgrounds'])}")
-    print(f"Music:       {len(generated['music'])} (manual via Lyria 2)")
+    print(f"Music:       {len(generated['music'])}")
     print(f"SFX:         {len(generated['sfx'])}")
     print(f"Voice:       {len(generated['voice'])}")
+    if failures:
+        print(f"Failed:      {len(failures)} (retried on the next run)")
+        for label, error in failures:
+            print(f"  - {label}: {type(error).__name__}: {error}")
+    print(f"Elapsed:     {elapsed:.1f}s")
     print(f"\nAssets saved to:")
     print(f"  - assets/sprites/")
     print(f"  - assets/backgrounds/")
     print(f"  - assets/audio/{game_id}/")
 
+    # New or changed files only reach installed clients through the precache manifest
+    if any(generated.values()):
+        if args.precache:
+            from build_precache import build as build_precache
+            print()
+            build_precache()
+        else:
+            print("\nRun python tools/build_precache.py (or pass --precache) to ship these to installed clients")
+    
+    if failures:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
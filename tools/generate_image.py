@@ -6,6 +6,7 @@ Usage:
     python generate_image.py --prompt "golden coin spinning" --type sprite --style pixel-art --output assets/sprites/coin.png
     python generate_image.py -p "magical forest background" -t background -s painterly -o assets/backgrounds/forest.png
     python generate_image.py -p "Game Over text" -t ui --quality -o assets/ui/gameover.png
+    python generate_image.py -p "slime enemy" -s pixel-art -o assets/sprites/slime.png --optimize
 """
 from __future__ import annotations  # Python 3.7 compatibility
 import argparse
@@ -16,7 +17,12 @@ from typing import List
 
 # Add parent directory for config import
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import GOOGLE_API_KEY, IMAGE_DEFAULTS
+from config import IMAGE_DEFAULTS
+from genai_client import genai_error, require_client
+from generation_cache import add_cache_arguments, apply_cache_arguments, endpoint_tag, get_cache, output_name_with_index
+from provider_errors import ProviderError
+from request_policy import call_with_retry_sync
+from streaming import AtomicFile
 
 # Style modifiers for consistent game art
 STYLE_MODIFIERS = {
@@ -40,6 +46,38 @@ TYPE_MODIFIERS = {
 }
 
 
+def _optimize_saved(paths: List[str], style: str = None) -> None:
+    """Post-generation hook: shrink PNGs in place and write WebP variants."""
+    from optimize_images import optimize_image
+
+    for path in paths:
+        if not path.lower().endswith(".png"):
+            continue
+        result = optimize_image(path, style=style)
+        if result.error:
+            print(f"  Warning: could not optimize {path}: {result.error}")
+        elif result.action != "unchanged":
+            print(f"  Optimized ({result.action}): {result.original_bytes // 1024} KB -> {result.png_bytes // 1024} KB"
+                  f", WebP {result.webp_bytes // 1024} KB")
+
+
+def _post_process(paths: List[str], style: str, asset_type: str, size: str,
+                  resize: bool, hidpi: bool, optimize: bool) -> List[str]:
+    """Resize (and optionally optimize) saved images. Returns them plus any @2x variants."""
+    if resize:
+        from resize_images import hidpi_path, resize_image
+
+        for path in list(paths):
+            written = resize_image(path, asset_type=asset_type, style=style, size=size, hidpi=hidpi)
+            if written:
+                print(f"  Resized: {', '.join(written)}")
+            if hidpi and hidpi_path(path) in written:
+                paths.append(hidpi_path(path))
+    if optimize:
+        _optimize_saved(paths, style)
+    return paths
+
+
 def generate_image(
     prompt: str,
     output_path: str,
@@ -47,6 +85,9 @@ def generate_image(
     asset_type: str = "sprite",
     quality: bool = False,
     size: str = None,
+    optimize: bool = False,
+    resize: bool = True,
+    hidpi: bool = False,
 ) -> List[str]:
     """
     Generate an image using Google Gemini API.
@@ -57,23 +98,17 @@ def generate_image(
         style: Art style (pixel-art, painterly, etc.)
         asset_type: Type of asset (sprite, background, ui)
         quality: Use higher quality model (better for text)
-        size: Image size (default based on type)
+        size: Target size, e.g. 256x256 (default based on type and style, see IMAGE_DEFAULTS)
+        optimize: Run the saved images through optimize_images (palette/recompress + WebP)
+        resize: Downscale to the target size (nearest-neighbour for pixel styles)
+        hidpi: With resize, also save an @2x variant
     
     Returns:
         List of saved file paths
-    """
-    try:
-        from google import genai
-        from google.genai import types
-    except ImportError:
-        print("Error: google-genai package not installed.")
-        print("Run: pip install google-genai")
-        sys.exit(1)
-    
-    if not GOOGLE_API_KEY:
-        print("Error: GOOGLE_API_KEY not set in .env or environment")
-        sys.exit(1)
     
+    Raises:
+        ProviderError: If the API key is missing or the request fails after retries
+    """
     # Build enhanced prompt
     enhanced_parts = []
     
@@ -101,17 +136,29 @@ def generate_image(
     print(f"  Type: {asset_type}")
     print(f"  Model: {model_name}")
     
-    # Initialize client
-    client = genai.Client(api_key=GOOGLE_API_KEY)
+    # Identical prompt + model was already rendered: reuse it
+    cache = get_cache()
+    cache_key = cache.make_key("gemini-image", {
+        "model": model_name,
+        "contents": enhanced_prompt,
+        "response_modalities": ["TEXT", "IMAGE"],
+        **endpoint_tag("gemini"),
+    })
+    cached = cache.fetch(cache_key, lambda index, count: output_name_with_index(output_path, index))
+    if cached:
+        return _post_process(cached, style, asset_type, size, resize, hidpi, optimize)
+    
+    # Shared client: google.genai is imported and the client built on the first call only
+    client, types = require_client()
     
-    # Generate image
-    response = client.models.generate_content(
+    # Generate image (rate-limited, retried on 429/5xx)
+    response = call_with_retry_sync("gemini", lambda: client.models.generate_content(
         model=model_name,
         contents=enhanced_prompt,
         config=types.GenerateContentConfig(
             response_modalities=["TEXT", "IMAGE"]
         )
-    )
+    ), classify=genai_error)
     
     # Process response and save images
     output_dir = Path(output_path).parent
@@ -125,21 +172,21 @@ def generate_image(
             image_count += 1
             
             # Determine output filename
-            if image_count == 1:
-                save_path = Path(output_path)
-            else:
-                base = Path(output_path)
-                save_path = base.parent / f"{base.stem}_{image_count}{base.suffix}"
+            save_path = Path(output_name_with_index(output_path, image_count - 1))
             
-            # Save the image
+            # Save the image (temp file + rename, never a half-written PNG)
             image = part.inline_data
-            with open(save_path, 'wb') as f:
+            with AtomicFile(str(save_path)) as f:
                 f.write(image.data)
             
             print(f"  Saved: {save_path}")
             saved_paths.append(str(save_path))
     
-    if not saved_paths:
+    if saved_paths:
+        # Cache the model's original bytes; resizing/optimization are separate, repeatable steps
+        cache.store(cache_key, saved_paths)
+        saved_paths = _post_process(saved_paths, style, asset_type, size, resize, hidpi, optimize)
+    else:
         print("  Warning: No images in response")
         # Check for text response
         for part in response.candidates[0].content.parts:
@@ -174,18 +221,30 @@ Types: sprite, background, ui, icon, tileset
     parser.add_argument("--style", "-s", choices=list(STYLE_MODIFIERS.keys()), help="Art style")
     parser.add_argument("--type", "-t", dest="asset_type", choices=list(TYPE_MODIFIERS.keys()), default="sprite", help="Asset type")
     parser.add_argument("--quality", "-q", action="store_true", help="Use higher quality model (better for text)")
-    parser.add_argument("--size", help="Image size (e.g., 1024x1024)")
+    parser.add_argument("--size", help="Target size (e.g., 256x256; default based on type and style)")
+    parser.add_argument("--no-resize", action="store_true", help="Keep the model's output resolution")
+    parser.add_argument("--hidpi", action="store_true", help="Also save an @2x variant at twice the target size")
+    parser.add_argument("--optimize", action="store_true", help="Shrink the PNG and write a .webp variant (optimize_images.py)")
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
+    apply_cache_arguments(args)
     
-    paths = generate_image(
-        prompt=args.prompt,
-        output_path=args.output,
-        style=args.style,
-        asset_type=args.asset_type,
-        quality=args.quality,
-        size=args.size,
-    )
+    try:
+        paths = generate_image(
+            prompt=args.prompt,
+            output_path=args.output,
+            style=args.style,
+            asset_type=args.asset_type,
+            quality=args.quality,
+            size=args.size,
+            optimize=args.optimize,
+            resize=not args.no_resize,
+            hidpi=args.hidpi,
+        )
+    except ProviderError as e:
+        print(f"  Error: {e}")
+        sys.exit(1)
     
     if paths:
         print(f"\nGenerated {len(paths)} image(s)")
@@ -6,27 +6,44 @@ Usage:
     python generate_music.py --prompt "educational game menu music, welcoming, magical, loopable, instrumental" --duration 20 --output assets/audio/game/music/menu.mp3
     python generate_music.py -p "adventure gameplay music, focused but fun, not distracting, instrumental" -d 22 -o assets/audio/game/music/gameplay.mp3
     python generate_music.py -p "victory fanfare, achievement unlocked, triumphant" -d 5 -o assets/audio/game/music/victory.mp3
+    python generate_music.py -p "calm exploration theme, instrumental" -d 120 -o assets/audio/game/music/explore.wav
+
+Tracks longer than 22 seconds are generated as concurrent segments and stitched
+into one loopable file (see generate_long_music_async()).
 """
 import argparse
+import asyncio
+import json
+import math
 import os
 import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import List
+
+import numpy as np
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import ELEVENLABS_API_KEY, MUSIC_DEFAULTS
+from config import ELEVENLABS_API_KEY, MUSIC_DEFAULTS, PROVIDER_URLS
+from async_http import download, run_sync
+from generation_cache import add_cache_arguments, apply_cache_arguments, get_cache
+from provider_errors import ConfigurationError, ProviderError
+from streaming import AtomicFile, PcmWriter, require_encoder
 
 # ElevenLabs Sound Generation API endpoint (same as SFX, but used for music)
-ELEVENLABS_MUSIC_URL = "https://api.elevenlabs.io/v1/sound-generation"
+ELEVENLABS_MUSIC_URL = f"{PROVIDER_URLS['elevenlabs']}/v1/sound-generation"
 
 
-def generate_music(
+async def generate_music_async(
     prompt: str,
     output_path: str,
     duration: float = None,
     output_format: str = None,
 ) -> str:
     """
-    Generate a music track using ElevenLabs API.
+    Generate a music track using ElevenLabs API (async, pooled connection, streamed to disk).
     
     Args:
         prompt: Description of the music track (should include "instrumental" for game music)
@@ -36,17 +53,12 @@ def generate_music(
     
     Returns:
         Path to saved file
-    """
-    try:
-        import requests
-    except ImportError:
-        print("Error: requests package not installed.")
-        print("Run: pip install requests")
-        sys.exit(1)
     
+    Raises:
+        ProviderError: If the API key is missing or the request fails
+    """
     if not ELEVENLABS_API_KEY:
-        print("Error: ELEVENLABS_API_KEY not set in .env or environment")
-        sys.exit(1)
+        raise ConfigurationError("ELEVENLABS_API_KEY not set in .env or environment", provider="elevenlabs")
     
     # Use default duration from config if not specified
     if duration is None:
@@ -79,32 +91,308 @@ def generate_music(
     print(f"  Duration: {duration}s")
     print(f"  Output: {output_path}")
     
-    # Make request
-    response = requests.post(url, headers=headers, json=data)
+    cache = get_cache()
+    cache_key = cache.make_key("elevenlabs-music", {"url": url, "data": data})
+    if cache.fetch(cache_key, lambda index, count: output_path):
+        return output_path
     
-    if response.status_code != 200:
-        print(f"  Error: API returned {response.status_code}")
-        try:
-            error_detail = response.json()
-            print(f"  Detail: {error_detail}")
-        except:
-            print(f"  Response: {response.text[:200]}")
-        sys.exit(1)
+    # Make request, streaming the audio straight to disk
+    response = await download("elevenlabs", "POST", url, output_path, headers=headers, json=data)
     
-    # Save audio
-    output_dir = Path(output_path).parent
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if response.status != 200:
+        raise response.error("elevenlabs")
     
-    with open(output_path, 'wb') as f:
-        f.write(response.content)
+    cache.store(cache_key, [output_path])
     
-    file_size = len(response.content) / 1024
+    file_size = response.bytes_streamed / 1024
     print(f"  Saved: {output_path} ({file_size:.1f} KB)")
-    print(f"  Note: For longer loops, you may need to concatenate multiple files or use audio editing software")
     
     return output_path
 
 
+# --- Long tracks: concurrent segments, beat-aligned crossfades ---
+
+ONSET_HOP = 512   # Samples per onset-envelope frame (~12 ms at 44.1 kHz)
+
+
+@dataclass
+class SegmentTiming:
+    """How one segment request went (seconds relative to the first request)."""
+    index: int
+    started: float
+    seconds: float
+    bytes: int
+
+
+def plan_segments(duration: float) -> tuple:
+    """
+    Split a long track into segments.
+
+    Returns:
+        (segment count, seconds per segment), sized so that after the crossfades
+        the stitched loop is about `duration` long
+    """
+    # Each segment loses one crossfade plus, on average, half the largest beat shift
+    overlap = MUSIC_DEFAULTS["crossfade_seconds"] + MUSIC_DEFAULTS["max_align_seconds"] / 2
+    longest = MUSIC_DEFAULTS["max_segment_seconds"]
+    count = max(2, math.ceil(duration / (longest - overlap)))
+    return count, round(min(longest, duration / count + overlap), 2)
+
+
+def segment_prompt(prompt: str, index: int, count: int) -> str:
+    """Per-segment prompt; also keeps each segment's cache key distinct."""
+    return f"{prompt}, section {index + 1} of {count} of one continuous piece, steady tempo and key"
+
+
+def _pcm_rate(segment_format: str) -> int:
+    kind, _, rate = segment_format.partition("_")
+    if kind != "pcm" or not rate.isdigit():
+        raise ProviderError(f"Segment format must be raw PCM (pcm_<rate>), got {segment_format}", provider="elevenlabs")
+    return int(rate)
+
+
+def _read_pcm(path: str, start: int = 0, count: int = -1) -> np.ndarray:
+    """16-bit little-endian mono PCM samples [start, start + count) as float32."""
+    return np.fromfile(path, dtype="<i2", count=count, offset=start * 2).astype(np.float32) / 32768.0
+
+
+def _onset_envelope(samples: np.ndarray) -> np.ndarray:
+    """Rises in log energy per frame: peaks on note and drum onsets."""
+    frames = len(samples) // ONSET_HOP
+    energy = (samples[:frames * ONSET_HOP].reshape(frames, ONSET_HOP) ** 2).mean(axis=1)
+    log_energy = np.log10(energy + 1e-10)
+    return np.maximum(np.diff(log_energy, prepend=log_energy[:1]), 0.0)
+
+
+def beat_offset(tail: np.ndarray, head: np.ndarray, max_shift: int) -> int:
+    """
+    Samples to skip at the start of `head` so its onsets line up with `tail`'s.
+
+    Compares the onset envelope of the outgoing segment's crossfade region with
+    the incoming segment's at every shift up to `max_shift` samples and keeps
+    the best normalized correlation, so the crossfade lands on the beat.
+    """
+    reference = _onset_envelope(tail)
+    candidate = _onset_envelope(head)
+    shifts = min(max_shift // ONSET_HOP, len(candidate) - len(reference))
+    reference = reference - reference.mean()
+    if shifts <= 0 or not reference.any():
+        return 0
+    best, best_score = 0, -np.inf
+    for shift in range(shifts + 1):
+        window = candidate[shift:shift + len(reference)]
+        window = window - window.mean()
+        norm = np.linalg.norm(window) * np.linalg.norm(reference)
+        score = float(window @ reference) / norm if norm else 0.0
+        if score > best_score:
+            best, best_score = shift, score
+    return best * ONSET_HOP
+
+
+def _to_pcm16(block: np.ndarray) -> bytes:
+    return (np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def stitch_segments(paths: List[str], output_path: str, rate: int) -> dict:
+    """
+    Crossfade PCM segments into one loopable track, one segment in memory at a time.
+
+    Each segment's start is shifted (beat_offset) to line up with the previous
+    segment's ending, then the two overlap for crossfade_seconds with an
+    equal-power fade. The last segment crossfades back into the first, and the
+    file starts right after that overlap, so playback can loop end -> start.
+
+    Returns:
+        {"frames", "seconds", "offsets"} describing the stitched track
+    """
+    fade = int(MUSIC_DEFAULTS["crossfade_seconds"] * rate)
+    max_shift = int(MUSIC_DEFAULTS["max_align_seconds"] * rate)
+    lengths = [os.path.getsize(path) // 2 for path in paths]
+    count = len(paths)
+
+    # Pass 1: alignment only needs each tail and the following head
+    offsets = [0] * count
+    for i in range(count):
+        following = (i + 1) % count
+        tail = _read_pcm(paths[i], start=lengths[i] - fade, count=fade)
+        head = _read_pcm(paths[following], count=fade + max_shift)
+        offsets[following] = beat_offset(tail, head, max_shift)
+    for i in range(count):
+        if lengths[i] < offsets[i] + 2 * fade:
+            raise ProviderError(f"Segment {i + 1} is too short to crossfade ({lengths[i] / rate:.1f}s)", provider="elevenlabs")
+
+    # Pass 2: body of each segment, then its crossfade into the next
+    frames = sum(length - offset - fade for length, offset in zip(lengths, offsets))
+    curve = np.linspace(0.0, np.pi / 2, fade, dtype=np.float32)
+    fade_out, fade_in = np.cos(curve), np.sin(curve)
+    writer = PcmWriter(output_path, rate)
+    try:
+        for i in range(count):
+            following = (i + 1) % count
+            segment = _read_pcm(paths[i])
+            writer.write(_to_pcm16(segment[offsets[i] + fade:lengths[i] - fade]))
+            head = _read_pcm(paths[following], start=offsets[following], count=fade)
+            writer.write(_to_pcm16(segment[lengths[i] - fade:] * fade_out + head * fade_in))
+        writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+    return {"frames": frames, "seconds": round(frames / rate, 3), "offsets": [round(o / rate, 4) for o in offsets]}
+
+
+async def generate_long_music_async(
+    prompt: str,
+    output_path: str,
+    duration: float,
+    segment_format: str = None,
+) -> str:
+    """
+    Generate a track longer than one ElevenLabs request allows.
+
+    Requests every segment concurrently (bounded by the process-wide ElevenLabs
+    concurrency in PROVIDER_LIMITS, shared with every other track), then
+    stitches them into one loopable file with stitch_segments(). Segments go through generate_music_async(), so each is
+    cached on its own and a re-run only pays for segments that changed.
+    Per-segment timings are written next to the track as <name>.segments.json.
+    
+    Args:
+        prompt: Description of the music track
+        output_path: Where to save the stitched track (.wav, or any soundfile format)
+        duration: Target loop length in seconds
+        segment_format: Raw PCM format to request segments in (default: MUSIC_DEFAULTS)
+    
+    Returns:
+        Path to saved file
+    
+    Raises:
+        ProviderError: If the API key is missing or any segment request fails
+        ConfigurationError: If the output format needs soundfile and it isn't installed
+    """
+    require_encoder(output_path)
+    segment_format = segment_format or MUSIC_DEFAULTS["segment_format"]
+    rate = _pcm_rate(segment_format)
+    count, length = plan_segments(duration)
+    print(f"Generating long music: {prompt[:60]}...")
+    print(f"  Duration: {duration}s as {count} segments of {length}s")
+    
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=Path(output_path).parent, prefix=".segments-") as work_dir:
+        paths = [os.path.join(work_dir, f"segment_{i + 1}.pcm") for i in range(count)]
+        timings: List[SegmentTiming] = []
+        start = time.perf_counter()
+        
+        async def segment(index: int) -> None:
+            # In-flight requests are capped per provider in async_http, not per track
+            began = time.perf_counter()
+            await generate_music_async(segment_prompt(prompt, index, count), paths[index], length, segment_format)
+            timings.append(SegmentTiming(
+                index=index + 1,
+                started=round(began - start, 3),
+                seconds=round(time.perf_counter() - began, 3),
+                bytes=os.path.getsize(paths[index]),
+            ))
+        
+        await asyncio.gather(*(segment(i) for i in range(count)))
+        wall = time.perf_counter() - start
+        track = await asyncio.to_thread(stitch_segments, paths, output_path, rate)
+    
+    timings.sort(key=lambda timing: timing.index)
+    serial = sum(timing.seconds for timing in timings)
+    print(f"  Segments: {wall:.1f}s wall for {serial:.1f}s of requests")
+    for timing in timings:
+        print(f"    {timing.index}: +{timing.started:.1f}s, {timing.seconds:.1f}s, {timing.bytes // 1024} KB")
+    print(f"  Saved: {output_path} ({track['seconds']:.1f}s loop)")
+    
+    report = {
+        "prompt": prompt,
+        "duration": duration,
+        "segment_seconds": length,
+        "crossfade_seconds": MUSIC_DEFAULTS["crossfade_seconds"],
+        "segments": [asdict(timing) for timing in timings],
+        "segments_wall_seconds": round(wall, 3),
+        **track,
+    }
+    with AtomicFile(str(Path(output_path).with_suffix(".segments.json"))) as f:
+        f.write(json.dumps(report, indent=2).encode("utf-8"))
+    return output_path
+
+
+def _write_pcm(raw_path: str, output_path: str, rate: int) -> int:
+    """Copy raw 16-bit mono PCM into output_path's format (WAV header, or encoded by soundfile)."""
+    writer = PcmWriter(output_path, rate)
+    try:
+        with open(raw_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                writer.write(chunk)
+        writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.frames
+
+
+async def generate_pcm_music_async(prompt: str, output_path: str, duration: float = None) -> str:
+    """
+    One ElevenLabs request saved as a real .wav (or other soundfile format).
+
+    ElevenLabs only returns MP3 or raw PCM, so the track is requested as
+    MUSIC_DEFAULTS["segment_format"] and written through PcmWriter, like
+    stitched tracks.
+    """
+    require_encoder(output_path)
+    segment_format = MUSIC_DEFAULTS["segment_format"]
+    rate = _pcm_rate(segment_format)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=Path(output_path).parent, prefix=".pcm-") as work_dir:
+        raw_path = os.path.join(work_dir, "track.pcm")
+        await generate_music_async(prompt, raw_path, duration, segment_format)
+        frames = await asyncio.to_thread(_write_pcm, raw_path, output_path, rate)
+    print(f"  Saved: {output_path} ({frames / rate:.1f}s)")
+    return output_path
+
+
+def generate_music(
+    prompt: str,
+    output_path: str,
+    duration: float = None,
+    output_format: str = None,
+    process: bool = False,
+) -> str:
+    """
+    Generate a music track using ElevenLabs API.
+    
+    Blocking wrapper around generate_music_async(), or generate_long_music_async()
+    for durations over 22 seconds.
+    
+    Args:
+        prompt: Description of the music track (should include "instrumental" for game music)
+        output_path: Where to save the audio file
+        duration: Duration in seconds (over 22 is stitched from segments; None for the default)
+        output_format: Audio format (mp3_44100_128, pcm_48000, etc.; single requests only).
+            Default: MP3 for .mp3 paths; other extensions get PCM written in that format
+        process: Trim silence and normalize loudness after saving (writes a sidecar with loop points)
+    
+    Returns:
+        Path to saved file
+    
+    Raises:
+        ProviderError: If the API key is missing or a request fails after retries
+    """
+    stitched = duration is not None and duration > MUSIC_DEFAULTS["max_segment_seconds"]
+    if stitched:
+        path = run_sync(generate_long_music_async(prompt, output_path, duration))
+    elif output_format is None and Path(output_path).suffix.lower() != ".mp3":
+        # The default MP3 bytes would otherwise be saved under a .wav name
+        path = run_sync(generate_pcm_music_async(prompt, output_path, duration))
+    else:
+        path = run_sync(generate_music_async(prompt, output_path, duration, output_format))
+    if process:
+        from process_audio import process_saved
+        # Stitched tracks already crossfade their end into their start: loop the whole file
+        process_saved(path, audio_type="music", seamless=stitched)
+    return path
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate music tracks using ElevenLabs API",
@@ -126,8 +414,11 @@ Examples:
   python generate_music.py -p "fantasy adventure music, epic but playful, instrumental" -d 20 -o assets/audio/game/music/adventure.mp3
   python generate_music.py -p "space exploration music, mysterious but fun, electronic, instrumental" -d 18 -o assets/audio/game/music/space.mp3
 
-Duration: 0.5-22 seconds (ElevenLabs limit)
-For longer loops: Generate multiple segments and concatenate, or loop in-game
+  # Long loops (stitched from concurrent 22s segments)
+  python generate_music.py -p "calm exploration theme, loopable, instrumental" -d 120 -o assets/audio/game/music/explore.wav
+
+Duration: 0.5-22 seconds per request (ElevenLabs limit); longer durations are
+generated as segments and crossfaded into one loopable track
 
 Tip: Always include "instrumental" in prompts for game music (no vocals)
         """
@@ -135,17 +426,26 @@ Tip: Always include "instrumental" in prompts for game music (no vocals)
     
     parser.add_argument("--prompt", "-p", required=True, help="Music description (include 'instrumental' for game music)")
     parser.add_argument("--output", "-o", required=True, help="Output file path")
-    parser.add_argument("--duration", "-d", type=float, help="Duration in seconds (0.5-22, default: 20)")
-    parser.add_argument("--format", "-f", help="Output format (default: mp3_44100_128)")
+    parser.add_argument("--duration", "-d", type=float, help="Duration in seconds (default: 20; over 22 is stitched from segments)")
+    parser.add_argument("--format", "-f", help="Output format (default: mp3_44100_128 for .mp3, PCM written as WAV etc. otherwise)")
+    parser.add_argument("--process", action="store_true", help="Trim, normalize loudness and find a loop point after saving (tools/process_audio.py)")
+    
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
+    apply_cache_arguments(args)
     
-    generate_music(
-        prompt=args.prompt,
-        output_path=args.output,
-        duration=args.duration,
-        output_format=args.format,
-    )
+    try:
+        generate_music(
+            prompt=args.prompt,
+            output_path=args.output,
+            duration=args.duration,
+            output_format=args.format,
+            process=args.process,
+        )
+    except ProviderError as e:
+        print(f"  Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
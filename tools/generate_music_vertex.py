@@ -7,40 +7,46 @@ Usage:
     python tools/generate_music_vertex.py --prompt "calm piano melody" --negative "drums, fast tempo" --output menu.wav
 """
 import argparse
-import base64
+import asyncio
 import json
 import os
-import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from async_http import request_stream, run_sync
+from config import PROVIDER_URLS, VERTEX_MUSIC_DEFAULTS
+from gcloud_auth import get_token_provider
+from generation_cache import add_cache_arguments, apply_cache_arguments, endpoint_tag, get_cache
+from provider_errors import ProviderError
+from streaming import PredictionSpool, PredictionStreamDecoder, decode_span
+
+def sample_output_path(output_path: str, index: int, count: int) -> str:
+    """Single clips use output_path as-is; multiple samples get _1, _2... suffixes."""
+    if count == 1:
+        return output_path
+    base = Path(output_path)
+    return str(base.parent / f"{base.stem}_{index + 1}{base.suffix}")
+
+def lyria_url(project_id: str, location: str) -> str:
+    base = PROVIDER_URLS["vertex"] or f"https://{location}-aiplatform.googleapis.com"
+    return f"{base}/v1/projects/{project_id}/locations/{location}/publishers/google/models/lyria-002:predict"
 
 def get_access_token():
-    """Get access token from gcloud CLI."""
-    # Try common gcloud paths on Windows
-    gcloud_paths = [
-        "gcloud",  # If in PATH
-        r"C:\Program Files (x86)\Google\Cloud SDK\google-cloud-sdk\bin\gcloud.cmd",
-        r"C:\Users\mnoyo\AppData\Local\Google\Cloud SDK\google-cloud-sdk\bin\gcloud.cmd",
-    ]
-    
-    for gcloud_cmd in gcloud_paths:
-        try:
-            result = subprocess.run(
-                [gcloud_cmd, "auth", "print-access-token"],
-                capture_output=True,
-                text=True,
-                check=True,
-                shell=True if gcloud_cmd == "gcloud" else False
-            )
-            return result.stdout.strip()
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            continue
-    
-    print("Error: Could not find gcloud command")
-    print("Make sure you're authenticated with: gcloud auth login")
-    sys.exit(1)
+    """Get a gcloud access token (cached in memory and on disk until near expiry)."""
+    return get_token_provider().get_token()
 
-def generate_music(
+
+def auth_headers(access_token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+
+async def generate_music_async(
     prompt: str,
     output_path: str,
     negative_prompt: str = None,
@@ -50,7 +56,7 @@ def generate_music(
     location: str = "us-central1"
 ) -> str:
     """
-    Generate music using Lyria 2 model.
+    Generate music using Lyria 2 model (async, pooled connection, streamed to disk).
     
     Args:
         prompt: Text description of the music to generate (US English)
@@ -63,24 +69,17 @@ def generate_music(
     
     Returns:
         Path to the generated audio file(s)
-    """
-    import requests
     
+    Raises:
+        ProviderError: If authentication or the API request fails
+    """
     # Validate parameters
     if seed is not None and sample_count > 1:
         print("Warning: Cannot use both seed and sample_count > 1. Using seed, ignoring sample_count.")
         sample_count = None
     
-    # Get access token
-    access_token = get_access_token()
-    
     # Prepare request
-    url = f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}/locations/{location}/publishers/google/models/lyria-002:predict"
-    
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    url = lyria_url(project_id, location)
     
     # Build instance
     instance = {
@@ -113,63 +112,53 @@ def generate_music(
     if sample_count and seed is None:
         print(f"   Samples: {sample_count}")
     
-    # Send request
-    try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Error calling Lyria API: {e}")
-        if hasattr(e.response, 'text'):
-            print(f"Response: {e.response.text}")
-        sys.exit(1)
-    
-    # Parse response
-    result = response.json()
-    
-    if "error" in result:
-        print(f"[ERROR] API Error: {result['error']}")
-        sys.exit(1)
-    
-    predictions = result.get("predictions", [])
-    
-    if not predictions:
-        print("[ERROR] No predictions in response")
-        sys.exit(1)
-    
-    # Save audio file(s)
-    output_dir = Path(output_path).parent
-    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = get_cache()
+    cache_key = cache.make_key("vertex-lyria", {"model": "lyria-002", "location": location, "data": data, **endpoint_tag("vertex")})
+    cached = cache.fetch(cache_key, lambda index, count: sample_output_path(output_path, index, count))
+    if cached:
+        return cached[0] if len(cached) == 1 else cached
     
+    for auth_attempt in range(2):
+        # Get access token (a cache miss runs gcloud, so keep it off the event loop)
+        access_token = await asyncio.to_thread(get_access_token)
+        headers = auth_headers(access_token)
+        
+        # Send request, decoding each base64 clip to disk as the JSON streams in
+        decoder = PredictionStreamDecoder(str(Path(output_path).parent), name=Path(output_path).stem)
+        try:
+            response = await request_stream("vertex", "POST", url, decoder.feed, headers=headers, json=data, timeout=60)
+            clips = decoder.finish() if response.status == 200 else []
+        except ProviderError:
+            decoder.discard()
+            raise
+        except ValueError as e:
+            decoder.discard()
+            raise ProviderError(f"Error calling Lyria API: {e}", provider="vertex") from e
+        if response.status == 200:
+            break
+        decoder.discard()
+        if response.status != 401:
+            raise response.error("vertex", prefix="Error calling Lyria API:")
+        # The token expired early or was revoked: force a new one and retry once
+        get_token_provider().invalidate(access_token)
+        if auth_attempt:
+            raise response.error("vertex", prefix="Error calling Lyria API:")
+    
+    if not clips:
+        if b'"error"' in decoder.head:
+            raise ProviderError(f"API Error: {decoder.head.decode('utf-8', errors='replace')}", provider="vertex")
+        raise ProviderError("No predictions in response", provider="vertex")
+    
+    # Move clips into place (multiple samples get a suffix)
     saved_files = []
     
-    for i, prediction in enumerate(predictions):
-        # Try both possible keys for audio content
-        audio_content = prediction.get("audioContent") or prediction.get("bytesBase64Encoded")
-        if not audio_content:
-            print(f"[WARNING] No audio content in prediction {i+1}")
-            print(f"[DEBUG] Available keys: {list(prediction.keys())}")
-            continue
-        
-        # Decode base64 audio
-        audio_bytes = base64.b64decode(audio_content)
-        
-        # Determine output filename
-        if len(predictions) == 1:
-            file_path = output_path
-        else:
-            # Multiple samples: add suffix
-            base = Path(output_path)
-            file_path = base.parent / f"{base.stem}_{i+1}{base.suffix}"
-        
-        # Save audio file
-        with open(file_path, "wb") as f:
-            f.write(audio_bytes)
-        
-        # Get file size
-        size_kb = len(audio_bytes) / 1024
-        
+    for i, clip in enumerate(clips):
+        file_path = clip.commit(sample_output_path(output_path, i, len(clips)))
+        size_kb = clip.bytes_written / 1024
         print(f"[SUCCESS] Saved: {file_path} ({size_kb:.1f} KB)")
-        saved_files.append(str(file_path))
+        saved_files.append(file_path)
+    
+    cache.store(cache_key, saved_files)
     
     # Print summary
     print(f"\n[COMPLETE] Generated {len(saved_files)} audio clip(s)")
@@ -178,6 +167,206 @@ def generate_music(
     
     return saved_files[0] if len(saved_files) == 1 else saved_files
 
+def generate_music(
+    prompt: str,
+    output_path: str,
+    negative_prompt: str = None,
+    seed: int = None,
+    sample_count: int = 1,
+    project_id: str = "gen-lang-client-0790630511",
+    location: str = "us-central1"
+) -> str:
+    """
+    Generate music using Lyria 2 model.
+    
+    Blocking wrapper around generate_music_async(); raises ProviderError on API errors.
+    
+    Args:
+        prompt: Text description of the music to generate (US English)
+        output_path: Path to save the WAV file
+        negative_prompt: Optional description of what to exclude
+        seed: Optional seed for reproducible output (cannot use with sample_count > 1)
+        sample_count: Number of samples to generate (cannot use with seed)
+        project_id: Google Cloud project ID
+        location: Region for Vertex AI (e.g., us-central1)
+    
+    Returns:
+        Path to the generated audio file(s)
+    """
+    return run_sync(generate_music_async(
+        prompt, output_path, negative_prompt, seed, sample_count, project_id, location
+    ))
+
+def load_batch_file(path: str) -> List[dict]:
+    """
+    Load batch jobs from a file.
+    
+    JSON: a list of {"prompt": ..., "output": ..., "negative": ..., "seed": ...}
+    Text: one job per line as "output.wav | prompt" (blank lines and # comments ignored)
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [
+            {
+                "prompt": job["prompt"],
+                "output": job["output"],
+                "negative": job.get("negative"),
+                "seed": job.get("seed"),
+            }
+            for job in json.loads(text)
+        ]
+    jobs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        output, _, prompt = line.partition("|")
+        if not prompt:
+            raise ValueError(f"Expected 'output.wav | prompt', got: {line}")
+        jobs.append({"prompt": prompt.strip(), "output": output.strip(), "negative": None, "seed": None})
+    return jobs
+
+def template_batch(game: str, theme: str, game_id: str) -> List[dict]:
+    """Build batch jobs from the `music` entries of a GAME_TEMPLATES entry."""
+    from generate_game_assets import GAME_TEMPLATES, prepare_assets
+    
+    assets = prepare_assets(GAME_TEMPLATES[game], theme, game_id)
+    jobs = []
+    for item in assets["music"]:
+        prompt = item["prompt"]
+        # Game music should never have vocals
+        if "instrumental" not in prompt.lower():
+            prompt += ", instrumental"
+        jobs.append({"prompt": prompt, "output": f"assets/audio/{item['filename']}", "negative": None, "seed": None})
+    return jobs
+
+async def generate_music_batch_async(
+    jobs: List[dict],
+    project_id: str = "gen-lang-client-0790630511",
+    location: str = "us-central1",
+    max_instances: int = None,
+    workers: int = None,
+) -> List[dict]:
+    """
+    Generate many different prompts with as few :predict round trips as possible.
+    
+    Prompts are packed into `instances` arrays of up to `max_instances`; the
+    batches are sent concurrently, each response is spooled to disk, and the
+    returned clips are decoded and written on a thread pool.
+    
+    Args:
+        jobs: List of {"prompt", "output", "negative" (optional), "seed" (optional)}
+        project_id: Google Cloud project ID
+        location: Region for Vertex AI (e.g., us-central1)
+        max_instances: Prompts per request (default: VERTEX_MUSIC_DEFAULTS)
+        workers: Decode/write threads (default: VERTEX_MUSIC_DEFAULTS)
+    
+    Returns:
+        One result dict per job: output, status (ok/cached/failed), bytes,
+        request_seconds, decode_seconds, error
+    """
+    max_instances = max_instances or VERTEX_MUSIC_DEFAULTS["max_instances_per_request"]
+    workers = workers or VERTEX_MUSIC_DEFAULTS["decode_workers"]
+    url = lyria_url(project_id, location)
+    cache = get_cache()
+    
+    results = [{"output": job["output"], "status": "pending", "bytes": 0, "request_seconds": 0.0, "decode_seconds": 0.0, "error": None} for job in jobs]
+    pending = []
+    
+    for index, job in enumerate(jobs):
+        instance = {"prompt": job["prompt"]}
+        if job.get("negative"):
+            instance["negative_prompt"] = job["negative"]
+        if job.get("seed") is not None:
+            instance["seed"] = job["seed"]
+        # Same key as a single generate_music() call with these settings
+        parameters = {} if job.get("seed") is not None else {"sample_count": 1}
+        key = cache.make_key("vertex-lyria", {
+            "model": "lyria-002",
+            "location": location,
+            "data": {"instances": [instance], "parameters": parameters},
+            **endpoint_tag("vertex"),
+        })
+        if cache.fetch(key, lambda i, n: job["output"]):
+            results[index]["status"] = "cached"
+            continue
+        pending.append((index, instance, key))
+    
+    if not pending:
+        return results
+    
+    batches = [pending[i:i + max_instances] for i in range(0, len(pending), max_instances)]
+    print(f"[Lyria 2] {len(pending)} prompt(s) in {len(batches)} request(s) of up to {max_instances}")
+    
+    loop = asyncio.get_running_loop()
+    
+    async def run_batch(batch_number: int, batch: list, executor: ThreadPoolExecutor):
+        data = {"instances": [instance for _, instance, _ in batch], "parameters": {}}
+        spool = PredictionSpool()
+        start = time.perf_counter()
+        try:
+            for auth_attempt in range(2):
+                access_token = await asyncio.to_thread(get_access_token)
+                response = await request_stream(
+                    "vertex", "POST", url, spool.feed, headers=auth_headers(access_token), json=data, timeout=60 * len(batch)
+                )
+                if response.status != 401 or auth_attempt:
+                    break
+                # The token expired early or was revoked: force a new one (once for all batches) and retry
+                get_token_provider().invalidate(access_token)
+                spool.cleanup()
+                spool = PredictionSpool()
+            if response.status != 200:
+                if response.status == 401:
+                    get_token_provider().invalidate(access_token)
+                raise response.error("vertex", prefix="Lyria API returned")
+            spans = spool.finish()
+            if len(spans) != len(batch):
+                raise ProviderError(f"Expected {len(batch)} clips, got {len(spans)}", provider="vertex")
+            request_seconds = time.perf_counter() - start
+            print(f"[Lyria 2] Request {batch_number}/{len(batches)}: {len(batch)} clip(s) in {request_seconds:.1f}s")
+            
+            def decode(span, output):
+                clip_start = time.perf_counter()
+                written = decode_span(spool.path, span[0], span[1], output)
+                return written, time.perf_counter() - clip_start
+            
+            decoded = await asyncio.gather(*(
+                loop.run_in_executor(executor, decode, span, jobs[index]["output"])
+                for span, (index, _, _) in zip(spans, batch)
+            ))
+            for (written, seconds), (index, _, key) in zip(decoded, batch):
+                cache.store(key, [jobs[index]["output"]])
+                results[index].update(status="ok", bytes=written, request_seconds=request_seconds, decode_seconds=seconds)
+        except (ProviderError, ValueError, OSError) as e:
+            for index, _, _ in batch:
+                results[index].update(status="failed", error=str(e), request_seconds=time.perf_counter() - start)
+        finally:
+            spool.cleanup()
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lyria-decode") as executor:
+        await asyncio.gather(*(run_batch(n + 1, batch, executor) for n, batch in enumerate(batches)))
+    
+    return results
+
+def generate_music_batch(jobs: List[dict], **kwargs) -> List[dict]:
+    """Blocking wrapper around generate_music_batch_async()."""
+    return run_sync(generate_music_batch_async(jobs, **kwargs))
+
+def print_batch_report(results: List[dict]) -> None:
+    print("\n[BATCH] Per-clip timing:")
+    for result in results:
+        if result["status"] == "ok":
+            print(f"   {result['output']}: {result['bytes'] / 1024:.1f} KB, "
+                  f"request {result['request_seconds']:.1f}s, decode+write {result['decode_seconds'] * 1000:.0f}ms")
+        elif result["status"] == "cached":
+            print(f"   {result['output']}: cached")
+        else:
+            print(f"   {result['output']}: FAILED ({result['error']})")
+    generated = sum(1 for r in results if r["status"] == "ok")
+    print(f"\n[COMPLETE] Generated {generated} clip(s), {sum(1 for r in results if r['status'] == 'cached')} from cache")
+    print(f"[COST] Estimated: ${generated * 0.06:.2f}")
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate music using Google Vertex AI Lyria 2",
@@ -195,6 +384,12 @@ Examples:
   
   # Generate multiple variations
   python generate_music_vertex.py -p "cheerful kids music" --samples 3 -o assets/audio/game/happy.wav
+  
+  # Batch: many prompts packed into few requests (JSON list or "output.wav | prompt" lines)
+  python generate_music_vertex.py --batch music_prompts.txt
+  
+  # Batch: every music entry of a game template
+  python generate_music_vertex.py --template spelling --theme "wizard school" --id spell-wizard
 
 Notes:
   - Generates 30-second instrumental music clips
@@ -206,13 +401,11 @@ Notes:
     
     parser.add_argument(
         "--prompt", "-p",
-        required=True,
         help="Text description of the music to generate (US English)"
     )
     
     parser.add_argument(
         "--output", "-o",
-        required=True,
         help="Output path for the WAV file"
     )
     
@@ -246,7 +439,51 @@ Notes:
         help="Vertex AI region (default: %(default)s)"
     )
     
+    batch_group = parser.add_argument_group("batch mode")
+    batch_group.add_argument("--batch", help="File of prompts (JSON list or 'output.wav | prompt' lines)")
+    batch_group.add_argument("--template", help="Generate the music entries of a GAME_TEMPLATES game type")
+    batch_group.add_argument("--theme", help="Theme for --template prompts")
+    batch_group.add_argument("--id", help="Game ID for --template output folders")
+    batch_group.add_argument(
+        "--max-instances",
+        type=int,
+        default=VERTEX_MUSIC_DEFAULTS["max_instances_per_request"],
+        help="Prompts per request (default: %(default)s)"
+    )
+    batch_group.add_argument(
+        "--workers",
+        type=int,
+        default=VERTEX_MUSIC_DEFAULTS["decode_workers"],
+        help="Threads decoding and writing clips (default: %(default)s)"
+    )
+    
+    add_cache_arguments(parser)
+    
     args = parser.parse_args()
+    apply_cache_arguments(args)
+    
+    if args.batch or args.template:
+        if args.template and not (args.theme and args.id):
+            parser.error("--template requires --theme and --id")
+        try:
+            jobs = load_batch_file(args.batch) if args.batch else template_batch(args.template, args.theme, args.id)
+            results = generate_music_batch(
+                jobs,
+                project_id=args.project,
+                location=args.location,
+                max_instances=args.max_instances,
+                workers=args.workers,
+            )
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        print_batch_report(results)
+        if any(r["status"] == "failed" for r in results):
+            sys.exit(1)
+        return
+    
+    if not args.prompt or not args.output:
+        parser.error("--prompt and --output are required (unless using --batch or --template)")
     
     # Generate music
     try:
@@ -13,20 +13,23 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import ELEVENLABS_API_KEY, SFX_DEFAULTS
+from config import ELEVENLABS_API_KEY, PROVIDER_URLS, SFX_DEFAULTS
+from async_http import download, run_sync
+from generation_cache import add_cache_arguments, apply_cache_arguments, get_cache
+from provider_errors import ConfigurationError, ProviderError
 
 # ElevenLabs Sound Effects API endpoint
-ELEVENLABS_SFX_URL = "https://api.elevenlabs.io/v1/sound-generation"
+ELEVENLABS_SFX_URL = f"{PROVIDER_URLS['elevenlabs']}/v1/sound-generation"
 
 
-def generate_sfx(
+async def generate_sfx_async(
     prompt: str,
     output_path: str,
     duration: float = None,
     output_format: str = None,
 ) -> str:
     """
-    Generate a sound effect using ElevenLabs API.
+    Generate a sound effect using ElevenLabs API (async, pooled connection, streamed to disk).
     
     Args:
         prompt: Description of the sound effect
@@ -36,17 +39,13 @@ def generate_sfx(
     
     Returns:
         Path to saved file
-    """
-    try:
-        import requests
-    except ImportError:
-        print("Error: requests package not installed.")
-        print("Run: pip install requests")
-        sys.exit(1)
     
+    Raises:
+        ProviderError: If the API key is missing or the request fails after retries
+            (RateLimitError, TransientError, AuthenticationError... see provider_errors.py)
+    """
     if not ELEVENLABS_API_KEY:
-        print("Error: ELEVENLABS_API_KEY not set in .env or environment")
-        sys.exit(1)
+        raise ConfigurationError("ELEVENLABS_API_KEY not set in .env or environment", provider="elevenlabs")
     
     # Prepare request
     headers = {
@@ -72,31 +71,57 @@ def generate_sfx(
     print(f"Generating SFX: {prompt[:50]}...")
     print(f"  Duration: {duration or 'auto'}s")
     
-    # Make request
-    response = requests.post(url, headers=headers, json=data)
+    cache = get_cache()
+    cache_key = cache.make_key("elevenlabs-sfx", {"url": url, "data": data})
+    if cache.fetch(cache_key, lambda index, count: output_path):
+        return output_path
     
-    if response.status_code != 200:
-        print(f"  Error: API returned {response.status_code}")
-        try:
-            error_detail = response.json()
-            print(f"  Detail: {error_detail}")
-        except:
-            print(f"  Response: {response.text[:200]}")
-        sys.exit(1)
+    # Make request, streaming the audio straight to disk
+    response = await download("elevenlabs", "POST", url, output_path, headers=headers, json=data)
     
-    # Save audio
-    output_dir = Path(output_path).parent
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if response.status != 200:
+        raise response.error("elevenlabs")
     
-    with open(output_path, 'wb') as f:
-        f.write(response.content)
+    cache.store(cache_key, [output_path])
     
-    file_size = len(response.content) / 1024
+    file_size = response.bytes_streamed / 1024
     print(f"  Saved: {output_path} ({file_size:.1f} KB)")
     
     return output_path
 
 
+def generate_sfx(
+    prompt: str,
+    output_path: str,
+    duration: float = None,
+    output_format: str = None,
+    process: bool = False,
+) -> str:
+    """
+    Generate a sound effect using ElevenLabs API.
+    
+    Blocking wrapper around generate_sfx_async().
+    
+    Args:
+        prompt: Description of the sound effect
+        output_path: Where to save the audio file
+        duration: Duration in seconds (0.5-22, or None for auto)
+        output_format: Audio format (mp3_44100_128, pcm_48000, etc.)
+        process: Trim silence and normalize loudness after saving (writes a sidecar)
+    
+    Returns:
+        Path to saved file
+    
+    Raises:
+        ProviderError: If the API key is missing or the request fails after retries
+    """
+    path = run_sync(generate_sfx_async(prompt, output_path, duration, output_format))
+    if process:
+        from process_audio import process_saved
+        process_saved(path, audio_type="sfx")
+    return path
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate sound effects using ElevenLabs API",
@@ -125,15 +150,24 @@ Duration: 0.5-22 seconds (omit for automatic)
     parser.add_argument("--output", "-o", required=True, help="Output file path")
     parser.add_argument("--duration", "-d", type=float, help="Duration in seconds (0.5-22)")
     parser.add_argument("--format", "-f", default="mp3_44100_128", help="Output format")
+    parser.add_argument("--process", action="store_true", help="Trim silence and normalize loudness after saving (tools/process_audio.py)")
+    
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
+    apply_cache_arguments(args)
     
-    generate_sfx(
-        prompt=args.prompt,
-        output_path=args.output,
-        duration=args.duration,
-        output_format=args.format,
-    )
+    try:
+        generate_sfx(
+            prompt=args.prompt,
+            output_path=args.output,
+            duration=args.duration,
+            output_format=args.format,
+            process=args.process,
+        )
+    except ProviderError as e:
+        print(f"  Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -2,134 +2,368 @@
 """
 Generate animated videos using Google Gemini API.
 
+Veo renders are long-running operations. VideoJobManager submits every job
+up front, polls all of them from one event loop with adaptive backoff
+(starting at a couple of seconds and growing), and downloads each video as
+soon as its operation finishes. Operation names are persisted so an
+interrupted run re-attaches to them instead of paying for new renders.
+
 Usage:
     python generate_video.py --prompt "slime monster bouncing animation" --output assets/sprites/word-forge/slime_animated.mp4
+    python generate_video.py --batch videos.txt          # one "output.mp4 | prompt" per line
+    python generate_video.py --batch videos.txt --fresh  # ignore saved operations, submit again
 """
 from __future__ import annotations
 import argparse
+import asyncio
+import json
 import os
 import sys
 import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Optional
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import GOOGLE_API_KEY
+from async_http import run_sync
+from config import PROVIDER_LIMITS, VIDEO_DEFAULTS
+from genai_client import genai_error, require_client
+from generation_cache import add_cache_arguments, apply_cache_arguments, endpoint_tag, get_cache
+from provider_errors import ProviderError
+from request_policy import call_with_retry
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def enhance_video_prompt(prompt: str) -> str:
+    """Build enhanced prompt for game animations."""
+    return f"{prompt}, seamless loop animation, fantasy game art, smooth movement, transparent background if possible"
+
+
+@dataclass
+class VideoJob:
+    """One video to render, plus its operation state and timings."""
+    prompt: str
+    output: str
+    duration: int = 4
+    aspect_ratio: str = "1:1"
+    status: str = "pending"        # pending, cached, submitted, downloading, ok, failed
+    operation_name: Optional[str] = None
+    submitted_at: Optional[float] = None  # Wall clock, persisted for re-attached jobs
+    resumed: bool = False
+    polls: int = 0
+    queue_seconds: float = 0.0     # Start of run until Veo accepted the operation
+    render_seconds: float = 0.0    # Accepted until the operation was seen done
+    download_seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def cache_key(self) -> str:
+        return get_cache().make_key("veo-video", {
+            "model": VIDEO_DEFAULTS["model"],
+            "prompt": enhance_video_prompt(self.prompt),
+            "aspect_ratio": self.aspect_ratio,
+            "duration_seconds": str(self.duration),
+            "resolution": VIDEO_DEFAULTS["resolution"],
+            **endpoint_tag("gemini"),
+        })
+
+
+class OperationState:
+    """JSON file of in-flight operations keyed by output path, rewritten atomically on change."""
+
+    def __init__(self, path: Optional[str] = None):
+        path = Path(path or VIDEO_DEFAULTS["state_file"])
+        self.path = path if path.is_absolute() else PROJECT_ROOT / path
+        try:
+            self.operations: Dict[str, dict] = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.operations = {}
+
+    def find(self, job: VideoJob) -> Optional[dict]:
+        """Return the saved operation for this job if it was submitted with the same inputs."""
+        entry = self.operations.get(job.output)
+        if entry and entry.get("cache_key") == job.cache_key:
+            return entry
+        return None
+
+    def add(self, job: VideoJob) -> None:
+        self.operations[job.output] = {
+            "operation": job.operation_name,
+            "cache_key": job.cache_key,
+            "prompt": job.prompt,
+            "submitted_at": job.submitted_at,
+        }
+        self.save()
+
+    def remove(self, job: VideoJob) -> None:
+        if self.operations.pop(job.output, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.operations, indent=2))
+        os.replace(tmp, self.path)
+
+
+class VideoJobManager:
+    """Submit, poll and download many Veo operations concurrently."""
+
+    def __init__(self, client, types, state: Optional[OperationState] = None, resume: bool = True):
+        self.client = client
+        self.types = types
+        self.state = state or OperationState()
+        self.resume = resume
+        limits = PROVIDER_LIMITS["veo"]
+        self._submit_slots = asyncio.Semaphore(limits["concurrency"])
+        self._started = 0.0
+
+    async def _request(self, provider: str, call):
+        """Await `call()` under `provider`'s token bucket, retries and circuit breaker (request_policy.py)."""
+        async def attempt():
+            try:
+                return await call()
+            except Exception as e:
+                error = genai_error(e, provider="veo")
+                if error is None:
+                    raise
+                raise error from e
+
+        return await call_with_retry(provider, attempt)
+
+    async def run(self, jobs: List[VideoJob]) -> List[VideoJob]:
+        """Run every job to completion; failures are recorded on the job, not raised."""
+        self._started = time.perf_counter()
+        await asyncio.gather(*(self._run_job(job) for job in jobs))
+        return jobs
+
+    async def _run_job(self, job: VideoJob) -> None:
+        try:
+            operation = await self._attach_or_submit(job)
+            operation = await self._wait(job, operation)
+            await self._download(job, operation)
+            get_cache().store(job.cache_key, [job.output])
+            job.status = "ok"
+            self.state.remove(job)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+            print(f"   [FAILED] {job.output}: {job.error}")
+
+    async def _attach_or_submit(self, job: VideoJob):
+        saved = self.state.find(job) if self.resume else None
+        if saved:
+            job.operation_name = saved["operation"]
+            job.submitted_at = saved.get("submitted_at") or time.time()
+            job.resumed = True
+            print(f"   Re-attached: {job.output} ({job.operation_name})")
+            return self.types.GenerateVideosOperation(name=job.operation_name)
+
+        def submit():
+            return self.client.aio.models.generate_videos(
+                model=VIDEO_DEFAULTS["model"],
+                prompt=enhance_video_prompt(job.prompt),
+                config=self.types.GenerateVideosConfig(
+                    aspect_ratio=job.aspect_ratio,
+                    duration_seconds=str(job.duration),
+                    resolution=VIDEO_DEFAULTS["resolution"],
+                )
+            )
+
+        async with self._submit_slots:
+            operation = await self._request("veo", submit)
+        job.operation_name = operation.name
+        job.submitted_at = time.time()
+        job.queue_seconds = time.perf_counter() - self._started
+        job.status = "submitted"
+        self.state.add(job)
+        print(f"   Submitted: {job.output}")
+        return operation
+
+    async def _poll(self, job: VideoJob, operation):
+        # A 429 or 5xx on one poll is retried instead of failing a render that is still running
+        operation = await self._request("veo-poll", lambda: self.client.aio.operations.get(operation))
+        job.polls += 1
+        return operation
+
+    async def _wait(self, job: VideoJob, operation):
+        """Poll with growing intervals so short renders return quickly and long ones stay cheap."""
+        interval = VIDEO_DEFAULTS["poll_initial_seconds"]
+        # A re-attached operation may already be finished; check it straight away
+        if job.resumed:
+            operation = await self._poll(job, operation)
+        while not operation.done:
+            await asyncio.sleep(interval)
+            interval = min(interval * VIDEO_DEFAULTS["poll_backoff"], VIDEO_DEFAULTS["poll_max_seconds"])
+            operation = await self._poll(job, operation)
+        job.render_seconds = time.time() - job.submitted_at
+
+        if operation.error:
+            # The operation is finished either way; don't re-attach to it next run
+            self.state.remove(job)
+            raise RuntimeError(f"Veo operation failed: {operation.error}")
+        if not (operation.response and operation.response.generated_videos):
+            self.state.remove(job)
+            raise RuntimeError("No video data in response")
+        return operation
+
+    async def _download(self, job: VideoJob, operation) -> None:
+        job.status = "downloading"
+        start = time.perf_counter()
+        generated_video = operation.response.generated_videos[0]
+        data = generated_video.video.video_bytes
+        if not data:
+            data = await self._request("veo-download", lambda: self.client.aio.files.download(file=generated_video.video))
+        with AtomicFile(job.output) as target:
+            target.write(data)
+        job.download_seconds = time.perf_counter() - start
+        file_size = os.path.getsize(job.output) / (1024 * 1024)  # MB
+        print(f"   [SUCCESS] Saved: {job.output} ({file_size:.2f} MB, render {job.render_seconds:.0f}s)")
+
+
+def generate_videos(jobs: List[VideoJob], resume: bool = True) -> List[VideoJob]:
+    """
+    Render a batch of videos concurrently.
+
+    Args:
+        jobs: VideoJob entries (prompt, output, duration, aspect_ratio)
+        resume: Re-attach to operations saved by an interrupted run
+
+    Returns:
+        The same jobs, with status, errors and timings filled in
+    """
+    cache = get_cache()
+    pending = []
+    for job in jobs:
+        if cache.fetch(job.cache_key, lambda index, count, job=job: job.output):
+            job.status = "cached"
+        else:
+            pending.append(job)
+    if not pending:
+        return jobs
+
+    client, types = require_client()
+    print(f"[Veo 3.1] Rendering {len(pending)} video(s) with {VIDEO_DEFAULTS['model']}")
+    # The shared client's async session lives on the shared background loop
+    run_sync(VideoJobManager(client, types, resume=resume).run(pending))
+    return jobs
+
 
 def generate_video(
     prompt: str,
     output_path: str,
     duration: int = 4,
     aspect_ratio: str = "1:1",
+    resume: bool = True,
 ) -> str:
     """
     Generate a video using Veo 3.1 API.
-    
+
     Args:
         prompt: Description of the video to generate
         output_path: Where to save the video
         duration: Video duration in seconds (4, 6, or 8)
         aspect_ratio: Aspect ratio (1:1, 16:9, 9:16)
-    
+        resume: Re-attach to a saved operation for this output instead of submitting again
+
     Returns:
         Saved file path
     """
-    try:
-        from google import genai
-        from google.genai import types
-    except ImportError:
-        print("Error: google-genai package not installed.")
-        print("Run: pip install google-genai")
-        sys.exit(1)
-    
-    if not GOOGLE_API_KEY:
-        print("Error: GOOGLE_API_KEY not set in .env or environment")
-        sys.exit(1)
-    
-    # Initialize client
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-    
-    # Build enhanced prompt for game animations
-    enhanced_prompt = f"{prompt}, seamless loop animation, fantasy game art, smooth movement, transparent background if possible"
-    
     print(f"[Veo 3.1] Generating video...")
     print(f"   Prompt: {prompt}")
     print(f"   Duration: {duration}s")
     print(f"   Aspect: {aspect_ratio}")
-    print(f"   Model: veo-3.1-generate-preview")
-    
-    try:
-        # Generate video using Veo 3.1
-        operation = client.models.generate_videos(
-            model='veo-3.1-generate-preview',
-            prompt=enhanced_prompt,
-            config=types.GenerateVideosConfig(
-                aspect_ratio=aspect_ratio,
-                duration_seconds=str(duration),
-                resolution="720p",
+
+    job = VideoJob(prompt=prompt, output=output_path, duration=duration, aspect_ratio=aspect_ratio)
+    generate_videos([job], resume=resume)
+    if job.status in ("ok", "cached"):
+        return output_path
+
+    print(f"[ERROR] Generation failed: {job.error}")
+    return None
+
+
+def load_batch_file(path: str, duration: int, aspect_ratio: str) -> List[VideoJob]:
+    """
+    Load video jobs from a file.
+
+    JSON: a list of {"prompt": ..., "output": ..., "duration": ..., "aspect": ...}
+    Text: one job per line as "output.mp4 | prompt" (blank lines and # comments ignored)
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        return [
+            VideoJob(
+                prompt=job["prompt"],
+                output=job["output"],
+                duration=job.get("duration", duration),
+                aspect_ratio=job.get("aspect", aspect_ratio),
             )
+            for job in json.loads(text)
+        ]
+    jobs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        output, _, prompt = line.partition("|")
+        if not prompt:
+            raise ValueError(f"Expected 'output.mp4 | prompt', got: {line}")
+        jobs.append(VideoJob(prompt=prompt.strip(), output=output.strip(), duration=duration, aspect_ratio=aspect_ratio))
+    return jobs
+
+
+def print_job_report(jobs: List[VideoJob]) -> None:
+    """Print the queue/render/download time split for each job."""
+    print(f"\n{'Output':<48} {'Status':>8} {'Queue':>7} {'Render':>7} {'Download':>9} {'Polls':>6}")
+    for job in jobs:
+        if job.status == "cached":
+            print(f"{job.output:<48} {'cached':>8}")
+            continue
+        print(
+            f"{job.output:<48} {job.status:>8} {job.queue_seconds:>6.1f}s {job.render_seconds:>6.1f}s "
+            f"{job.download_seconds:>8.1f}s {job.polls:>6}"
         )
-        
-        print("[Veo 3.1] Video generation started, polling for completion...")
-        
-        # Poll the operation status until the video is ready
-        poll_count = 0
-        while not operation.done:
-            poll_count += 1
-            print(f"   Waiting... (poll {poll_count})")
-            time.sleep(10)
-            operation = client.operations.get(operation)
-        
-        print(f"[Veo 3.1] Generation complete after {poll_count * 10} seconds")
-        
-        # Download the generated video
-        if operation.response and operation.response.generated_videos:
-            generated_video = operation.response.generated_videos[0]
-            
-            # Create output directory if needed
-            output_dir = os.path.dirname(output_path)
-            if output_dir:
-                os.makedirs(output_dir, exist_ok=True)
-            
-            # Download and save the video
-            client.files.download(file=generated_video.video)
-            generated_video.video.save(output_path)
-            
-            # Get file size
-            file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-            print(f"[SUCCESS] Saved: {output_path} ({file_size:.2f} MB)")
-            return output_path
-        
-        print("[ERROR] No video data in response")
-        return None
-        
-    except Exception as e:
-        print(f"[ERROR] Generation failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
 
 
 def main():
     parser = argparse.ArgumentParser(description='Generate animated videos for game assets using Veo 3.1')
-    parser.add_argument('-p', '--prompt', required=True, help='Video description')
-    parser.add_argument('-o', '--output', required=True, help='Output path (e.g., assets/sprites/monster.mp4)')
+    parser.add_argument('-p', '--prompt', help='Video description')
+    parser.add_argument('-o', '--output', help='Output path (e.g., assets/sprites/monster.mp4)')
     parser.add_argument('-d', '--duration', type=int, default=4, choices=[4, 6, 8], help='Duration in seconds (4, 6, or 8)')
     parser.add_argument('-a', '--aspect', default='1:1', choices=['1:1', '16:9', '9:16'], help='Aspect ratio')
-    
+    parser.add_argument('--batch', help='Render many videos: JSON list or "output.mp4 | prompt" lines')
+    parser.add_argument('--fresh', action='store_true', help='Ignore operations saved by an interrupted run and submit new ones')
+    add_cache_arguments(parser)
+
     args = parser.parse_args()
-    
-    result = generate_video(
-        prompt=args.prompt,
-        output_path=args.output,
-        duration=args.duration,
-        aspect_ratio=args.aspect,
-    )
-    
-    if result:
-        print(f"\n[COMPLETE] Generated video")
+    apply_cache_arguments(args)
+
+    if args.batch:
+        jobs = load_batch_file(args.batch, args.duration, args.aspect)
+    elif args.prompt and args.output:
+        jobs = [VideoJob(prompt=args.prompt, output=args.output, duration=args.duration, aspect_ratio=args.aspect)]
     else:
-        print(f"\n[FAILED] Could not generate video")
+        parser.error("--prompt and --output are required (or use --batch)")
+
+    start = time.perf_counter()
+    try:
+        generate_videos(jobs, resume=not args.fresh)
+    except ProviderError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print_job_report(jobs)
+
+    failed = [job for job in jobs if job.status not in ("ok", "cached")]
+    print(f"\nElapsed: {time.perf_counter() - start:.1f}s")
+    if failed:
+        print(f"\n[FAILED] Could not generate {len(failed)} of {len(jobs)} video(s)")
+        if any(job.operation_name for job in failed):
+            print("   Re-run the same command to re-attach to operations that are still rendering")
         sys.exit(1)
+    print(f"\n[COMPLETE] Generated {len(jobs)} video(s)")
 
 
 if __name__ == '__main__':
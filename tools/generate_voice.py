@@ -7,20 +7,74 @@ Usage:
     python generate_voice.py --text "Great job! You got it right!" --voice cheerful_female --output assets/audio/game/voice/correct.mp3
     python generate_voice.py -t "Welcome to the adventure!" -v calm_male -o assets/audio/game/voice/intro.mp3
     python generate_voice.py -t "Level complete!" --voice-id abc123 -o assets/audio/game/voice/levelup.mp3
+
+Batch mode streams many lines over one Cartesia websocket:
+    python generate_voice.py --batch word_list.csv
+    python generate_voice.py --template spelling --id spell-siege
 """
 import argparse
+import asyncio
+import base64
+import csv
+import json
 import os
 import sys
+import time
+import uuid
 from pathlib import Path
+from typing import Dict, List
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import CARTESIA_API_KEY, VOICE_DEFAULTS, CARTESIA_VOICES
+from config import CARTESIA_API_KEY, HTTP_DEFAULTS, PROVIDER_URLS, REQUEST_POLICY, VOICE_DEFAULTS, CARTESIA_VOICES
+from async_http import download, get_session, run_sync
+from generation_cache import add_cache_arguments, apply_cache_arguments, get_cache
+from provider_errors import ConfigurationError, ProviderError, TransientError, error_for_status
+from request_policy import call_with_retry
+from streaming import PcmWriter, require_encoder
 
 # Cartesia API endpoint
-CARTESIA_TTS_URL = "https://api.cartesia.ai/tts/bytes"
+CARTESIA_TTS_URL = f"{PROVIDER_URLS['cartesia']}/tts/bytes"
+CARTESIA_VERSION = "2024-06-10"
 
 
-def generate_voice(
+def resolve_voice_id(voice: str = None, voice_id: str = None) -> str:
+    """Voice ID for a preset name or direct ID, defaulting to cheerful_female."""
+    if voice_id:
+        return voice_id
+    if voice and voice in CARTESIA_VOICES:
+        return CARTESIA_VOICES[voice]
+    # Default to cheerful female for games
+    resolved = CARTESIA_VOICES.get("cheerful_female", list(CARTESIA_VOICES.values())[0] if CARTESIA_VOICES else None)
+    if not resolved:
+        raise ConfigurationError(
+            "No voice ID specified and no defaults configured. "
+            f"Available presets: {', '.join(CARTESIA_VOICES.keys())}",
+            provider="cartesia",
+        )
+    return resolved
+
+
+def tts_request(text: str, voice_id: str, output_format: dict, speed: float = 1.0) -> dict:
+    """Request body shared by /tts/bytes and the websocket."""
+    data = {
+        "model_id": VOICE_DEFAULTS["model_id"],
+        "transcript": text,
+        "voice": {
+            "mode": "id",
+            "id": voice_id,
+        },
+        "output_format": output_format,
+    }
+    
+    # Add speed if not default
+    if speed != 1.0:
+        data["voice"]["__experimental_controls"] = {
+            "speed": "slow" if speed < 0.8 else "fast" if speed > 1.2 else "normal"
+        }
+    return data
+
+
+async def generate_voice_async(
     text: str,
     output_path: str,
     voice: str = None,
@@ -29,7 +83,7 @@ def generate_voice(
     emotion: str = None,
 ) -> str:
     """
-    Generate speech using Cartesia API.
+    Generate speech using Cartesia API (async, pooled connection, streamed to disk).
     
     Args:
         text: Text to speak
@@ -41,87 +95,406 @@ def generate_voice(
     
     Returns:
         Path to saved file
-    """
-    try:
-        import requests
-    except ImportError:
-        print("Error: requests package not installed.")
-        print("Run: pip install requests")
-        sys.exit(1)
     
+    Raises:
+        ProviderError: If the API key is missing or the request fails
+    """
     if not CARTESIA_API_KEY:
-        print("Error: CARTESIA_API_KEY not set in .env or environment")
-        sys.exit(1)
-    
-    # Resolve voice ID
-    if voice_id:
-        resolved_voice_id = voice_id
-    elif voice and voice in CARTESIA_VOICES:
-        resolved_voice_id = CARTESIA_VOICES[voice]
-    else:
-        # Default to cheerful female for games
-        resolved_voice_id = CARTESIA_VOICES.get("cheerful_female", list(CARTESIA_VOICES.values())[0] if CARTESIA_VOICES else None)
-        if not resolved_voice_id:
-            print("Error: No voice ID specified and no defaults configured")
-            print(f"Available presets: {', '.join(CARTESIA_VOICES.keys())}")
-            sys.exit(1)
+        raise ConfigurationError("CARTESIA_API_KEY not set in .env or environment", provider="cartesia")
     
     # Prepare request
     headers = {
         "X-API-Key": CARTESIA_API_KEY,
-        "Cartesia-Version": "2024-06-10",
+        "Cartesia-Version": CARTESIA_VERSION,
         "Content-Type": "application/json",
     }
     
-    data = {
-        "model_id": VOICE_DEFAULTS["model_id"],
-        "transcript": text,
-        "voice": {
-            "mode": "id",
-            "id": resolved_voice_id,
-        },
-        "output_format": {
-            "container": "mp3",
-            "bit_rate": 128000,
-            "sample_rate": VOICE_DEFAULTS["sample_rate"],
-        },
-    }
-    
-    # Add speed if not default
-    if speed != 1.0:
-        data["voice"]["__experimental_controls"] = {
-            "speed": "slow" if speed < 0.8 else "fast" if speed > 1.2 else "normal"
-        }
+    data = tts_request(text, resolve_voice_id(voice, voice_id), {
+        "container": "mp3",
+        "bit_rate": 128000,
+        "sample_rate": VOICE_DEFAULTS["sample_rate"],
+    }, speed)
     
     print(f"Generating voice: \"{text[:50]}{'...' if len(text) > 50 else ''}\"")
     print(f"  Voice: {voice or voice_id or 'default'}")
     print(f"  Speed: {speed}x")
     
-    # Make request
-    response = requests.post(CARTESIA_TTS_URL, headers=headers, json=data)
+    cache = get_cache()
+    cache_key = cache.make_key("cartesia-tts", {
+        "url": CARTESIA_TTS_URL,
+        "version": headers["Cartesia-Version"],
+        "data": data,
+    })
+    if cache.fetch(cache_key, lambda index, count: output_path):
+        return output_path
     
-    if response.status_code != 200:
-        print(f"  Error: API returned {response.status_code}")
-        try:
-            error_detail = response.json()
-            print(f"  Detail: {error_detail}")
-        except:
-            print(f"  Response: {response.text[:200]}")
-        sys.exit(1)
+    # Make request, streaming the audio straight to disk
+    response = await download("cartesia", "POST", CARTESIA_TTS_URL, output_path, headers=headers, json=data)
     
-    # Save audio
-    output_dir = Path(output_path).parent
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if response.status != 200:
+        raise response.error("cartesia")
     
-    with open(output_path, 'wb') as f:
-        f.write(response.content)
+    cache.store(cache_key, [output_path])
     
-    file_size = len(response.content) / 1024
+    file_size = response.bytes_streamed / 1024
     print(f"  Saved: {output_path} ({file_size:.1f} KB)")
     
     return output_path
 
 
+def generate_voice(
+    text: str,
+    output_path: str,
+    voice: str = None,
+    voice_id: str = None,
+    speed: float = 1.0,
+    emotion: str = None,
+    process: bool = False,
+) -> str:
+    """
+    Generate speech using Cartesia API.
+    
+    Blocking wrapper around generate_voice_async().
+    
+    Args:
+        text: Text to speak
+        output_path: Where to save the audio file
+        voice: Voice preset name (from CARTESIA_VOICES)
+        voice_id: Direct Cartesia voice ID (overrides voice)
+        speed: Speech speed multiplier (0.5-2.0)
+        emotion: Emotion modifier (if supported by voice)
+        process: Trim silence and normalize loudness after saving (writes a sidecar)
+    
+    Returns:
+        Path to saved file
+    
+    Raises:
+        ProviderError: If the API key is missing or the request fails after retries
+    """
+    path = run_sync(generate_voice_async(text, output_path, voice, voice_id, speed, emotion))
+    if process:
+        from process_audio import process_saved
+        process_saved(path, audio_type="voice")
+    return path
+
+
+def load_batch_file(path: str) -> List[dict]:
+    """
+    Load voice lines from a file.
+    
+    CSV: a header row with `text` and `output` columns, plus optional `voice`,
+    `voice_id` and `speed` columns.
+    JSON: a list of {"text": ..., "output": ..., "voice": ..., "voice_id": ..., "speed": ...}
+    """
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    lines = []
+    for row in rows:
+        if not row.get("text") or not row.get("output"):
+            raise ValueError(f"Each line needs 'text' and 'output', got: {row}")
+        lines.append({
+            "text": row["text"],
+            "output": row["output"],
+            "voice": row.get("voice") or None,
+            "voice_id": row.get("voice_id") or None,
+            "speed": float(row.get("speed") or 1.0),
+        })
+    return lines
+
+
+def template_batch(game: str, game_id: str) -> List[dict]:
+    """Build voice lines from the `voice` entries of a GAME_TEMPLATES entry."""
+    from generate_game_assets import GAME_TEMPLATES, prepare_assets
+    
+    assets = prepare_assets(GAME_TEMPLATES[game], "", game_id)
+    return [
+        {
+            "text": item["text"],
+            "output": f"assets/audio/{item['filename']}",
+            "voice": "cheerful_female",
+            "voice_id": None,
+            "speed": 1.0,
+        }
+        for item in assets["voice"]
+    ]
+
+
+class CartesiaStream:
+    """
+    One Cartesia TTS websocket with many lines (contexts) in flight.
+    
+    A single reader task routes incoming messages to the waiting line by
+    context_id, so lines share the connection without waiting on each other.
+    If the socket drops, it is reopened under the Cartesia retry policy and
+    the lines that were in flight are sent again. The drop counts once toward
+    the circuit breaker, not once per line.
+    """
+    
+    def __init__(self, url: str = None):
+        self.url = url or VOICE_DEFAULTS["ws_url"]
+        self.ws = None
+        self._contexts: Dict[str, asyncio.Queue] = {}
+        self._reader = None
+        self._connect_lock = asyncio.Lock()
+    
+    async def __aenter__(self) -> "CartesiaStream":
+        await self._connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._reader.cancel()
+        await self.ws.close()
+    
+    async def _connect(self) -> None:
+        """Open the websocket (under the Cartesia retry policy) and start its reader."""
+        import aiohttp
+        
+        headers = {"Cartesia-Version": CARTESIA_VERSION}
+        if CARTESIA_API_KEY:
+            headers["X-API-Key"] = CARTESIA_API_KEY
+        session = await get_session("cartesia")
+        
+        async def connect():
+            try:
+                return await session.ws_connect(self.url, headers=headers, heartbeat=30)
+            except aiohttp.WSServerHandshakeError as e:
+                raise error_for_status(e.status, f"Websocket handshake failed: {e.status} {e.message}", provider="cartesia") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise TransientError(f"Could not connect to {self.url}: {e or type(e).__name__}", provider="cartesia") from e
+        
+        self.ws = await call_with_retry("cartesia", connect)
+        self._reader = asyncio.create_task(self._read(self.ws))
+    
+    async def _ensure_connected(self) -> None:
+        # Every line in flight notices the drop at once; only the first reconnects
+        async with self._connect_lock:
+            if self._reader.done():
+                await self.ws.close()
+                print("[Cartesia] Websocket closed, reconnecting")
+                await self._connect()
+    
+    async def _read(self, ws) -> None:
+        import aiohttp
+        
+        try:
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                queue = self._contexts.get(data.get("context_id"))
+                if queue is not None:
+                    queue.put_nowait(data)
+        finally:
+            # Wake every waiting line so none of them hangs on a dead connection
+            for queue in self._contexts.values():
+                queue.put_nowait({"type": "closed", "done": True})
+    
+    async def synthesize(self, request: dict, on_chunk, on_restart=None) -> None:
+        """
+        Send one request and pass each decoded audio chunk to on_chunk(bytes).
+        
+        If the connection drops mid-line, it is reopened and the request sent
+        again (up to REQUEST_POLICY["max_attempts"] times); on_restart() is
+        called first so the caller can throw away the partial audio.
+        
+        Raises:
+            ProviderError: If Cartesia reports an error (typed by its status_code),
+                or the websocket can't be reopened
+            TransientError: If the stream goes quiet for longer than the HTTP timeout,
+                or the connection keeps dropping
+        """
+        for attempt in range(REQUEST_POLICY["max_attempts"]):
+            if attempt and on_restart:
+                on_restart()
+            await self._ensure_connected()
+            if await self._stream(request, on_chunk):
+                return
+        raise TransientError("Cartesia: websocket kept closing", provider="cartesia")
+    
+    async def _stream(self, request: dict, on_chunk) -> bool:
+        """Run one context on the current connection. Returns False if the connection dropped first."""
+        import aiohttp
+        
+        context_id = uuid.uuid4().hex
+        queue: asyncio.Queue = asyncio.Queue()
+        self._contexts[context_id] = queue
+        try:
+            try:
+                await self.ws.send_json({**request, "context_id": context_id, "continue": False})
+            except (aiohttp.ClientError, ConnectionError):
+                return False
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HTTP_DEFAULTS["timeout_seconds"])
+                except asyncio.TimeoutError:
+                    raise TransientError("Cartesia: no audio within the request timeout", provider="cartesia")
+                kind = message.get("type")
+                if kind == "closed":
+                    return False
+                if kind == "error":
+                    text = f"Cartesia: {message.get('error') or message.get('message')}"
+                    if message.get("status_code"):
+                        raise error_for_status(int(message["status_code"]), text, provider="cartesia")
+                    raise ProviderError(text, provider="cartesia")
+                if kind == "chunk" and message.get("data"):
+                    on_chunk(base64.b64decode(message["data"]))
+                if message.get("done"):
+                    return True
+        finally:
+            del self._contexts[context_id]
+
+
+async def generate_voice_batch_async(
+    lines: List[dict],
+    max_in_flight: int = None,
+    url: str = None,
+) -> List[dict]:
+    """
+    Render many voice lines over one persistent Cartesia websocket.
+    
+    Up to `max_in_flight` lines are synthesized at once as separate contexts
+    on the same connection. Audio arrives as raw PCM and each clip is written
+    chunk by chunk as it streams in (.wav directly, other extensions encoded
+    on the fly). Lines are cached individually, so a re-run only renders
+    lines whose text or voice changed.
+    
+    Args:
+        lines: List of {"text", "output", "voice", "voice_id", "speed"}
+        max_in_flight: Lines synthesized at once (default: VOICE_DEFAULTS)
+        url: Websocket URL (default: VOICE_DEFAULTS["ws_url"], e.g. a local stand-in)
+    
+    Returns:
+        One result dict per line: output, status (ok/cached/failed), bytes,
+        audio_seconds, ttfb_seconds, total_seconds, error
+    
+    Raises:
+        ConfigurationError: If the API key is missing, or a non-.wav output needs
+            soundfile and it isn't installed
+    """
+    url = url or VOICE_DEFAULTS["ws_url"]
+    max_in_flight = max_in_flight or VOICE_DEFAULTS["max_in_flight"]
+    if not CARTESIA_API_KEY and "api.cartesia.ai" in url:
+        raise ConfigurationError("CARTESIA_API_KEY not set in .env or environment", provider="cartesia")
+    
+    rate = VOICE_DEFAULTS["sample_rate"]
+    output_format = {"container": "raw", "encoding": "pcm_s16le", "sample_rate": rate}
+    cache = get_cache()
+    results = [
+        {"output": line["output"], "status": "pending", "bytes": 0, "audio_seconds": 0.0,
+         "ttfb_seconds": 0.0, "total_seconds": 0.0, "error": None}
+        for line in lines
+    ]
+    pending = []
+    for index, line in enumerate(lines):
+        try:
+            request = tts_request(line["text"], resolve_voice_id(line.get("voice"), line.get("voice_id")), output_format, line.get("speed", 1.0))
+        except ProviderError as e:
+            results[index].update(status="failed", error=str(e))
+            continue
+        key = cache.make_key("cartesia-tts-ws", {
+            "url": url,
+            "version": CARTESIA_VERSION,
+            "data": request,
+            "container": Path(line["output"]).suffix.lower(),
+        })
+        if cache.fetch(key, lambda i, n, output=line["output"]: output):
+            results[index]["status"] = "cached"
+            continue
+        pending.append((index, request, key))
+    
+    if not pending:
+        return results
+    for index, _, _ in pending:
+        require_encoder(lines[index]["output"])
+    
+    print(f"[Cartesia] {len(pending)} line(s) over one websocket, {max_in_flight} in flight")
+    limit = asyncio.Semaphore(max_in_flight)
+    
+    async def render(stream: CartesiaStream, index: int, request: dict, key: str) -> None:
+        async with limit:
+            output = lines[index]["output"]
+            start = time.perf_counter()
+            writer = None
+            attempt_start = first_chunk = None
+            
+            def on_chunk(data: bytes) -> None:
+                nonlocal first_chunk
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                writer.write(data)
+            
+            def restart() -> None:
+                # The connection dropped mid-line; start the clip over
+                nonlocal writer, first_chunk
+                writer.discard()
+                writer = PcmWriter(output, rate)
+                first_chunk = None
+            
+            async def attempt() -> None:
+                # Each context goes through the Cartesia token bucket, retries and circuit breaker
+                nonlocal writer, attempt_start, first_chunk
+                if writer is not None:
+                    writer.discard()
+                writer = PcmWriter(output, rate)
+                attempt_start, first_chunk = time.perf_counter(), None
+                await stream.synthesize(request, on_chunk, on_restart=restart)
+                if not writer.frames:
+                    raise ProviderError("No audio returned", provider="cartesia")
+            
+            try:
+                await call_with_retry("cartesia", attempt)
+                writer.commit()
+            except (ProviderError, ValueError, OSError, RuntimeError) as e:
+                if writer is not None:
+                    writer.discard()
+                results[index].update(status="failed", error=str(e), total_seconds=time.perf_counter() - start)
+                return
+            cache.store(key, [output])
+            results[index].update(
+                status="ok",
+                bytes=os.path.getsize(output),
+                audio_seconds=writer.seconds,
+                ttfb_seconds=first_chunk - attempt_start,
+                total_seconds=time.perf_counter() - start,
+            )
+    
+    async with CartesiaStream(url) as stream:
+        await asyncio.gather(*(render(stream, index, request, key) for index, request, key in pending))
+    
+    return results
+
+
+def generate_voice_batch(lines: List[dict], **kwargs) -> List[dict]:
+    """Blocking wrapper around generate_voice_batch_async()."""
+    return run_sync(generate_voice_batch_async(lines, **kwargs))
+
+
+def print_batch_report(results: List[dict], wall_seconds: float = None) -> None:
+    print("\n[BATCH] Per-line timing (time to first audio byte / total):")
+    for result in results:
+        if result["status"] == "ok":
+            print(f"   {result['output']}: {result['audio_seconds']:.1f}s audio, {result['bytes'] / 1024:.1f} KB, "
+                  f"TTFB {result['ttfb_seconds'] * 1000:.0f}ms, total {result['total_seconds'] * 1000:.0f}ms")
+        elif result["status"] == "cached":
+            print(f"   {result['output']}: cached")
+        else:
+            print(f"   {result['output']}: FAILED ({result['error']})")
+    
+    rendered = [r for r in results if r["status"] == "ok"]
+    if rendered:
+        ttfb = sorted(r["ttfb_seconds"] for r in rendered)
+        total = sorted(r["total_seconds"] for r in rendered)
+        print(f"\n[TIMING] TTFB median {ttfb[len(ttfb) // 2] * 1000:.0f}ms, max {ttfb[-1] * 1000:.0f}ms; "
+              f"total median {total[len(total) // 2] * 1000:.0f}ms, max {total[-1] * 1000:.0f}ms")
+        if wall_seconds:
+            print(f"[TIMING] {len(rendered)} line(s) in {wall_seconds:.1f}s wall ({len(rendered) / wall_seconds:.1f} lines/s)")
+    print(f"\n[COMPLETE] Generated {len(rendered)} line(s), {sum(1 for r in results if r['status'] == 'cached')} from cache")
+
+
 def list_voices():
     """List available voice presets."""
     print("Available voice presets:")
@@ -148,6 +521,15 @@ Examples:
   # List available voice presets
   python generate_voice.py --list-voices
 
+  # Batch: lines from a CSV (text,output[,voice,voice_id,speed]) or JSON file over one websocket
+  python generate_voice.py --batch spell-siege-words.csv --max-in-flight 12
+
+  # Batch: every voice entry of a game template
+  python generate_voice.py --template spelling --id spell-siege
+
+  # Batch against a local stand-in server
+  python generate_voice.py --batch lines.json --url ws://localhost:8765/tts/websocket
+
 Voice presets: cheerful_female, calm_male, excited_child
 Or use --voice-id for any Cartesia voice ID
         """
@@ -159,23 +541,65 @@ Or use --voice-id for any Cartesia voice ID
     parser.add_argument("--voice-id", help="Direct Cartesia voice ID")
     parser.add_argument("--speed", "-s", type=float, default=1.0, help="Speech speed (0.5-2.0)")
     parser.add_argument("--list-voices", action="store_true", help="List available voice presets")
+    parser.add_argument("--process", action="store_true", help="Trim silence and normalize loudness after saving (tools/process_audio.py)")
+    
+    batch_group = parser.add_argument_group("batch mode")
+    batch_group.add_argument("--batch", help="File of lines (CSV with text,output columns or a JSON list)")
+    batch_group.add_argument("--template", help="Generate the voice entries of a GAME_TEMPLATES game type")
+    batch_group.add_argument("--id", help="Game ID for --template output folders")
+    batch_group.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=VOICE_DEFAULTS["max_in_flight"],
+        help="Lines synthesized at once on the websocket (default: %(default)s)"
+    )
+    batch_group.add_argument("--url", help="Websocket URL (default: CARTESIA_WS_URL or Cartesia's endpoint)")
+    
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
+    apply_cache_arguments(args)
     
     if args.list_voices:
         list_voices()
         return
     
+    if args.batch or args.template:
+        if args.template and not args.id:
+            parser.error("--template requires --id")
+        try:
+            lines = load_batch_file(args.batch) if args.batch else template_batch(args.template, args.id)
+            start = time.perf_counter()
+            results = generate_voice_batch(lines, max_in_flight=args.max_in_flight, url=args.url)
+            wall_seconds = time.perf_counter() - start
+        except (ProviderError, ValueError, KeyError, OSError) as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        if args.process:
+            from process_audio import process_saved
+            for result in results:
+                if result["status"] == "ok":
+                    process_saved(result["output"], audio_type="voice")
+        print_batch_report(results, wall_seconds)
+        if any(r["status"] == "failed" for r in results):
+            sys.exit(1)
+        return
+    
     if not args.text or not args.output:
-        parser.error("--text and --output are required (unless using --list-voices)")
-    
-    generate_voice(
-        text=args.text,
-        output_path=args.output,
-        voice=args.voice,
-        voice_id=args.voice_id,
-        speed=args.speed,
-    )
+        parser.error("--text and --output are required (unless using --list-voices, --batch or --template)")
+    
+    try:
+        generate_voice(
+            text=args.text,
+            output_path=args.output,
+            voice=args.voice,
+            voice_id=args.voice_id,
+            speed=args.speed,
+            process=args.process,
+        )
+    except ProviderError as e:
+        print(f"  Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
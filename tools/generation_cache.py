@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for paid generation calls.
+
+A request is identified by a SHA-256 of its final payload (provider, model,
+enhanced prompt, settings). The generated files are stored once under
+CACHE_DEFAULTS["dir"] by the hash of their bytes, so a repeat request is
+materialized from disk with a hardlink (or copy) and never reaches the API.
+
+Layout:
+    <cache>/keys/ab/abcdef....json     request key -> list of object hashes
+    <cache>/objects/12/123456...       file contents, named by SHA-256
+
+Usage:
+    cache = get_cache()
+    key = cache.make_key("elevenlabs-sfx", {"url": url, "data": data})
+    paths = cache.fetch(key, lambda i, n: output_path)
+    if paths is None:
+        ...call the API and write output_path...
+        cache.store(key, [output_path])
+
+    python tools/generation_cache.py --stats
+    python tools/generation_cache.py --evict
+    python tools/generation_cache.py --clear
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import CACHE_DEFAULTS, PROVIDER_URLS
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Bump when the key derivation changes so stale entries are never reused
+KEY_VERSION = 1
+
+# Eviction triggered by store() trims to this fraction of max_bytes, so a full
+# cache rescans once per batch of new objects rather than on every store
+EVICT_LOW_WATER = 0.9
+
+
+def output_name_with_index(output_path: str, index: int) -> str:
+    """Name extra outputs like generate_image does: file.png, file_2.png, file_3.png..."""
+    if index == 0:
+        return output_path
+    base = Path(output_path)
+    return str(base.parent / f"{base.stem}_{index + 1}{base.suffix}")
+
+
+def endpoint_tag(provider: str) -> dict:
+    """
+    {"endpoint": base_url} when an SDK-backed provider is pointed at another server, else {}.
+
+    Gemini/Veo/Vertex payloads carry no URL, so without this a local stand-in's
+    output would answer the same request against the real API. Keys for the
+    default endpoints are unchanged.
+    """
+    url = PROVIDER_URLS.get(provider)
+    return {"endpoint": url} if url else {}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """Disk cache mapping request payload hashes to generated files."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        link_mode: Optional[str] = None,
+        enabled: bool = True,
+        refresh: bool = False,
+    ):
+        root_path = Path(root or CACHE_DEFAULTS["dir"])
+        self.root = root_path if root_path.is_absolute() else PROJECT_ROOT / root_path
+        self.max_bytes = max_bytes if max_bytes is not None else CACHE_DEFAULTS["max_bytes"]
+        self.link_mode = link_mode or CACHE_DEFAULTS.get("link_mode", "hardlink")
+        self.enabled = enabled
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        # Bytes under objects/, counted once and then kept current by store()/evict()
+        self._total: Optional[int] = None
+
+    @staticmethod
+    def make_key(provider: str, payload: dict) -> str:
+        """Hash a request payload. Keys must never include API keys or tokens."""
+        canonical = json.dumps(
+            {"v": KEY_VERSION, "provider": provider, "payload": payload},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _key_path(self, key: str) -> Path:
+        return self.root / "keys" / key[:2] / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def fetch(self, key: str, name_for: Callable[[int, int], str]) -> Optional[List[str]]:
+        """
+        Materialize a cached result.
+
+        Args:
+            key: Request key from make_key()
+            name_for: Maps (index, count) to the output path for each stored file
+
+        Returns:
+            List of written paths, or None on a miss (or when disabled/refreshing)
+        """
+        if not self.enabled or self.refresh:
+            return None
+
+        key_path = self._key_path(key)
+        try:
+            entry = json.loads(key_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        objects = entry.get("objects", [])
+        sources = [self._object_path(obj["sha256"]) for obj in objects]
+        # An evicted object (or one edited in place through a hardlink) invalidates the entry
+        for obj, source in zip(objects, sources):
+            try:
+                if source.stat().st_size != obj["bytes"]:
+                    return None
+            except OSError:
+                return None
+        if not sources:
+            return None
+
+        paths = []
+        for index, source in enumerate(sources):
+            target = Path(name_for(index, len(sources)))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._materialize(source, target)
+            paths.append(str(target))
+
+        # Touch for LRU ordering
+        now = time.time()
+        for path in [key_path, *sources]:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+        print(f"  Cache hit: {paths[0]}" + (f" (+{len(paths) - 1} more)" if len(paths) > 1 else ""))
+        return paths
+
+    def _materialize(self, source: Path, target: Path) -> None:
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if self.link_mode == "hardlink":
+                try:
+                    os.link(source, tmp)
+                except OSError:
+                    # Cross-device or unsupported filesystem
+                    shutil.copyfile(source, tmp)
+            else:
+                shutil.copyfile(source, tmp)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def store(self, key: str, paths: List[str]) -> None:
+        """Record generated files under `key`. Silently does nothing when disabled."""
+        if not self.enabled or not paths:
+            return
+
+        objects = []
+        added = 0
+        for path in paths:
+            path = Path(path)
+            digest = _file_sha256(path)
+            target = self._object_path(digest)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+                shutil.copyfile(path, tmp)
+                os.replace(tmp, target)
+                added += target.stat().st_size
+            objects.append({"sha256": digest, "bytes": target.stat().st_size, "suffix": path.suffix})
+
+        key_path = self._key_path(key)
+        key_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = key_path.with_name(f".{key_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"objects": objects, "created": time.time()}, indent=2))
+        os.replace(tmp, key_path)
+
+        # Only rescan the object store once the running total says it's over the limit
+        with self._lock:
+            if self._total is None:
+                self._total = sum(st.st_size for _, st in self._objects())
+            else:
+                self._total += added
+            over = self._total > self.max_bytes
+        if over:
+            self.evict(int(self.max_bytes * EVICT_LOW_WATER))
+
+    def _objects(self) -> List[Tuple[Path, os.stat_result]]:
+        entries = []
+        objects_dir = self.root / "objects"
+        if not objects_dir.exists():
+            return entries
+        for path in objects_dir.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                entries.append((path, path.stat()))
+            except OSError:
+                continue
+        return entries
+
+    def size(self) -> int:
+        return sum(st.st_size for _, st in self._objects())
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least-recently-used objects until the cache fits. Returns bytes freed."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = self._objects()
+            total = sum(st.st_size for _, st in entries)
+            if total <= limit:
+                self._total = total
+                return 0
+
+            freed = 0
+            # Oldest mtime first (fetch() touches objects on every hit)
+            for path, st in sorted(entries, key=lambda e: e[1].st_mtime):
+                if total - freed <= limit:
+                    break
+                try:
+                    path.unlink()
+                    freed += st.st_size
+                except OSError:
+                    continue
+            self._total = total - freed
+
+            # Key entries pointing at evicted objects are now dead weight
+            for key_path in (self.root / "keys").glob("*/*.json"):
+                try:
+                    entry = json.loads(key_path.read_text())
+                except (OSError, ValueError):
+                    key_path.unlink(missing_ok=True)
+                    continue
+                if not all(self._object_path(obj["sha256"]).exists() for obj in entry.get("objects", [])):
+                    key_path.unlink(missing_ok=True)
+            return freed
+
+    def clear(self) -> None:
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        self._total = None
+
+
+_default_cache: Optional[GenerationCache] = None
+
+
+def get_cache() -> GenerationCache:
+    """Process-wide cache shared by all generate_* functions."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GenerationCache()
+    return _default_cache
+
+
+def configure(enabled: Optional[bool] = None, refresh: Optional[bool] = None) -> GenerationCache:
+    """Apply --no-cache / --refresh to the shared cache."""
+    cache = get_cache()
+    if enabled is not None:
+        cache.enabled = enabled
+    if refresh is not None:
+        cache.refresh = refresh
+    return cache
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the standard --no-cache / --refresh flags to a CLI."""
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the local generation cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached results and regenerate (updates the cache)")
+
+
+def apply_cache_arguments(args: argparse.Namespace) -> GenerationCache:
+    return configure(enabled=not args.no_cache, refresh=args.refresh)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the local generation cache")
+    parser.add_argument("--stats", action="store_true", help="Show cache location and size")
+    parser.add_argument("--evict", action="store_true", help="Evict least-recently-used entries down to max_bytes")
+    parser.add_argument("--max-mb", type=float, help="Override the size limit for --evict (MB)")
+    parser.add_argument("--clear", action="store_true", help="Delete the whole cache")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.clear:
+        cache.clear()
+        print(f"Cleared: {cache.root}")
+        return
+    if args.evict:
+        limit = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        freed = cache.evict(limit)
+        print(f"Evicted {freed / (1024 * 1024):.1f} MB")
+
+    keys = len(list((cache.root / "keys").glob("*/*.json"))) if cache.root.exists() else 0
+    print(f"Cache: {cache.root}")
+    print(f"  Entries: {keys}")
+    print(f"  Size:    {cache.size() / (1024 * 1024):.1f} MB / {cache.max_bytes / (1024 * 1024):.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Bounded job scheduler for batch asset generation.
+
+Each provider (gemini, elevenlabs, cartesia) gets its own worker pool sized by
+PROVIDER_LIMITS["<provider>"]["concurrency"], so independent assets generate in
+parallel. Requests per minute are enforced per request by the provider's token
+bucket (request_policy.py), not per job: cache hits never wait, and a stitched
+track's segments each count.
+
+Usage:
+    scheduler = JobScheduler()
+    scheduler.submit("gemini", generate_image, label="player.png", prompt="...", output_path="...")
+    for result in scheduler.run():
+        print(result.label, result.ok)
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import PROVIDER_LIMITS
+from request_policy import DEFAULT_LIMITS
+
+
+@dataclass
+class Job:
+    """A single unit of work bound to a provider."""
+    provider: str
+    func: Callable[..., Any]
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    label: str = ""
+    category: str = ""
+
+
+@dataclass
+class JobResult:
+    """Outcome of a job: `value` on success, `error` on failure."""
+    job: Job
+    value: Any = None
+    error: Optional[BaseException] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def label(self) -> str:
+        return self.job.label
+
+
+class JobScheduler:
+    """Runs jobs on one bounded thread pool per provider."""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits if limits is not None else PROVIDER_LIMITS
+        self.jobs: List[Job] = []
+
+    def provider_limits(self, provider: str) -> Dict[str, float]:
+        return {**DEFAULT_LIMITS, **self.limits.get(provider, {})}
+
+    def submit(self, provider: str, func: Callable[..., Any], label: str = "", category: str = "", **kwargs) -> Job:
+        """Queue `func(**kwargs)` to run on `provider`'s pool."""
+        job = Job(provider=provider, func=func, kwargs=kwargs, label=label, category=category)
+        self.jobs.append(job)
+        return job
+
+    def _execute(self, job: Job) -> JobResult:
+        start = time.perf_counter()
+        try:
+            value = job.func(**job.kwargs)
+            return JobResult(job, value=value, seconds=time.perf_counter() - start)
+        except (Exception, SystemExit) as e:
+            # Generators raise ProviderError after retries; optional-dependency checks may still exit.
+            return JobResult(job, error=e, seconds=time.perf_counter() - start)
+
+    def run(self) -> Iterator[JobResult]:
+        """Run every queued job, yielding results as they complete."""
+        jobs, self.jobs = self.jobs, []
+        providers = sorted({job.provider for job in jobs})
+        pools = {
+            provider: ThreadPoolExecutor(
+                max_workers=max(1, int(self.provider_limits(provider)["concurrency"])),
+                thread_name_prefix=f"gen-{provider}",
+            )
+            for provider in providers
+        }
+        try:
+            futures = [pools[job.provider].submit(self._execute, job) for job in jobs]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
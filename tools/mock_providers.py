@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the generation APIs, for offline benchmarks and CI runs.
+
+Speaks the request and response shapes the tools use, so the real clients
+(async_http, the Cartesia websocket, google-genai) run unchanged against it:
+
+    POST /v1/sound-generation                         ElevenLabs SFX and music (mp3_* / pcm_* output_format)
+    POST /tts/bytes                                   Cartesia TTS (mp3, wav or raw container)
+    GET  /tts/websocket                               Cartesia streaming TTS (generate_voice.py --batch)
+    POST /v1/projects/.../models/{model}:predict      Vertex Lyria (base64 WAV predictions)
+    POST /{version}/models/{model}:generateContent    Gemini image (inline PNG)
+    POST /{version}/models/{model}:predictLongRunning Veo submit; the operation finishes after --render-seconds
+    GET  /{version}/models/{model}/operations/{id}    Veo poll
+    GET  /{version}/files/{id}:download               Veo video bytes
+    GET  /_mock/stats                                 Requests, errors, bytes and latency per route
+    POST /_mock/settings                              Change settings (JSON, plus "reset_stats": true) without restarting
+
+Every request waits a lognormal latency (median --latency, spread --jitter),
+then fails with --error-status at --error-rate (429s carry Retry-After);
+--ws-drop-after closes Cartesia websockets mid-batch.
+Audio is a generated click track of the requested duration, or sized to
+--payload-kb when set; it is real MP3/WAV/PCM, so processing steps work on it.
+
+Point the tools at it with one variable (read when config is imported):
+
+    python tools/mock_providers.py --port 8765 --latency 0.5 --error-rate 0.05
+    NOYOLA_MOCK_PROVIDERS=http://127.0.0.1:8765 python tools/generate_game_assets.py --game spelling --theme "wizard school" --id spell-wizard
+
+In-process (random port), e.g. from a benchmark; start it before importing config:
+
+    with MockProviders(MockSettings(latency=0.2)) as mock:
+        os.environ["NOYOLA_MOCK_PROVIDERS"] = mock.url
+        ...
+
+Needs aiohttp, numpy and soundfile (tools/requirements-audio.txt); Pillow for images.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import dataclasses
+import functools
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import wave
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Dummy credentials the tools need before they will send a request
+MOCK_ENV = {
+    "GOOGLE_API_KEY": "mock",
+    "ELEVENLABS_API_KEY": "mock",
+    "CARTESIA_API_KEY": "mock",
+    "VERTEX_ACCESS_TOKEN": "mock",
+}
+
+CHUNK_BYTES = 32 * 1024
+SPEECH_CHARS_PER_SECOND = 15  # Rough speaking rate for sizing TTS clips from their text
+MP3_BITRATE = 128000
+
+
+@dataclass
+class MockSettings:
+    """How the stand-in behaves. Every field can be changed at runtime via POST /_mock/settings."""
+    latency: float = 0.2            # Median seconds before a response starts
+    jitter: float = 0.3             # Lognormal sigma around the median (0 = fixed latency)
+    error_rate: float = 0.0         # Fraction of requests answered with error_status
+    error_status: int = 503
+    retry_after: float = 1.0        # Retry-After seconds sent with 429s
+    payload_kb: Optional[float] = None  # Fixed response size; None = size audio by its requested duration
+    audio_seconds: float = 2.0      # Clip length when the request doesn't say (Lyria, images...)
+    stream_speed: float = 0.0       # Audio seconds streamed per wall second (0 = as fast as possible)
+    render_seconds: float = 2.0     # Time until a Veo operation reports done
+    image_size: int = 512           # Gemini images are image_size x image_size PNGs
+    video_kb: float = 1024.0        # Veo download size
+    ws_drop_after: int = 0          # Close each Cartesia websocket after this many contexts (0 = never)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise SystemExit("numpy is not installed.\nInstall with:\n  pip install -r tools/requirements-audio.txt")
+    return numpy
+
+
+@functools.lru_cache(maxsize=64)
+def click_track(frames: int, rate: int, channels: int):
+    """A 440 Hz tone pulsed at 120 BPM: cheap to make, and beat/silence detection has something to find."""
+    np = _numpy()
+    t = np.arange(frames) / rate
+    signal = 0.25 * np.sin(2 * np.pi * 440 * t) * (0.2 + 0.8 * np.exp(-(t % 0.5) * 12))
+    return np.repeat(signal[:, None], channels, axis=1).astype(np.float32)
+
+
+@functools.lru_cache(maxsize=64)
+def encode_audio(container: str, frames: int, rate: int, channels: int, encoding: str = "pcm_s16le") -> bytes:
+    """Click track as raw PCM, WAV or MP3 bytes (cached: benchmarks ask for the same clips repeatedly)."""
+    samples = click_track(frames, rate, channels)
+    if container == "raw":
+        if encoding == "pcm_f32le":
+            return samples.astype("<f4").tobytes()
+        return (samples * 32767).astype("<i2").tobytes()
+    if container == "wav":
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(channels)
+            out.setsampwidth(2)
+            out.setframerate(rate)
+            out.writeframes((samples * 32767).astype("<i2").tobytes())
+        return buffer.getvalue()
+    try:
+        import soundfile
+    except ImportError:
+        raise SystemExit("soundfile is not installed.\nInstall with:\n  pip install -r tools/requirements-audio.txt")
+    buffer = io.BytesIO()
+    soundfile.write(buffer, samples, rate, format="MP3")
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=32)
+def sprite_png(size: int, variant: int) -> bytes:
+    """A filled circle on white, one colour per variant (so different prompts give different files)."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        raise SystemExit("Pillow is not installed.\nInstall with:\n  pip install -r tools/requirements.txt")
+    colours = [(220, 60, 60), (60, 160, 80), (60, 90, 220), (230, 180, 40), (150, 70, 200), (40, 180, 190)]
+    image = Image.new("RGB", (size, size), (255, 255, 255))
+    margin = size // 6
+    ImageDraw.Draw(image).ellipse((margin, margin, size - margin, size - margin), fill=colours[variant % len(colours)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class MockProviders:
+    """aiohttp server on a background thread. start() returns the base URL; use as a context manager."""
+
+    def __init__(self, settings: MockSettings = None, host: str = "127.0.0.1", port: int = 0, seed: int = None):
+        self.settings = settings or MockSettings()
+        self.host = host
+        self.port = port
+        self.url: Optional[str] = None
+        self._random = random.Random(seed)
+        self._stats: Dict[str, dict] = {}
+        self._operations: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> str:
+        try:
+            from aiohttp import web
+        except ImportError:
+            raise SystemExit("aiohttp is not installed.\nInstall with:\n  pip install -r tools/requirements.txt")
+        _numpy()
+        ready = threading.Event()
+        failure = []
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._runner = web.AppRunner(self._app())
+                self._loop.run_until_complete(self._runner.setup())
+                site = web.TCPSite(self._runner, self.host, self.port)
+                self._loop.run_until_complete(site.start())
+                self.port = self._runner.addresses[0][1]
+            except Exception as e:
+                failure.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, name="mock-providers", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        self.url = f"http://{self.host}:{self.port}"
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop and self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockProviders":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-route counters: requests, errors, bytes, latency_seconds (sum of injected latency)."""
+        return {route: dict(counts) for route, counts in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        self._stats.clear()
+
+    # -- behaviour ---------------------------------------------------------
+
+    def _count(self, route: str, **values) -> None:
+        counts = self._stats.setdefault(route, {"requests": 0, "errors": 0, "bytes": 0, "latency_seconds": 0.0})
+        for name, value in values.items():
+            counts[name] += value
+
+    async def _delay(self, route: str) -> None:
+        s = self.settings
+        latency = s.latency * math.exp(self._random.gauss(0, s.jitter)) if s.jitter else s.latency
+        self._count(route, requests=1, latency_seconds=latency)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    def _failure(self, route: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        """(status, headers) when this request should fail, else None."""
+        s = self.settings
+        if s.error_rate <= 0 or self._random.random() >= s.error_rate:
+            return None
+        self._count(route, errors=1)
+        headers = {"Retry-After": f"{s.retry_after:g}"} if s.error_status == 429 else {}
+        return s.error_status, headers
+
+    def _audio_frames(self, seconds: Optional[float], rate: int, channels: int, container: str) -> int:
+        """Frames for a clip of `seconds`, or for a payload_kb-sized body when that is set."""
+        kb = self.settings.payload_kb
+        if kb:
+            if container == "mp3":
+                seconds = kb * 1024 * 8 / MP3_BITRATE
+            else:
+                return max(1, int(kb * 1024 / (2 * channels)))
+        seconds = seconds or self.settings.audio_seconds
+        return max(1, int(seconds * rate))
+
+    async def _encode(self, *args) -> bytes:
+        # MP3 encoding is CPU work; keep the event loop serving other requests
+        return await asyncio.get_running_loop().run_in_executor(None, encode_audio, *args)
+
+    def _pace(self, chunk_bytes: int, total_bytes: int, seconds: float) -> float:
+        speed = self.settings.stream_speed
+        return seconds * chunk_bytes / total_bytes / speed if speed and total_bytes else 0.0
+
+    async def _stream(self, request, route: str, body: bytes, content_type: str, seconds: float):
+        from aiohttp import web
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        for start in range(0, len(body), CHUNK_BYTES):
+            chunk = body[start:start + CHUNK_BYTES]
+            await response.write(chunk)
+            pause = self._pace(len(chunk), len(body), seconds)
+            if pause:
+                await asyncio.sleep(pause)
+        await response.write_eof()
+        self._count(route, bytes=len(body))
+        return response
+
+    # -- routes ------------------------------------------------------------
+
+    def _app(self):
+        from aiohttp import web
+        app = web.Application(client_max_size=64 * 1024 ** 2)
+        app.router.add_post("/v1/sound-generation", self.elevenlabs)
+        app.router.add_post("/tts/bytes", self.cartesia_bytes)
+        app.router.add_get("/tts/websocket", self.cartesia_websocket)
+        app.router.add_post("/v1/projects/{project}/locations/{location}/publishers/google/models/{model}:predict", self.vertex_predict)
+        app.router.add_post("/{version}/models/{model}:generateContent", self.gemini_generate)
+        app.router.add_post("/{version}/models/{model}:predictLongRunning", self.veo_submit)
+        app.router.add_get("/{version}/models/{model}/operations/{operation}", self.veo_poll)
+        app.router.add_get("/{version}/files/{file}:download", self.veo_download)
+        app.router.add_get("/_mock/stats", self.get_stats)
+        app.router.add_post("/_mock/settings", self.update_settings)
+        return app
+
+    @staticmethod
+    def _google_error(status: int, headers: dict):
+        from aiohttp import web
+        body = {"error": {"code": status, "message": "Mock provider error", "status": "UNAVAILABLE" if status >= 500 else "RESOURCE_EXHAUSTED"}}
+        return web.json_response(body, status=status, headers=headers)
+
+    async def elevenlabs(self, request):
+        from aiohttp import web
+        route = "elevenlabs"
+        data = await request.json()
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return web.json_response({"detail": {"status": "mock_error", "message": "Mock provider error"}}, status=failure[0], headers=failure[1])
+        output_format = request.query.get("output_format", "mp3_44100_128")
+        kind, _, rest = output_format.partition("_")
+        rate = int(rest.split("_")[0]) if rest[:1].isdigit() else 44100
+        container = "raw" if kind == "pcm" else "mp3"
+        seconds = data.get("duration_seconds") or self.settings.audio_seconds
+        body = await self._encode(container, self._audio_frames(seconds, rate, 1, container), rate, 1)
+        content_type = "audio/mpeg" if container == "mp3" else "application/octet-stream"
+        return await self._stream(request, route, body, content_type, seconds)
+
+    def _cartesia_audio(self, data: dict) -> Tuple[str, int, str, float]:
+        output_format = data.get("output_format") or {}
+        container = output_format.get("container", "mp3")
+        rate = int(output_format.get("sample_rate") or 44100)
+        encoding = output_format.get("encoding", "pcm_s16le")
+        seconds = max(0.5, len(data.get("transcript", "")) / SPEECH_CHARS_PER_SECOND)
+        return container, rate, encoding, seconds
+
+    async def cartesia_bytes(self, request):
+        from aiohttp import web
+        route = "cartesia"
+        data = await request.json()
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return web.Response(text="Mock provider error", status=failure[0], headers=failure[1])
+        container, rate, encoding, seconds = self._cartesia_audio(data)
+        body = await self._encode(container, self._audio_frames(seconds, rate, 1, container), rate, 1, encoding)
+        content_type = {"mp3": "audio/mpeg", "wav": "audio/wav"}.get(container, "application/octet-stream")
+        return await self._stream(request, route, body, content_type, seconds)
+
+    async def cartesia_websocket(self, request):
+        from aiohttp import WSMsgType, web
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        send_lock = asyncio.Lock()
+
+        async def send(message: dict) -> None:
+            async with send_lock:
+                if not ws.closed:
+                    await ws.send_json(message)
+
+        async def context(data: dict) -> None:
+            route = "cartesia-ws"
+            context_id = data.get("context_id")
+            await self._delay(route)
+            failure = self._failure(route)
+            if failure:
+                await send({"type": "error", "context_id": context_id, "status_code": failure[0], "error": "Mock provider error", "done": True})
+                return
+            _, rate, encoding, seconds = self._cartesia_audio(data)
+            body = await self._encode("raw", self._audio_frames(seconds, rate, 1, "raw"), rate, 1, encoding)
+            for start in range(0, len(body), CHUNK_BYTES // 4):
+                chunk = body[start:start + CHUNK_BYTES // 4]
+                await send({"type": "chunk", "context_id": context_id, "status_code": 206, "done": False,
+                            "data": base64.b64encode(chunk).decode("ascii")})
+                pause = self._pace(len(chunk), len(body), seconds)
+                if pause:
+                    await asyncio.sleep(pause)
+            await send({"type": "done", "context_id": context_id, "status_code": 200, "done": True})
+            self._count(route, bytes=len(body))
+
+        tasks = set()
+        received = 0
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            task = asyncio.ensure_future(context(json.loads(message.data)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            received += 1
+            if self.settings.ws_drop_after and received >= self.settings.ws_drop_after:
+                # Drop the connection with contexts still in flight, like a network blip
+                await asyncio.sleep(0)
+                await ws.close()
+                break
+        for task in tasks:
+            task.cancel()
+        return ws
+
+    async def vertex_predict(self, request):
+        from aiohttp import web
+        route = "vertex"
+        data = await request.json()
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return self._google_error(*failure)
+        samples = (data.get("parameters") or {}).get("sample_count") or 1
+        rate, channels = 48000, 2
+        clip = await self._encode("wav", self._audio_frames(None, rate, channels, "wav"), rate, channels)
+        encoded = base64.b64encode(clip).decode("ascii")
+        predictions = [
+            {"bytesBase64Encoded": encoded, "mimeType": "audio/wav"}
+            for _ in data.get("instances", [])
+            for _ in range(samples)
+        ]
+        body = json.dumps({"predictions": predictions, "deployedModelId": "mock"}).encode("utf-8")
+        return await self._stream(request, route, body, "application/json", self.settings.audio_seconds)
+
+    async def gemini_generate(self, request):
+        from aiohttp import web
+        route = "gemini"
+        data = await request.json()
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return self._google_error(*failure)
+        prompt = json.dumps(data.get("contents"), sort_keys=True)
+        png = await asyncio.get_running_loop().run_in_executor(
+            None, sprite_png, self.settings.image_size, sum(prompt.encode("utf-8")))
+        self._count(route, bytes=len(png))
+        return web.json_response({
+            "candidates": [{
+                "content": {"role": "model", "parts": [
+                    {"text": "Mock image"},
+                    {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(png).decode("ascii")}},
+                ]},
+                "finishReason": "STOP",
+            }]
+        })
+
+    async def veo_submit(self, request):
+        from aiohttp import web
+        route = "veo"
+        await request.read()
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return self._google_error(*failure)
+        operation = uuid.uuid4().hex
+        self._operations[operation] = time.monotonic() + self.settings.render_seconds
+        name = f"models/{request.match_info['model']}/operations/{operation}"
+        return web.json_response({"name": name})
+
+    async def veo_poll(self, request):
+        from aiohttp import web
+        route = "veo-poll"
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return self._google_error(*failure)
+        operation = request.match_info["operation"]
+        ready_at = self._operations.get(operation)
+        if ready_at is None:
+            return self._google_error(404, {})
+        name = f"models/{request.match_info['model']}/operations/{operation}"
+        if time.monotonic() < ready_at:
+            return web.json_response({"name": name})
+        # google-genai turns "files/<id>" into GET /<version>/files/<id>:download (it only parses https:// URIs itself)
+        uri = f"files/{operation}"
+        return web.json_response({
+            "name": name,
+            "done": True,
+            "response": {"generateVideoResponse": {"generatedSamples": [{"video": {"uri": uri}}]}},
+        })
+
+    async def veo_download(self, request):
+        route = "veo-download"
+        await self._delay(route)
+        failure = self._failure(route)
+        if failure:
+            return self._google_error(*failure)
+        body = bytes(int(self.settings.video_kb * 1024))
+        return await self._stream(request, route, body, "video/mp4", 0.0)
+
+    async def get_stats(self, request):
+        from aiohttp import web
+        return web.json_response({"settings": dataclasses.asdict(self.settings), "routes": self.stats()})
+
+    async def update_settings(self, request):
+        from aiohttp import web
+        changes = await request.json()
+        reset = changes.pop("reset_stats", False)
+        unknown = set(changes) - {field.name for field in dataclasses.fields(MockSettings)}
+        if unknown:
+            return web.json_response({"error": f"Unknown settings: {', '.join(sorted(unknown))}"}, status=400)
+        self.settings = dataclasses.replace(self.settings, **changes)
+        if reset:
+            self.reset_stats()
+        return web.json_response(dataclasses.asdict(self.settings))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the ElevenLabs, Cartesia, Vertex and Gemini/Veo APIs",
+        epilog="Then run the tools with NOYOLA_MOCK_PROVIDERS=http://HOST:PORT (plus the dummy keys printed on start).",
+    )
+    defaults = MockSettings()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Median seconds before each response starts")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="Lognormal spread around the median (0 = fixed)")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of requests that fail (0-1)")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status, help="Status for failed requests (429 adds Retry-After)")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--payload-kb", type=float, help="Fixed audio response size (default: the requested duration)")
+    parser.add_argument("--audio-seconds", type=float, default=defaults.audio_seconds, help="Clip length when the request doesn't specify one")
+    parser.add_argument("--stream-speed", type=float, default=defaults.stream_speed, help="Audio seconds streamed per second (0 = unthrottled)")
+    parser.add_argument("--render-seconds", type=float, default=defaults.render_seconds, help="Time until a Veo operation is done")
+    parser.add_argument("--image-size", type=int, default=defaults.image_size, help="Gemini image width/height in pixels")
+    parser.add_argument("--video-kb", type=float, default=defaults.video_kb, help="Veo download size")
+    parser.add_argument("--ws-drop-after", type=int, default=defaults.ws_drop_after, help="Close each Cartesia websocket after N contexts (0 = never)")
+    parser.add_argument("--seed", type=int, help="Seed latency and error injection for repeatable runs")
+    args = parser.parse_args()
+
+    settings = MockSettings(**{
+        field.name: getattr(args, field.name) for field in dataclasses.fields(MockSettings)
+    })
+    mock = MockProviders(settings, host=args.host, port=args.port, seed=args.seed)
+    url = mock.start()
+    print(f"Mock providers listening on {url}")
+    print(f"  latency {settings.latency:g}s (jitter {settings.jitter:g}), error rate {settings.error_rate:.0%} ({settings.error_status})")
+    print("\nPoint the tools at it:")
+    print(f"  export NOYOLA_MOCK_PROVIDERS={url}")
+    print("  export " + " ".join(f"{name}={value}" for name, value in MOCK_ENV.items()))
+    print(f"\nStats: {url}/_mock/stats   (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.stop()
+        for route, counts in sorted(mock.stats().items()):
+            print(f"  {route:<14} {counts['requests']:>5} requests  {counts['errors']:>4} errors  {counts['bytes'] / 1024:>9.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Shrink generated PNGs and emit WebP (optionally AVIF) variants.
+
+For every PNG:
+- Lossless: re-encode with maximum zlib effort; images with 256 colours or
+  fewer become exact indexed-palette PNGs (identical pixels, far fewer bytes).
+- Pixel styles (--style pixel-art / 8-bit / 16-bit): quantize to the palette
+  size in IMAGE_OPTIMIZE["palette_sizes"], without dithering so pixels stay crisp.
+- Variants: name.webp next to name.png (lossless for palette/pixel art, lossy
+  otherwise) and name.avif with --avif if Pillow was built with AVIF support.
+
+A PNG is only rewritten when the result is smaller, and PNGs whose .webp is
+newer than them are skipped, so re-running over assets/ is cheap. Files are
+processed in a process pool across all cores, and savings are reported per
+directory.
+
+Usage:
+    python tools/optimize_images.py assets/sprites assets/backgrounds
+    python tools/optimize_images.py assets/sprites/pixel-quest --style pixel-art
+    python tools/optimize_images.py assets --dry-run              # report savings, write nothing
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import IMAGE_OPTIMIZE
+from streaming import AtomicFile
+
+PIXEL_STYLES = set(IMAGE_OPTIMIZE["palette_sizes"])
+
+
+@dataclass
+class OptimizeResult:
+    """What happened to one PNG (sizes in bytes)."""
+    path: str
+    original_bytes: int = 0
+    png_bytes: int = 0
+    webp_bytes: int = 0
+    avif_bytes: int = 0
+    action: str = "unchanged"   # unchanged, recompressed, palette, quantized
+    error: Optional[str] = None
+
+
+def _encode_png(img, **params) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True, **params)
+    return buffer.getvalue()
+
+
+def _exact_palette(img):
+    """Convert an RGB(A) image with <= 256 colours to mode P without changing a single pixel."""
+    import numpy as np
+    from PIL import Image
+
+    if img.mode not in ("RGB", "RGBA") or img.getcolors(256) is None:
+        return None, {}
+    rgba = np.ascontiguousarray(np.asarray(img.convert("RGBA")))
+    packed = rgba.view(np.uint32).reshape(rgba.shape[:2])
+    colors, indices = np.unique(packed, return_inverse=True)
+    palette = colors.view(np.uint8).reshape(-1, 4)
+
+    indexed = Image.fromarray(indices.reshape(packed.shape).astype(np.uint8), "P")
+    indexed.putpalette(palette[:, :3].tobytes())
+    params = {}
+    if (palette[:, 3] < 255).any():
+        params["transparency"] = palette[:, 3].tobytes()
+    return indexed, params
+
+
+def _quantize(img, colors: int):
+    """Lossy palette reduction for pixel styles (no dithering)."""
+    from PIL import Image
+
+    source = img.convert("RGBA") if img.mode not in ("RGB", "RGBA") else img
+    return source.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+
+def _variant_is_fresh(variant: Path, source: Path) -> bool:
+    try:
+        return variant.stat().st_mtime >= source.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def optimize_image(
+    path: str,
+    style: Optional[str] = None,
+    webp: bool = True,
+    avif: bool = False,
+    write: bool = True,
+    force: bool = False,
+) -> OptimizeResult:
+    """
+    Recompress one PNG in place and write its WebP/AVIF variants.
+
+    Args:
+        path: PNG to optimize
+        style: Art style it was generated with; pixel styles are palette-quantized
+        webp: Write path.webp next to the PNG
+        avif: Write path.avif next to the PNG (needs Pillow AVIF support)
+        write: False only measures (dry run)
+        force: Re-process even if the WebP variant shows the PNG was already optimized
+
+    Returns:
+        OptimizeResult with before/after sizes
+    """
+    from PIL import Image, features
+
+    source = Path(path)
+    result = OptimizeResult(path=str(source))
+    try:
+        result.original_bytes = source.stat().st_size
+        webp_path = source.with_suffix(".webp")
+        if webp and not force and _variant_is_fresh(webp_path, source):
+            # Written right after the PNG on an earlier run: nothing left to do
+            result.png_bytes = result.original_bytes
+            result.webp_bytes = webp_path.stat().st_size
+            return result
+        with Image.open(source) as img:
+            img.load()
+
+        # An indexed palette beats any full-colour re-encode by far, so only
+        # pay for the slow maximum-effort deflate when there is no palette option
+        exact, params = _exact_palette(img)
+        if exact is not None:
+            action, best, data = "palette", exact, _encode_png(exact, **params)
+        elif style in PIXEL_STYLES:
+            best = _quantize(img, IMAGE_OPTIMIZE["palette_sizes"][style])
+            action, data = "quantized", _encode_png(best)
+        else:
+            action, best, data = "recompressed", img, _encode_png(img)
+
+        if len(data) < result.original_bytes:
+            result.action = action
+            result.png_bytes = len(data)
+            if write:
+                with AtomicFile(str(source)) as target:
+                    target.write(data)
+        else:
+            best = img
+            result.png_bytes = result.original_bytes
+
+        # Variants come from the pixels the PNG now holds (the exact palette is the original's pixels)
+        variant_source = best if result.action == "quantized" else img
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        rgb = variant_source.convert("RGBA" if has_alpha else "RGB")
+        lossless = best.mode == "P" or style in PIXEL_STYLES
+
+        variants = []
+        if webp:
+            # Lossless "quality" is encoder effort; 80 is within ~5% of the maximum at a fraction of the time
+            variants.append((webp_path, "WEBP", {
+                "lossless": lossless, "quality": 80 if lossless else IMAGE_OPTIMIZE["webp_quality"], "method": 4,
+            }))
+        if avif and features.check("avif"):
+            variants.append((source.with_suffix(".avif"), "AVIF", {"quality": IMAGE_OPTIMIZE["avif_quality"]}))
+
+        for variant, fmt, options in variants:
+            if _variant_is_fresh(variant, source):
+                size = variant.stat().st_size
+            else:
+                buffer = io.BytesIO()
+                rgb.save(buffer, format=fmt, **options)
+                size = buffer.tell()
+                if write:
+                    with AtomicFile(str(variant)) as target:
+                        target.write(buffer.getvalue())
+            if fmt == "WEBP":
+                result.webp_bytes = size
+            else:
+                result.avif_bytes = size
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    return result
+
+
+def find_pngs(paths: Iterable[str]) -> List[str]:
+    """Expand files and directories (recursively) into a sorted list of PNGs."""
+    found = set()
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            found.update(str(f) for f in p.rglob("*.png"))
+        elif p.suffix.lower() == ".png" and p.exists():
+            found.add(str(p))
+        else:
+            print(f"  Warning: skipping {path} (not a PNG or directory)")
+    return sorted(found)
+
+
+def optimize_paths(
+    paths: List[str],
+    style: Optional[str] = None,
+    webp: bool = True,
+    avif: bool = False,
+    write: bool = True,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> List[OptimizeResult]:
+    """Optimize many PNGs across a process pool (pixel work is CPU-bound)."""
+    if not paths:
+        return []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) == 1:
+        return [optimize_image(path, style, webp, avif, write, force) for path in paths]
+    count = len(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(
+            optimize_image, paths, [style] * count, [webp] * count, [avif] * count, [write] * count, [force] * count,
+            chunksize=max(1, count // (workers * 4)),
+        ))
+
+
+def print_report(results: List[OptimizeResult]) -> None:
+    """Bytes before/after per directory, plus variant totals."""
+    by_dir = {}
+    for result in results:
+        by_dir.setdefault(str(Path(result.path).parent), []).append(result)
+
+    def mb(size: int) -> str:
+        return f"{size / (1024 * 1024):8.2f} MB"
+
+    print(f"\n{'Directory':<52} {'Files':>5} {'Before':>11} {'PNG after':>11} {'Saved':>11} {'WebP':>11}")
+    totals = [0, 0, 0]
+    for directory in sorted(by_dir):
+        group = by_dir[directory]
+        before = sum(r.original_bytes for r in group)
+        after = sum(r.png_bytes for r in group if not r.error) + sum(r.original_bytes for r in group if r.error)
+        webp = sum(r.webp_bytes for r in group)
+        totals[0] += before
+        totals[1] += after
+        totals[2] += webp
+        print(f"{directory:<52} {len(group):>5} {mb(before)} {mb(after)} {mb(before - after)} {mb(webp)}")
+    print(f"{'TOTAL':<52} {len(results):>5} {mb(totals[0])} {mb(totals[1])} {mb(totals[0] - totals[1])} {mb(totals[2])}")
+
+    actions = {}
+    for result in results:
+        key = "error" if result.error else result.action
+        actions[key] = actions.get(key, 0) + 1
+    print("Actions: " + ", ".join(f"{count} {action}" for action, count in sorted(actions.items())))
+    for result in results:
+        if result.error:
+            print(f"  Error ({result.path}): {result.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Losslessly recompress PNGs, quantize pixel art and write WebP/AVIF variants")
+    parser.add_argument("paths", nargs="+", help="PNG files or directories (searched recursively)")
+    parser.add_argument("--style", "-s", choices=sorted(PIXEL_STYLES | {"painterly", "realistic", "cartoon", "flat", "anime"}),
+                        help="Art style of the inputs; pixel styles are quantized to an indexed palette")
+    parser.add_argument("--no-webp", action="store_true", help="Don't write .webp variants")
+    parser.add_argument("--avif", action="store_true", help="Also write .avif variants (if Pillow supports AVIF)")
+    parser.add_argument("--dry-run", action="store_true", help="Measure savings without writing anything")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Re-process PNGs that already have an up-to-date .webp")
+    args = parser.parse_args()
+
+    pngs = find_pngs(args.paths)
+    if not pngs:
+        print("No PNG files found")
+        sys.exit(1)
+
+    print(f"Optimizing {len(pngs)} PNG(s){' (dry run)' if args.dry_run else ''}...")
+    start = time.perf_counter()
+    results = optimize_paths(
+        pngs,
+        style=args.style,
+        webp=not args.no_webp,
+        avif=args.avif,
+        write=not args.dry_run,
+        workers=args.workers,
+        force=args.force,
+    )
+    print_report(results)
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    if any(result.error for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+"""
+Pack glTF models into quantized, welded GLBs with downsized textures.
+
+For every .gltf (and .glb) under a folder:
+- Geometry and JSON go into one GLB, so a model is one request instead of
+  .gltf + .bin + textures.
+- Vertices with identical attributes are welded and degenerate triangles
+  dropped; indices become uint16 where the vertex count allows.
+- Attributes are quantized (KHR_mesh_quantization): int16 positions, int8
+  normals/tangents, uint16 UVs. Positions are dequantized by a uniform
+  scale + offset folded into the nodes that use the mesh, so skinned meshes
+  and nodes with children keep float positions.
+- Textures larger than MODEL_OPTIMIZE["max_texture_size"] are downscaled.
+  Each distinct texture is processed once and written to <out>/textures/,
+  which every GLB references (asset packs share a handful of texture sets
+  across hundreds of models); --embed-textures puts them inside each GLB.
+
+Outputs mirror the input tree under --out-dir (default: <folder>-optimized)
+and are skipped when newer than their inputs. Work runs in a process pool.
+
+Usage:
+    python tools/optimize_models.py assets/models/99-nights-in-space
+    python tools/optimize_models.py assets/models/99-nights-in-space --max-texture 512 --out-dir build/models
+    python tools/optimize_models.py path/to/models --no-quantize --embed-textures
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from config import MODEL_OPTIMIZE
+from streaming import AtomicFile
+
+COMPONENT_DTYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+DTYPE_COMPONENTS = {np.dtype(dtype): component for component, dtype in COMPONENT_DTYPES.items()}
+NORMALIZED_SCALE = {5120: 127.0, 5121: 255.0, 5122: 32767.0, 5123: 65535.0}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+TYPE_NAMES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4", 16: "MAT4"}
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+
+@dataclass
+class ModelResult:
+    """Before/after numbers for one model (bytes exclude external textures)."""
+    path: str
+    input_bytes: int = 0
+    output_bytes: int = 0
+    vertices_before: int = 0
+    vertices_after: int = 0
+    triangles: int = 0
+    skipped: bool = False
+    error: Optional[str] = None
+
+
+# --- Reading ------------------------------------------------------------------
+
+def load_gltf(path: Path) -> Tuple[dict, List[bytes]]:
+    """Parse a .gltf or .glb. Returns (document, buffer contents)."""
+    data = path.read_bytes()
+    binary_chunk = None
+    if data[:4] == GLB_MAGIC:
+        offset = 12
+        doc = None
+        while offset < len(data):
+            length, kind = struct.unpack_from("<II", data, offset)
+            chunk = data[offset + 8:offset + 8 + length]
+            if kind == CHUNK_JSON:
+                doc = json.loads(chunk.decode("utf-8"))
+            elif kind == CHUNK_BIN and binary_chunk is None:
+                binary_chunk = chunk
+            offset += 8 + length
+        if doc is None:
+            raise ValueError("GLB has no JSON chunk")
+    else:
+        doc = json.loads(data.decode("utf-8"))
+
+    buffers = []
+    for buffer in doc.get("buffers", []):
+        uri = buffer.get("uri")
+        if uri is None:
+            buffers.append(binary_chunk or b"")
+        elif uri.startswith("data:"):
+            buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+        else:
+            buffers.append((path.parent / unquote(uri)).read_bytes())
+    return doc, buffers
+
+
+def read_accessor(doc: dict, buffers: List[bytes], index: int, normalize: bool = True) -> np.ndarray:
+    """Accessor contents as a (count, components) array; normalized integers become floats if `normalize`."""
+    accessor = doc["accessors"][index]
+    if "sparse" in accessor:
+        raise ValueError("sparse accessors are not supported")
+    component = accessor["componentType"]
+    dtype = np.dtype(COMPONENT_DTYPES[component]).newbyteorder("<")
+    size = TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        values = np.zeros((count, size), dtype=dtype)
+    else:
+        view = doc["bufferViews"][accessor["bufferView"]]
+        stride = view.get("byteStride") or dtype.itemsize * size
+        values = np.ndarray(
+            shape=(count, size), dtype=dtype, buffer=buffers[view["buffer"]],
+            offset=view.get("byteOffset", 0) + accessor.get("byteOffset", 0), strides=(stride, dtype.itemsize),
+        ).copy()
+    if normalize and accessor.get("normalized"):
+        return np.maximum(values.astype(np.float32) / NORMALIZED_SCALE[component], -1.0)
+    return values
+
+
+def _image_bytes(doc: dict, buffers: List[bytes], image: dict, base: Path) -> bytes:
+    if "bufferView" in image:
+        view = doc["bufferViews"][image["bufferView"]]
+        start = view.get("byteOffset", 0)
+        return buffers[view["buffer"]][start:start + view["byteLength"]]
+    uri = image["uri"]
+    if uri.startswith("data:"):
+        return base64.b64decode(uri.split(",", 1)[1])
+    return (base / unquote(uri)).read_bytes()
+
+
+# --- Textures -------------------------------------------------------------------
+
+def shrink_image(data: bytes, max_size: int) -> Tuple[bytes, str]:
+    """Downscale encoded image bytes so the longest side is <= max_size. Returns (bytes, mime type)."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = img.format or "PNG"
+        mime = Image.MIME.get(fmt, "image/png")
+        if max(img.size) <= max_size:
+            return data, mime
+        img.load()
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        if fmt == "JPEG":
+            img.save(buffer, format="JPEG", quality=90)
+        else:
+            img.save(buffer, format="PNG")
+            mime = "image/png"
+        return buffer.getvalue(), mime
+
+
+def external_textures(path: Path) -> List[Path]:
+    """Image files a model references by uri (not embedded)."""
+    doc = json.loads(path.read_text(encoding="utf-8")) if path.suffix.lower() == ".gltf" else load_gltf(path)[0]
+    return [
+        (path.parent / unquote(image["uri"])).resolve()
+        for image in doc.get("images", [])
+        if "uri" in image and not image["uri"].startswith("data:")
+    ]
+
+
+def plan_textures(sources: List[Path], texture_dir: Path) -> Dict[Path, Path]:
+    """
+    Give every distinct texture one output path in texture_dir.
+
+    Identical files (the same texture copied into several folders) share one
+    output; different files with the same name get a hash suffix.
+    """
+    plan = {}
+    by_hash = {}
+    taken = {}
+    for source in sorted(set(sources)):
+        if not source.exists():
+            continue
+        digest = file_sha256(str(source))
+        if digest not in by_hash:
+            name = source.name
+            if taken.get(name, digest) != digest:
+                name = f"{source.stem}-{digest[:8]}{source.suffix}"
+            taken[name] = digest
+            by_hash[digest] = texture_dir / name
+        plan[source] = by_hash[digest]
+    return plan
+
+
+def process_texture(source: str, target: str, max_size: int) -> Tuple[int, int]:
+    """Write a downscaled copy of one texture. Returns (source bytes, output bytes)."""
+    src, dst = Path(source), Path(target)
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        return src.stat().st_size, dst.stat().st_size
+    data = src.read_bytes()
+    shrunk, _ = shrink_image(data, max_size)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if shrunk is data:
+        shutil.copyfile(src, dst)
+    else:
+        with AtomicFile(str(dst)) as f:
+            f.write(shrunk)
+    return len(data), dst.stat().st_size
+
+
+# --- Geometry -------------------------------------------------------------------
+
+def _texture_infos(node) -> List[dict]:
+    """Every textureInfo (dict with an image "index") under a material, including extension textures."""
+    found = []
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key.endswith("Texture") and isinstance(value, dict) and "index" in value:
+                found.append(value)
+            else:
+                found += _texture_infos(value)
+    elif isinstance(node, list):
+        for value in node:
+            found += _texture_infos(value)
+    return found
+
+
+def _plan_uv_transforms(doc: dict, buffers: List[bytes], groups: Dict[tuple, List[dict]]) -> Dict[tuple, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Quantization ranges for TEXCOORD_0 outside [0, 1] (tiling trim sheets).
+
+    uint16 UVs are mapped back with a KHR_texture_transform offset/scale on the
+    material. Primitives sharing a material must share the range, so groups are
+    clustered by material first. Materials that already use a transform or a
+    second UV set keep float UVs. Adds the transforms to the materials.
+
+    Returns:
+        {group key: (low, span)} for the groups whose UVs get quantized this way
+    """
+    parent = {key: key for key in groups}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    owner = {}
+    for key, primitives in groups.items():
+        for primitive in primitives:
+            material = primitive.get("material")
+            if material is None:
+                continue
+            if material in owner:
+                parent[find(key)] = find(owner[material])
+            else:
+                owner[material] = key
+    clusters: Dict[tuple, List[tuple]] = {}
+    for key in groups:
+        clusters.setdefault(find(key), []).append(key)
+
+    plan = {}
+    for keys in clusters.values():
+        keys = [k for k in keys if "TEXCOORD_0" in groups[k][0]["attributes"] and "targets" not in groups[k][0]]
+        materials = {p["material"] for k in keys for p in groups[k] if p.get("material") is not None}
+        infos = [info for m in sorted(materials) for info in _texture_infos(doc["materials"][m])]
+        if not keys or any(info.get("texCoord", 0) != 0 or "KHR_texture_transform" in info.get("extensions", {}) for info in infos):
+            continue
+        uvs = np.concatenate([read_accessor(doc, buffers, groups[k][0]["attributes"]["TEXCOORD_0"]) for k in keys])
+        low, high = uvs.min(axis=0).astype(np.float64), uvs.max(axis=0).astype(np.float64)
+        if len(uvs) == 0 or (low.min() >= 0.0 and high.max() <= 1.0):
+            continue    # Fits normalized uint16 as-is
+        span = np.where(high > low, high - low, 1.0)
+        for key in keys:
+            plan[key] = (low, span)
+        for info in infos:
+            info.setdefault("extensions", {})["KHR_texture_transform"] = {"offset": low.tolist(), "scale": span.tolist()}
+    return plan
+
+
+def _encode_attribute(name: str, values: np.ndarray, raw: np.ndarray, accessor: dict,
+                      quantize: bool, position_quant, uv_quant=None) -> Tuple[np.ndarray, bool]:
+    """Final storage for one vertex attribute. Returns (array, normalized)."""
+    if name == "POSITION":
+        if position_quant is not None:
+            center, scale = position_quant
+            return np.round((values - center) / scale).astype(np.int16), False
+        return values.astype(np.float32), False
+    if name in ("NORMAL", "TANGENT"):
+        if quantize:
+            return np.round(np.clip(values, -1.0, 1.0) * 127.0).astype(np.int8), True
+        return values.astype(np.float32), False
+    if name.startswith("TEXCOORD_"):
+        if uv_quant is not None:
+            low, span = uv_quant
+            return np.round(np.clip((values - low) / span, 0.0, 1.0) * 65535.0).astype(np.uint16), True
+        # Only UVs inside [0, 1] fit a normalized uint16 without a texture transform
+        if quantize and len(values) and values.min() >= 0.0 and values.max() <= 1.0:
+            return np.round(values * 65535.0).astype(np.uint16), True
+        return values.astype(np.float32), False
+    if name.startswith("COLOR_") and quantize and accessor["componentType"] == 5126:
+        return np.round(np.clip(values, 0.0, 1.0) * 255.0).astype(np.uint8), True
+    # JOINTS/WEIGHTS/custom attributes keep their original storage
+    return raw, bool(accessor.get("normalized"))
+
+
+def weld(attributes: Dict[str, np.ndarray], indices: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Merge vertices whose stored attributes are byte-identical, keeping first-use order."""
+    count = len(next(iter(attributes.values())))
+    if count == 0:
+        return attributes, indices
+    rows = np.hstack([np.ascontiguousarray(a).reshape(count, -1).view(np.uint8) for a in attributes.values()])
+    rows = np.ascontiguousarray(rows)
+    keys = rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    kept = first[order]
+    return {name: a[kept] for name, a in attributes.items()}, remap[inverse.ravel()][indices]
+
+
+def _drop_degenerate(indices: np.ndarray) -> np.ndarray:
+    triangles = indices.reshape(-1, 3)
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    return triangles[keep].ravel()
+
+
+def _quat_rotate(q: List[float], v: np.ndarray) -> np.ndarray:
+    x, y, z, w = q
+    u = np.array([x, y, z])
+    return v + 2.0 * w * np.cross(u, v) + 2.0 * np.cross(u, np.cross(u, v))
+
+
+def _fold_dequantization(node: dict, center: np.ndarray, scale: float) -> None:
+    """node transform := node transform x translate(center) x scale(scale)."""
+    if "matrix" in node:
+        matrix = np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+        dequant = np.diag([scale, scale, scale, 1.0])
+        dequant[:3, 3] = center
+        node["matrix"] = (matrix @ dequant).T.ravel().tolist()
+        return
+    node_scale = np.array(node.get("scale", [1.0, 1.0, 1.0]), dtype=np.float64)
+    rotation = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    translation = np.array(node.get("translation", [0.0, 0.0, 0.0]), dtype=np.float64)
+    node["translation"] = (translation + _quat_rotate(rotation, node_scale * center)).tolist()
+    node["scale"] = (node_scale * scale).tolist()
+
+
+class _GlbWriter:
+    """Accumulates bufferViews/accessors into one binary chunk."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.views: List[dict] = []
+        self.accessors: List[dict] = []
+
+    def add_view(self, payload: bytes, target: Optional[int] = None, stride: Optional[int] = None) -> int:
+        self.data.extend(b"\0" * (-len(self.data) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.data), "byteLength": len(payload)}
+        if target:
+            view["target"] = target
+        if stride:
+            view["byteStride"] = stride
+        self.data.extend(payload)
+        self.views.append(view)
+        return len(self.views) - 1
+
+    def add_accessor(self, values: np.ndarray, normalized: bool = False, target: Optional[int] = None,
+                     type_name: Optional[str] = None, bounds: bool = False) -> int:
+        values = np.ascontiguousarray(values)
+        count = len(values)
+        size = values.shape[1] if values.ndim > 1 else 1
+        element = values.dtype.itemsize * size
+        stride = None
+        payload = values.astype(values.dtype.newbyteorder("<"), copy=False).tobytes()
+        # Vertex attributes must start on 4-byte boundaries (int8 vec3 normals, int16 vec3 positions)
+        if target == ARRAY_BUFFER and element % 4:
+            stride = element + (-element % 4)
+            padded = np.zeros((count, stride), dtype=np.uint8)
+            padded[:, :element] = np.frombuffer(payload, dtype=np.uint8).reshape(count, element)
+            payload = padded.tobytes()
+        accessor = {
+            "bufferView": self.add_view(payload, target, stride),
+            "componentType": DTYPE_COMPONENTS[values.dtype],
+            "count": count,
+            "type": type_name or TYPE_NAMES[size],
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds and count:
+            flat = values.reshape(count, size)
+            cast = float if values.dtype.kind == "f" else int
+            accessor["min"] = [cast(v) for v in flat.min(axis=0)]
+            accessor["max"] = [cast(v) for v in flat.max(axis=0)]
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def to_glb(self, doc: dict) -> bytes:
+        self.data.extend(b"\0" * (-len(self.data) % 4))
+        doc["buffers"] = [{"byteLength": len(self.data)}] if self.data else []
+        doc["bufferViews"] = self.views
+        doc["accessors"] = self.accessors
+        json_chunk = json.dumps(doc, separators=(",", ":")).encode("utf-8")
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        total = 12 + 8 + len(json_chunk) + (8 + len(self.data) if self.data else 0)
+        parts = [struct.pack("<4sII", GLB_MAGIC, 2, total), struct.pack("<II", len(json_chunk), CHUNK_JSON), json_chunk]
+        if self.data:
+            parts += [struct.pack("<II", len(self.data), CHUNK_BIN), bytes(self.data)]
+        return b"".join(parts)
+
+
+def optimize_model(
+    source: str,
+    target: str,
+    textures: Dict[str, str],
+    max_texture: int = MODEL_OPTIMIZE["max_texture_size"],
+    quantize: bool = MODEL_OPTIMIZE["quantize"],
+    embed_textures: bool = MODEL_OPTIMIZE["embed_textures"],
+) -> ModelResult:
+    """
+    Convert one model to an optimized GLB.
+
+    Args:
+        source: .gltf or .glb to read
+        target: .glb to write
+        textures: Source texture path -> processed texture path (from plan_textures)
+        max_texture: Longest side for embedded textures
+        quantize: Store attributes with KHR_mesh_quantization
+        embed_textures: Put images inside the GLB instead of referencing the shared copies
+
+    Returns:
+        ModelResult with sizes and vertex counts
+    """
+    src, dst = Path(source), Path(target)
+    result = ModelResult(path=source)
+    try:
+        doc, buffers = load_gltf(src)
+        result.input_bytes = src.stat().st_size + sum(
+            (src.parent / unquote(b["uri"])).stat().st_size
+            for b in doc.get("buffers", []) if b.get("uri") and not b["uri"].startswith("data:")
+        )
+        writer = _GlbWriter()
+        nodes = doc.get("nodes", [])
+
+        # Positions can only be dequantized through the node transform when every user of the mesh
+        # honours it (skinned meshes ignore it), no child node would inherit the extra scale and
+        # no animation channel overwrites the node's transform with the unscaled one
+        animated = {
+            channel["target"]["node"]
+            for animation in doc.get("animations", [])
+            for channel in animation.get("channels", [])
+            if "node" in channel.get("target", {})
+        }
+        users: Dict[int, List[int]] = {}
+        for node_index, node in enumerate(nodes):
+            if "mesh" in node:
+                users.setdefault(node["mesh"], []).append(node_index)
+        position_quant: Dict[int, Tuple[np.ndarray, float]] = {}
+        for mesh_index, mesh in enumerate(doc.get("meshes", [])):
+            movable = users.get(mesh_index) and all(
+                "skin" not in nodes[n] and not nodes[n].get("children") and n not in animated for n in users[mesh_index]
+            )
+            if not quantize or not movable or any("targets" in p for p in mesh["primitives"]):
+                continue
+            positions = [read_accessor(doc, buffers, p["attributes"]["POSITION"]) for p in mesh["primitives"] if "POSITION" in p["attributes"]]
+            if not positions:
+                continue
+            stacked = np.concatenate(positions)
+            low, high = stacked.min(axis=0), stacked.max(axis=0)
+            center = (low + high) / 2.0
+            extent = float((high - low).max())
+            position_quant[mesh_index] = (center, extent / 65534.0 if extent > 0 else 1.0)
+
+        copied: Dict[int, int] = {}
+
+        def copy_accessor(index: int) -> int:
+            """Non-geometry accessors (animation, skins) go across unchanged."""
+            if index not in copied:
+                old = doc["accessors"][index]
+                values = read_accessor(doc, buffers, index, normalize=False)
+                new_index = writer.add_accessor(values, bool(old.get("normalized")), type_name=old["type"])
+                for key in ("min", "max"):
+                    if key in old:
+                        writer.accessors[new_index][key] = old[key]
+                copied[index] = new_index
+            return copied[index]
+
+        # Primitives that share vertex accessors (one mesh, several materials) are encoded and welded together
+        groups: Dict[tuple, List[dict]] = {}
+        group_mesh: Dict[tuple, int] = {}
+        for mesh_index, mesh in enumerate(doc.get("meshes", [])):
+            for primitive in mesh["primitives"]:
+                key = (tuple(sorted(primitive["attributes"].items())),
+                       mesh_index if mesh_index in position_quant else None,
+                       id(primitive) if "targets" in primitive else None)
+                groups.setdefault(key, []).append(primitive)
+                group_mesh[key] = mesh_index
+        uv_quant = _plan_uv_transforms(doc, buffers, groups) if quantize else {}
+
+        for key, primitives in groups.items():
+            first = primitives[0]
+            quant = position_quant.get(group_mesh[key])
+            count = doc["accessors"][next(iter(first["attributes"].values()))]["count"]
+            result.vertices_before += count
+            encoded, normalized = {}, {}
+            for name, index in first["attributes"].items():
+                accessor = doc["accessors"][index]
+                raw = read_accessor(doc, buffers, index, normalize=False)
+                values = read_accessor(doc, buffers, index)
+                encoded[name], normalized[name] = _encode_attribute(
+                    name, values, raw, accessor, quantize, quant, uv_quant.get(key) if name == "TEXCOORD_0" else None
+                )
+            index_lists = [
+                read_accessor(doc, buffers, p["indices"]).ravel().astype(np.int64) if "indices" in p
+                else np.arange(count, dtype=np.int64)
+                for p in primitives
+            ]
+            if "targets" not in first:
+                encoded, welded = weld(encoded, np.concatenate(index_lists))
+                index_lists = np.split(welded, np.cumsum([len(i) for i in index_lists])[:-1])
+            vertex_count = len(next(iter(encoded.values())))
+            result.vertices_after += vertex_count
+
+            attributes = {
+                name: writer.add_accessor(array, normalized[name], ARRAY_BUFFER, bounds=(name == "POSITION"))
+                for name, array in encoded.items()
+            }
+            index_type = np.uint16 if vertex_count < 65535 else np.uint32
+            for primitive, indices in zip(primitives, index_lists):
+                if primitive.get("mode", TRIANGLES) == TRIANGLES:
+                    indices = _drop_degenerate(indices)
+                    result.triangles += len(indices) // 3
+                primitive["attributes"] = dict(attributes)
+                primitive["indices"] = writer.add_accessor(indices.astype(index_type), target=ELEMENT_ARRAY_BUFFER)
+                if "targets" in primitive:
+                    primitive["targets"] = [{k: copy_accessor(v) for k, v in t.items()} for t in primitive["targets"]]
+
+        for mesh_index, (center, scale) in position_quant.items():
+            for node_index in users[mesh_index]:
+                _fold_dequantization(nodes[node_index], center, scale)
+
+        for skin in doc.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                skin["inverseBindMatrices"] = copy_accessor(skin["inverseBindMatrices"])
+        for animation in doc.get("animations", []):
+            for sampler in animation.get("samplers", []):
+                sampler["input"] = copy_accessor(sampler["input"])
+                sampler["output"] = copy_accessor(sampler["output"])
+
+        for image in doc.get("images", []):
+            external = "uri" in image and not image["uri"].startswith("data:")
+            original = (src.parent / unquote(image["uri"])).resolve() if external else None
+            shared = textures.get(str(original)) if external else None
+            if external and (not embed_textures or not shared):
+                # Missing source textures keep pointing at where they were expected
+                image.pop("mimeType", None)
+                image["uri"] = quote(Path(os.path.relpath(shared or original, dst.parent)).as_posix(), safe="/")
+                continue
+            data = Path(shared).read_bytes() if shared else _image_bytes(doc, buffers, image, src.parent)
+            data, mime = shrink_image(data, max_texture) if not shared else (data, None)
+            if mime is None:
+                from PIL import Image
+                with Image.open(io.BytesIO(data)) as img:
+                    mime = Image.MIME.get(img.format, "image/png")
+            image.pop("uri", None)
+            image["bufferView"] = writer.add_view(data)
+            image["mimeType"] = mime
+
+        if quantize and any(writer.accessors[a]["componentType"] != 5126
+                            for m in doc.get("meshes", []) for p in m["primitives"] for k, a in p["attributes"].items()
+                            if k in ("POSITION", "NORMAL", "TANGENT") or k.startswith("TEXCOORD_")):
+            for key in ("extensionsUsed", "extensionsRequired"):
+                doc[key] = sorted(set(doc.get(key, [])) | {"KHR_mesh_quantization"})
+        if uv_quant:
+            for key in ("extensionsUsed", "extensionsRequired"):
+                doc[key] = sorted(set(doc.get(key, [])) | {"KHR_texture_transform"})
+
+        glb = writer.to_glb(doc)
+        with AtomicFile(str(dst)) as f:
+            f.write(glb)
+        result.output_bytes = len(glb)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+# --- Driver ---------------------------------------------------------------------
+
+def find_models(root: Path, exclude: Optional[Path] = None) -> List[Path]:
+    """.gltf files plus .glb files without a .gltf of the same name next to them."""
+    models = []
+    for path in sorted(root.rglob("*")):
+        if exclude and exclude in path.parents:
+            continue
+        suffix = path.suffix.lower()
+        if suffix == ".gltf" or (suffix == ".glb" and not path.with_suffix(".gltf").exists()):
+            models.append(path)
+    return models
+
+
+def _is_fresh(source: Path, target: Path) -> bool:
+    """Output newer than the model and its external buffers (textures are tracked separately)."""
+    if not target.exists():
+        return False
+    inputs = [source]
+    if source.suffix.lower() == ".gltf":
+        doc = json.loads(source.read_text(encoding="utf-8"))
+        inputs += [source.parent / unquote(b["uri"]) for b in doc.get("buffers", []) if b.get("uri") and not b["uri"].startswith("data:")]
+    built = target.stat().st_mtime
+    return all(p.exists() and p.stat().st_mtime <= built for p in inputs)
+
+
+def print_report(results: List[ModelResult], texture_sizes: List[Tuple[int, int]], root: Path) -> None:
+    def mb(size: int) -> str:
+        return f"{size / (1024 * 1024):7.2f} MB"
+
+    done = [r for r in results if not r.error and not r.skipped]
+    if done:
+        print(f"\n{'Model':<56} {'Before':>10} {'After':>10} {'Vertices':>17}")
+        for r in done:
+            name = os.path.relpath(r.path, root)
+            print(f"{name[-56:]:<56} {mb(r.input_bytes)} {mb(r.output_bytes)} {r.vertices_before:>8}->{r.vertices_after:<8}")
+        before = sum(r.input_bytes for r in done)
+        after = sum(r.output_bytes for r in done)
+        v_before = sum(r.vertices_before for r in done)
+        v_after = sum(r.vertices_after for r in done)
+        print(f"{'Geometry total':<56} {mb(before)} {mb(after)} {v_before:>8}->{v_after:<8}")
+        print(f"  {len(done)} model(s): {1 - after / max(before, 1):.0%} smaller, "
+              f"{1 - v_after / max(v_before, 1):.0%} fewer vertices, {sum(r.triangles for r in done)} triangles")
+    if texture_sizes:
+        before = sum(s for s, _ in texture_sizes)
+        after = sum(d for _, d in texture_sizes)
+        print(f"Textures: {len(texture_sizes)} distinct, {mb(before).strip()} -> {mb(after).strip()}")
+    skipped = sum(1 for r in results if r.skipped)
+    if skipped:
+        print(f"Skipped {skipped} up-to-date model(s)")
+    for r in results:
+        if r.error:
+            print(f"  Error ({r.path}): {r.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack glTF models into quantized GLBs with downsized textures")
+    parser.add_argument("root", help="Folder searched recursively for .gltf/.glb models")
+    parser.add_argument("--out-dir", help="Output folder (default: <root>-optimized next to the input)")
+    parser.add_argument("--max-texture", type=int, default=MODEL_OPTIMIZE["max_texture_size"],
+                        help=f"Longest texture side in pixels (default: {MODEL_OPTIMIZE['max_texture_size']})")
+    parser.add_argument("--no-quantize", action="store_true", help="Keep float vertex attributes")
+    parser.add_argument("--embed-textures", action="store_true", default=MODEL_OPTIMIZE["embed_textures"],
+                        help="Embed textures in every GLB instead of sharing <out>/textures/")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Rebuild models even if the output is up to date")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    if not root.is_dir():
+        print(f"Error: not a directory: {root}")
+        sys.exit(1)
+    out_dir = Path(args.out_dir).resolve() if args.out_dir else root.with_name(f"{root.name}-optimized")
+    models = find_models(root, exclude=out_dir)
+    if not models:
+        print(f"No .gltf/.glb models under {root}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    workers = args.workers or os.cpu_count() or 1
+    targets = [out_dir / path.relative_to(root).with_suffix(".glb") for path in models]
+
+    # Each distinct texture is resized once, however many models share it
+    texture_plan = plan_textures([t for m in models for t in external_textures(m)], out_dir / "textures")
+    first_source = {}
+    for source, target in texture_plan.items():
+        first_source.setdefault(target, source)
+    distinct = sorted((str(source), str(target)) for target, source in first_source.items())
+    print(f"Optimizing {len(models)} model(s), {len(distinct)} distinct texture(s) -> {out_dir}")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        texture_sizes = list(pool.map(process_texture, [s for s, _ in distinct], [d for _, d in distinct],
+                                      [args.max_texture] * len(distinct), chunksize=4))
+        textures = {str(s): str(d) for s, d in texture_plan.items()}
+
+        todo = [(m, t) for m, t in zip(models, targets) if args.force or not _is_fresh(m, t)]
+        results = [ModelResult(path=str(m), skipped=True) for m, t in zip(models, targets) if (m, t) not in todo]
+        results += list(pool.map(
+            optimize_model, [str(m) for m, _ in todo], [str(t) for _, t in todo], [textures] * len(todo),
+            [args.max_texture] * len(todo), [not args.no_quantize] * len(todo), [args.embed_textures] * len(todo),
+            chunksize=max(1, len(todo) // (workers * 4)),
+        ))
+
+    print_report(results, texture_sizes, root)
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    if any(r.error for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
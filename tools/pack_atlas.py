@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Pack a game's sprites into texture atlases with a JSON frame map.
+
+Every PNG in assets/sprites/<game>/ is trimmed to its visible pixels and
+placed with a MaxRects bin packer (best short side fit), leaving `padding`
+pixels between sprites so texture filtering never bleeds a neighbour in.
+When both name.png and name_rgba.png exist only the transparent _rgba
+version is packed (the other is the opaque source it was cut from).
+
+Output in assets/atlases/<game>/:
+    atlas-0.png, atlas-1.png ...   pages, each at most --max-size square
+    atlas.json                     frame map (TexturePacker "hash" layout):
+        frames["coin_rgba.png"] = {"page", "frame", "trimmed",
+                                   "spriteSourceSize", "sourceSize", "sha256"}
+
+Re-runs are incremental: sprites are identified by SHA-256, and when only
+existing sprites changed and still fit their old slot they are redrawn in
+place on their page. Added sprites, larger sprites or different options
+trigger a full repack.
+
+Usage:
+    python tools/pack_atlas.py pixel-quest
+    python tools/pack_atlas.py lumina-racer --scale 0.25 --padding 2
+    python tools/pack_atlas.py word-forge --style pixel-art --max-size 4096 --force
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from config import IMAGE_OPTIMIZE
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PIXEL_STYLES = set(IMAGE_OPTIMIZE["palette_sizes"])
+ATLAS_VERSION = 1
+
+
+class MaxRectsBin:
+    """MaxRects bin packer (Jukka Jylänki, "A Thousand Ways to Pack the Bin"), no rotation."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free: List[Tuple[int, int, int, int]] = [(0, 0, width, height)]
+        self.used_width = 0
+        self.used_height = 0
+
+    def insert(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        """Place a width x height rect. Returns its (x, y), or None if it does not fit."""
+        best = None
+        best_score = None
+        for fx, fy, fw, fh in self.free:
+            if width <= fw and height <= fh:
+                leftover_w, leftover_h = fw - width, fh - height
+                score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+                if best_score is None or score < best_score:
+                    best, best_score = (fx, fy), score
+        if best is None:
+            return None
+        self._split(best[0], best[1], width, height)
+        self.used_width = max(self.used_width, best[0] + width)
+        self.used_height = max(self.used_height, best[1] + height)
+        return best
+
+    def _split(self, x: int, y: int, width: int, height: int) -> None:
+        """Carve the placed rect out of every free rect it overlaps, then drop contained free rects."""
+        pieces = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + width <= fx or y >= fy + fh or y + height <= fy:
+                pieces.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                pieces.append((fx, fy, x - fx, fh))
+            if x + width < fx + fw:
+                pieces.append((x + width, fy, fx + fw - x - width, fh))
+            if y > fy:
+                pieces.append((fx, fy, fw, y - fy))
+            if y + height < fy + fh:
+                pieces.append((fx, y + height, fw, fy + fh - y - height))
+
+        def contains(outer, inner) -> bool:
+            return (inner[0] >= outer[0] and inner[1] >= outer[1]
+                    and inner[0] + inner[2] <= outer[0] + outer[2]
+                    and inner[1] + inner[3] <= outer[1] + outer[3])
+
+        pieces = list(dict.fromkeys(pieces))
+        self.free = [
+            rect for i, rect in enumerate(pieces)
+            if not any(j != i and contains(other, rect) for j, other in enumerate(pieces))
+        ]
+
+
+@dataclass
+class Sprite:
+    """A trimmed sprite ready to be placed."""
+    name: str
+    path: Path
+    sha256: str
+    image: "Image.Image" = field(repr=False)
+    source_size: Tuple[int, int]
+    offset: Tuple[int, int]    # Position of the trimmed box inside the (scaled) source
+
+
+def find_sprites(folder: Path, include_sources: bool = False) -> List[Path]:
+    """PNGs in a sprite folder; name.png is skipped when name_rgba.png exists unless include_sources."""
+    pngs = sorted(p for p in folder.rglob("*.png") if p.is_file())
+    if include_sources:
+        return pngs
+    names = {p.relative_to(folder).as_posix() for p in pngs}
+    return [p for p in pngs if f"{p.relative_to(folder).with_suffix('').as_posix()}_rgba.png" not in names]
+
+
+def load_sprite(folder: Path, path: Path, scale: float, pixel: bool, sha256: str = None) -> Sprite:
+    """Decode, scale and trim one sprite."""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+    if scale != 1.0:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.Resampling.NEAREST if pixel else Image.Resampling.LANCZOS)
+    # Trim fully transparent borders; an empty sprite keeps a 1x1 frame
+    bbox = img.getchannel("A").getbbox() or (0, 0, 1, 1)
+    return Sprite(
+        name=path.relative_to(folder).as_posix(),
+        path=path,
+        sha256=sha256 or file_sha256(str(path)),
+        image=img.crop(bbox),
+        source_size=img.size,
+        offset=(bbox[0], bbox[1]),
+    )
+
+
+def _frame_entry(sprite: Sprite, page: int, x: int, y: int) -> dict:
+    w, h = sprite.image.size
+    return {
+        "page": page,
+        "frame": {"x": x, "y": y, "w": w, "h": h},
+        "trimmed": (w, h) != sprite.source_size,
+        "spriteSourceSize": {"x": sprite.offset[0], "y": sprite.offset[1], "w": w, "h": h},
+        "sourceSize": {"w": sprite.source_size[0], "h": sprite.source_size[1]},
+        "sha256": sprite.sha256,
+    }
+
+
+def pack(sprites: List[Sprite], max_size: int, padding: int) -> Tuple[List[Tuple[int, int]], Dict[str, dict]]:
+    """
+    Place sprites on as few pages as possible.
+
+    Returns:
+        (page sizes, frames by sprite name)
+    """
+    # Large sprites first: MaxRects packs tighter when the big pieces go in early
+    order = sorted(sprites, key=lambda s: (max(s.image.size), s.image.width * s.image.height), reverse=True)
+    bins: List[MaxRectsBin] = []
+    frames = {}
+    for sprite in order:
+        w, h = sprite.image.size
+        if w > max_size or h > max_size:
+            raise ValueError(f"{sprite.name} is {w}x{h} after trimming, larger than --max-size {max_size} (try --scale)")
+        # The bin is padded too so the last row/column needs no trailing gap
+        for page, bin_ in enumerate(bins):
+            spot = bin_.insert(w + padding, h + padding)
+            if spot:
+                break
+        else:
+            bins.append(MaxRectsBin(max_size + padding, max_size + padding))
+            page, spot = len(bins) - 1, bins[-1].insert(w + padding, h + padding)
+        frames[sprite.name] = _frame_entry(sprite, page, *spot)
+    sizes = [(max(1, b.used_width - padding), max(1, b.used_height - padding)) for b in bins]
+    return sizes, frames
+
+
+def _save_png(img, path: Path) -> None:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    with AtomicFile(str(path)) as f:
+        f.write(buffer.getvalue())
+
+
+class AtlasPacker:
+    """Builds and incrementally updates one game's atlas."""
+
+    def __init__(self, game: str, sprites_dir: Path, out_dir: Path, max_size: int = 2048,
+                 padding: int = 2, scale: float = 1.0, style: Optional[str] = None, include_sources: bool = False):
+        self.game = game
+        self.sprites_dir = sprites_dir
+        self.out_dir = out_dir
+        self.padding = padding
+        self.scale = scale
+        self.pixel = style in PIXEL_STYLES
+        self.include_sources = include_sources
+        self.max_size = max_size
+        self.options = {"max_size": max_size, "padding": padding, "scale": scale,
+                        "pixel": self.pixel, "include_sources": include_sources}
+
+    @property
+    def map_path(self) -> Path:
+        return self.out_dir / "atlas.json"
+
+    def page_path(self, page: int) -> Path:
+        return self.out_dir / f"atlas-{page}.png"
+
+    def _load_map(self) -> Optional[dict]:
+        try:
+            with open(self.map_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        meta = data.get("meta", {})
+        if meta.get("version") != ATLAS_VERSION or meta.get("options") != self.options:
+            return None
+        if not all(self.out_dir.joinpath(page).exists() for page in meta.get("pages", [])):
+            return None
+        return data
+
+    def _write_map(self, frames: Dict[str, dict], page_count: int) -> None:
+        data = {
+            "meta": {
+                "version": ATLAS_VERSION,
+                "app": "tools/pack_atlas.py",
+                "game": self.game,
+                "pages": [self.page_path(i).name for i in range(page_count)],
+                "options": self.options,
+            },
+            "frames": dict(sorted(frames.items())),
+        }
+        with AtomicFile(str(self.map_path)) as f:
+            f.write(json.dumps(data, indent=2).encode("utf-8"))
+
+    def build(self, force: bool = False) -> str:
+        """Pack or update the atlas. Returns a summary of what was done."""
+        paths = find_sprites(self.sprites_dir, self.include_sources)
+        if not paths:
+            raise ValueError(f"No PNG sprites in {self.sprites_dir}")
+        hashes = {p.relative_to(self.sprites_dir).as_posix(): (p, file_sha256(str(p))) for p in paths}
+
+        existing = None if force else self._load_map()
+        if existing is not None:
+            frames = existing["frames"]
+            if set(hashes) <= set(frames):
+                changed = [name for name, (_, digest) in hashes.items() if frames[name]["sha256"] != digest]
+                removed = sorted(set(frames) - set(hashes))
+                if not changed and not removed:
+                    return "up to date"
+                updated = self._update_in_place(existing, hashes, changed, removed)
+                if updated is not None:
+                    return f"updated {updated} sprite(s) in place"
+        return f"packed {self._pack_all(hashes)} sprite(s)"
+
+    def _pack_all(self, hashes: Dict[str, Tuple[Path, str]]) -> int:
+        from PIL import Image
+
+        sprites = [load_sprite(self.sprites_dir, path, self.scale, self.pixel, digest) for path, digest in hashes.values()]
+        sizes, frames = pack(sprites, self.max_size, self.padding)
+        pages = [Image.new("RGBA", size, (0, 0, 0, 0)) for size in sizes]
+        by_name = {sprite.name: sprite for sprite in sprites}
+        for name, entry in frames.items():
+            pages[entry["page"]].paste(by_name[name].image, (entry["frame"]["x"], entry["frame"]["y"]))
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        for i, page in enumerate(pages):
+            _save_png(page, self.page_path(i))
+        # Pages left over from a larger earlier pack
+        stale = len(pages)
+        while self.page_path(stale).exists():
+            self.page_path(stale).unlink()
+            stale += 1
+        self._write_map(frames, len(pages))
+        return len(sprites)
+
+    def _update_in_place(self, existing: dict, hashes: Dict[str, Tuple[Path, str]],
+                         changed: List[str], removed: List[str]) -> Optional[int]:
+        """Redraw changed sprites in their old slots. Returns None if one no longer fits (full repack)."""
+        from PIL import Image
+
+        frames = existing["frames"]
+        redraw = []
+        for name in changed:
+            path, digest = hashes[name]
+            sprite = load_sprite(self.sprites_dir, path, self.scale, self.pixel, digest)
+            slot = frames[name]["frame"]
+            if sprite.image.width > slot["w"] or sprite.image.height > slot["h"]:
+                return None
+            redraw.append((sprite, slot))
+
+        pages = {}
+
+        def page(index: int):
+            if index not in pages:
+                with Image.open(self.out_dir / existing["meta"]["pages"][index]) as img:
+                    pages[index] = img.convert("RGBA")
+            return pages[index]
+
+        def clear(entry: dict) -> None:
+            slot = entry["frame"]
+            page(entry["page"]).paste((0, 0, 0, 0), (slot["x"], slot["y"], slot["x"] + slot["w"], slot["y"] + slot["h"]))
+
+        for name in removed:
+            clear(frames.pop(name))
+        for sprite, slot in redraw:
+            entry = frames[sprite.name]
+            clear(entry)
+            page(entry["page"]).paste(sprite.image, (slot["x"], slot["y"]))
+            frames[sprite.name] = _frame_entry(sprite, entry["page"], slot["x"], slot["y"])
+
+        for index, img in pages.items():
+            _save_png(img, self.page_path(index))
+        self._write_map(frames, len(existing["meta"]["pages"]))
+        return len(redraw) + len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack a game's sprites into texture atlases with a JSON frame map",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python pack_atlas.py pixel-quest
+  python pack_atlas.py lumina-racer --scale 0.25
+  python pack_atlas.py word-forge --sprites-dir path/to/sprites --out-dir build/atlases/word-forge
+        """,
+    )
+    parser.add_argument("game", help="Game ID (folder under assets/sprites/)")
+    parser.add_argument("--sprites-dir", help="Sprite folder (default: assets/sprites/<game>)")
+    parser.add_argument("--out-dir", help="Output folder (default: assets/atlases/<game>)")
+    parser.add_argument("--max-size", type=int, default=2048, help="Maximum page width/height (default: 2048)")
+    parser.add_argument("--padding", type=int, default=2, help="Transparent pixels between sprites (default: 2)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale sprites before packing (e.g. 0.25)")
+    parser.add_argument("--style", "-s", help="Art style; pixel styles scale with nearest-neighbour")
+    parser.add_argument("--include-sources", action="store_true", help="Also pack name.png when name_rgba.png exists")
+    parser.add_argument("--force", action="store_true", help="Repack everything even if nothing changed")
+    args = parser.parse_args()
+
+    sprites_dir = Path(args.sprites_dir) if args.sprites_dir else PROJECT_ROOT / "assets" / "sprites" / args.game
+    out_dir = Path(args.out_dir) if args.out_dir else PROJECT_ROOT / "assets" / "atlases" / args.game
+    if not sprites_dir.is_dir():
+        print(f"Error: sprite folder not found: {sprites_dir}")
+        sys.exit(1)
+
+    packer = AtlasPacker(args.game, sprites_dir, out_dir, args.max_size, args.padding,
+                         args.scale, args.style, args.include_sources)
+    start = time.perf_counter()
+    try:
+        action = packer.build(force=args.force)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    from PIL import Image
+
+    with open(packer.map_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)["meta"]
+    sizes = []
+    for name in meta["pages"]:
+        with Image.open(out_dir / name) as img:
+            sizes.append(f"{name} {img.width}x{img.height}")
+    print(f"{args.game}: {action} in {time.perf_counter() - start:.1f}s")
+    print(f"  Pages: {', '.join(sizes)}")
+    print(f"  Frame map: {packer.map_path}")
+
+
+if __name__ == "__main__":
+    main()
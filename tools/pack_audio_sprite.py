@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Pack a game's sound effects into one audio sprite with a JSON offset map.
+
+Every clip in assets/audio/<game>/sfx/ is decoded, trimmed of leading and
+trailing silence and laid end to end with `gap` milliseconds of silence
+between clips, then encoded once. One request and one decode replace dozens
+of tiny files, which matters most for rapid-fire sounds (typing clicks, steps).
+
+Output in assets/audio/<game>/:
+    sfx-sprite.mp3      the sprite
+    sfx-sprite.json     offset map:
+        sprite["type"] = [start_ms, duration_ms]        (howler.js "sprite" layout)
+        sounds["type"] = {"start", "duration", "slot", "file", "sha256"} (seconds)
+
+Play a sound with Web Audio: source.start(0, sound.start, sound.duration).
+
+Re-runs are incremental: clips are identified by SHA-256 and the decoded
+sprite is kept in .cache/audio-sprites/, so only changed clips are decoded.
+A changed clip that still fits its slot is written in place, new clips are
+appended and removed clips leave silence, so existing offsets stay stable.
+A clip that outgrew its slot, or different options, trigger a full repack.
+
+Requires soundfile (pip install -r tools/requirements-audio.txt).
+
+Usage:
+    python tools/pack_audio_sprite.py lumina-racer
+    python tools/pack_audio_sprite.py word-forge --gap 100 --format ogg
+    python tools/pack_audio_sprite.py pixel-quest --force
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from process_audio import AUDIO_EXTENSIONS, encoder_params, load_soundfile, trim_bounds
+from streaming import AtomicFile
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_ROOT / ".cache" / "audio-sprites"
+SPRITE_VERSION = 1
+SLOT_STEP_SECONDS = 0.05   # Slots are rounded up to this, so a slightly longer re-take still fits in place
+
+
+@dataclass
+class Clip:
+    """One decoded, trimmed sound effect at the sprite's rate and channel count."""
+    name: str          # File stem, used as the sound's key
+    file: str          # Path relative to the sfx folder
+    sha256: str
+    samples: np.ndarray
+
+
+def find_clips(folder: Path) -> List[Path]:
+    """Audio files in the sfx folder (not recursive: sprites are per game)."""
+    return sorted(p for p in folder.iterdir() if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+def _resample(samples: np.ndarray, source_rate: int, rate: int) -> np.ndarray:
+    if source_rate == rate:
+        return samples
+    count = int(round(len(samples) * rate / source_rate))
+    positions = np.arange(count) * (source_rate / rate)
+    source = np.arange(len(samples))
+    return np.stack([np.interp(positions, source, samples[:, c]) for c in range(samples.shape[1])], axis=1).astype(np.float32)
+
+
+def load_clip(folder: Path, path: Path, rate: int, channels: int, sha256: str = None) -> Clip:
+    """Decode, trim silence and convert to the sprite's sample rate and channel count."""
+    samples, source_rate = load_soundfile().read(str(path), dtype="float32", always_2d=True)
+    start, end = trim_bounds(samples, source_rate)
+    samples = _resample(samples[start:end], source_rate, rate)
+    if samples.shape[1] < channels:
+        samples = np.repeat(samples[:, :1], channels, axis=1)
+    elif samples.shape[1] > channels:
+        samples = samples.mean(axis=1, keepdims=True)
+    return Clip(name=path.stem, file=path.relative_to(folder).as_posix(), sha256=sha256 or file_sha256(str(path)), samples=samples)
+
+
+def _slot_frames(frames: int, rate: int) -> int:
+    step = int(SLOT_STEP_SECONDS * rate)
+    return max(step, math.ceil(frames / step) * step)
+
+
+def _sound_entry(clip: Clip, start: int, slot: int, rate: int) -> dict:
+    return {
+        "start": round(start / rate, 6),
+        "duration": round(len(clip.samples) / rate, 6),
+        "slot": round(slot / rate, 6),
+        "file": clip.file,
+        "sha256": clip.sha256,
+    }
+
+
+class AudioSpritePacker:
+    """Builds and incrementally updates one game's SFX sprite."""
+
+    def __init__(self, game: str, sfx_dir: Path, out_dir: Path, gap_ms: int = 250,
+                 audio_format: str = "mp3", sample_rate: int = 44100):
+        self.game = game
+        self.sfx_dir = sfx_dir
+        self.out_dir = out_dir
+        self.audio_format = audio_format
+        self.rate = sample_rate
+        self.gap = int(gap_ms * sample_rate / 1000)
+        self.options = {"gap_ms": gap_ms, "format": audio_format, "sample_rate": sample_rate}
+
+    @property
+    def map_path(self) -> Path:
+        return self.out_dir / "sfx-sprite.json"
+
+    @property
+    def audio_path(self) -> Path:
+        return self.out_dir / f"sfx-sprite.{self.audio_format}"
+
+    @property
+    def pcm_path(self) -> Path:
+        """Decoded sprite (float32 frames x channels), so updates never decode the whole sprite again."""
+        return CACHE_DIR / f"{self.game}.npy"
+
+    def _load_map(self) -> Optional[dict]:
+        try:
+            with open(self.map_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        meta = data.get("meta", {})
+        if meta.get("version") != SPRITE_VERSION or meta.get("options") != self.options:
+            return None
+        if not self.audio_path.exists() or not self.pcm_path.exists():
+            return None
+        return data
+
+    def _write(self, pcm: np.ndarray, sounds: Dict[str, dict], channels: int) -> None:
+        """Encode the sprite, then save the decoded copy and the offset map."""
+        buffer = io.BytesIO()
+        load_soundfile().write(buffer, pcm, self.rate, **encoder_params(self.audio_path))
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with AtomicFile(str(self.audio_path)) as f:
+            f.write(buffer.getvalue())
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with AtomicFile(str(self.pcm_path)) as f:
+            array = io.BytesIO()
+            np.save(array, pcm)
+            f.write(array.getvalue())
+
+        ordered = dict(sorted(sounds.items(), key=lambda item: item[1]["start"]))
+        data = {
+            "meta": {
+                "version": SPRITE_VERSION,
+                "app": "tools/pack_audio_sprite.py",
+                "game": self.game,
+                "src": self.audio_path.name,
+                "channels": channels,
+                "duration": round(len(pcm) / self.rate, 6),
+                "options": self.options,
+            },
+            "sprite": {
+                name: [round(entry["start"] * 1000, 1), round(entry["duration"] * 1000, 1)]
+                for name, entry in ordered.items()
+            },
+            "sounds": ordered,
+        }
+        with AtomicFile(str(self.map_path)) as f:
+            f.write(json.dumps(data, indent=2).encode("utf-8"))
+
+    def build(self, force: bool = False) -> str:
+        """Pack or update the sprite. Returns a summary of what was done."""
+        paths = find_clips(self.sfx_dir)
+        if not paths:
+            raise ValueError(f"No audio clips in {self.sfx_dir}")
+        names = [p.stem for p in paths]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Clips share a name in {self.sfx_dir}: {', '.join(duplicates)}")
+        hashes = {p.stem: (p, file_sha256(str(p))) for p in paths}
+
+        existing = None if force else self._load_map()
+        if existing is not None:
+            sounds = existing["sounds"]
+            changed = [name for name, (_, digest) in hashes.items() if name in sounds and sounds[name]["sha256"] != digest]
+            added = [name for name in hashes if name not in sounds]
+            removed = sorted(set(sounds) - set(hashes))
+            if not changed and not added and not removed:
+                return "up to date"
+            updated = self._update_in_place(existing, hashes, changed, added, removed)
+            if updated is not None:
+                return f"updated {updated} clip(s) in place"
+        return f"packed {self._pack_all(hashes)} clip(s)"
+
+    def _channels(self, paths: List[Path]) -> int:
+        soundfile = load_soundfile()
+        return 2 if any(soundfile.info(str(path)).channels > 1 for path in paths) else 1
+
+    def _pack_all(self, hashes: Dict[str, Tuple[Path, str]]) -> int:
+        channels = self._channels([path for path, _ in hashes.values()])
+        clips = [load_clip(self.sfx_dir, path, self.rate, channels, digest) for path, digest in hashes.values()]
+        sounds = {}
+        blocks = []
+        position = 0
+        for clip in clips:
+            slot = _slot_frames(len(clip.samples), self.rate)
+            sounds[clip.name] = _sound_entry(clip, position, slot, self.rate)
+            block = np.zeros((slot + self.gap, channels), dtype=np.float32)
+            block[:len(clip.samples)] = clip.samples
+            blocks.append(block)
+            position += len(block)
+        self._write(np.concatenate(blocks), sounds, channels)
+        return len(clips)
+
+    def _update_in_place(self, existing: dict, hashes: Dict[str, Tuple[Path, str]],
+                         changed: List[str], added: List[str], removed: List[str]) -> Optional[int]:
+        """Rewrite changed clips in their slots and append new ones. Returns None if a full repack is needed."""
+        channels = existing["meta"]["channels"]
+        if self._channels([hashes[name][0] for name in changed + added]) > channels:
+            return None
+        sounds = existing["sounds"]
+        clips = {name: load_clip(self.sfx_dir, hashes[name][0], self.rate, channels, hashes[name][1])
+                 for name in changed + added}
+        if any(len(clips[name].samples) > int(round(sounds[name]["slot"] * self.rate)) for name in changed):
+            return None
+
+        pcm = np.load(self.pcm_path)
+        if pcm.ndim != 2 or pcm.shape[1] != channels:
+            return None
+
+        def region(entry: dict) -> slice:
+            start = int(round(entry["start"] * self.rate))
+            return slice(start, start + int(round(entry["slot"] * self.rate)))
+
+        for name in removed:
+            pcm[region(sounds.pop(name))] = 0.0
+        for name in changed:
+            entry = sounds[name]
+            span = region(entry)
+            pcm[span] = 0.0
+            pcm[span.start:span.start + len(clips[name].samples)] = clips[name].samples
+            sounds[name] = _sound_entry(clips[name], span.start, span.stop - span.start, self.rate)
+        blocks = [pcm]
+        position = len(pcm)
+        for name in added:
+            clip = clips[name]
+            slot = _slot_frames(len(clip.samples), self.rate)
+            sounds[name] = _sound_entry(clip, position, slot, self.rate)
+            block = np.zeros((slot + self.gap, channels), dtype=np.float32)
+            block[:len(clip.samples)] = clip.samples
+            blocks.append(block)
+            position += len(block)
+        self._write(np.concatenate(blocks) if len(blocks) > 1 else pcm, sounds, channels)
+        return len(changed) + len(added) + len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack a game's sound effects into one audio sprite with a JSON offset map",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python pack_audio_sprite.py lumina-racer
+  python pack_audio_sprite.py word-forge --gap 100
+  python pack_audio_sprite.py pixel-quest --sfx-dir path/to/sfx --out-dir build/audio/pixel-quest
+        """,
+    )
+    parser.add_argument("game", help="Game ID (folder under assets/audio/)")
+    parser.add_argument("--sfx-dir", help="Sound effect folder (default: assets/audio/<game>/sfx)")
+    parser.add_argument("--out-dir", help="Output folder (default: assets/audio/<game>)")
+    parser.add_argument("--gap", type=int, default=250, help="Silence between clips in ms (default: 250)")
+    parser.add_argument("--format", choices=["mp3", "ogg", "wav"], default="mp3", help="Sprite format (default: mp3)")
+    parser.add_argument("--rate", type=int, default=44100, help="Sprite sample rate (default: 44100)")
+    parser.add_argument("--force", action="store_true", help="Repack everything even if nothing changed")
+    args = parser.parse_args()
+
+    sfx_dir = Path(args.sfx_dir) if args.sfx_dir else PROJECT_ROOT / "assets" / "audio" / args.game / "sfx"
+    out_dir = Path(args.out_dir) if args.out_dir else PROJECT_ROOT / "assets" / "audio" / args.game
+    if not sfx_dir.is_dir():
+        print(f"Error: sound effect folder not found: {sfx_dir}")
+        sys.exit(1)
+
+    packer = AudioSpritePacker(args.game, sfx_dir, out_dir, args.gap, args.format, args.rate)
+    start = time.perf_counter()
+    try:
+        action = packer.build(force=args.force)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    with open(packer.map_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    source_bytes = sum(path.stat().st_size for path in find_clips(sfx_dir))
+    print(f"{args.game}: {action} in {time.perf_counter() - start:.1f}s")
+    print(f"  Sprite: {packer.audio_path.name} ({data['meta']['duration']:.1f}s, "
+          f"{packer.audio_path.stat().st_size // 1024} KB from {len(data['sounds'])} files, {source_bytes // 1024} KB)")
+    print(f"  Offset map: {packer.map_path}")
+
+
+if __name__ == "__main__":
+    main()
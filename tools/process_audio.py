@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Trim, loudness-normalize and find loop points for generated audio.
+
+For every clip (decoded once into a float32 NumPy array):
+- Trim: leading/trailing audio below AUDIO_PROCESS["silence_dbfs"] is cut,
+  keeping a few milliseconds of padding and a short fade so nothing clicks.
+- Normalize: integrated loudness is measured per ITU-R BS.1770 (K-weighting,
+  400 ms gated blocks) and gain is applied to reach the target LUFS for the
+  clip's type (music / sfx / voice), capped so peaks stay under peak_dbfs.
+- Loop (music only): the end of the track is searched for the spot that best
+  matches its opening (normalized cross-correlation via FFT), giving the
+  loop_end with the smallest discontinuity when playback jumps back to the start.
+  Stitched tracks (generate_music.py) already end by crossfading into their
+  start, so they are processed as seamless: no trim, the whole clip loops.
+
+Results go to a sidecar next to the clip (menu.mp3 -> menu.audio.json) holding
+the loudness, gain, trim and loop points. Clips are only re-encoded when the
+trim or gain actually changes them, and clips whose sidecar already matches
+the file and settings are skipped, so re-running over assets/audio/ is cheap.
+Files are processed in a process pool.
+
+Requires soundfile (libsndfile >= 1.1 reads and writes MP3):
+    pip install -r tools/requirements-audio.txt
+
+Usage:
+    python tools/process_audio.py assets/audio/pixel-quest
+    python tools/process_audio.py assets/audio --dry-run           # measure only, write nothing
+    python tools/process_audio.py assets/audio/math-quest/music --cut-loops
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_manifest import file_sha256
+from config import AUDIO_PROCESS
+from streaming import AtomicFile
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".flac"}
+AUDIO_TYPES = ("music", "sfx", "voice")
+SIDECAR_SUFFIX = ".audio.json"
+SOUNDFILE_FORMATS = {".mp3": "MP3", ".wav": "WAV", ".ogg": "OGG", ".flac": "FLAC"}
+
+
+def load_soundfile():
+    """Import soundfile, or exit with install instructions."""
+    try:
+        import soundfile
+    except ImportError:
+        raise SystemExit(
+            "soundfile is not installed.\n"
+            "Install with:\n"
+            "  pip install -r tools/requirements-audio.txt"
+        )
+    return soundfile
+
+
+def encoder_params(path: Path) -> dict:
+    """soundfile.write() keyword arguments for the file's extension (MP3 at mp3_bitrate_kbps)."""
+    params = {"format": SOUNDFILE_FORMATS[path.suffix.lower()]}
+    if params["format"] == "MP3":
+        # libsndfile maps compression_level 0..1 linearly onto 320..32 kbps
+        level = (320 - AUDIO_PROCESS["mp3_bitrate_kbps"]) / (320 - 32)
+        params.update(compression_level=min(max(level, 0.0), 0.99), bitrate_mode="CONSTANT")
+    return params
+
+
+@dataclass
+class AudioResult:
+    """What happened to one clip."""
+    path: str
+    audio_type: str = "sfx"
+    original_bytes: int = 0
+    final_bytes: int = 0
+    original_seconds: float = 0.0
+    final_seconds: float = 0.0
+    loudness_lufs: Optional[float] = None
+    gain_db: float = 0.0
+    loop: Optional[dict] = None
+    action: str = "unchanged"   # unchanged, measured, rewritten, skipped
+    error: Optional[str] = None
+
+
+def audio_type_for(path: Path) -> str:
+    """music / sfx / voice from the assets/audio/<game>/<type>/ folder (default: sfx)."""
+    for part in reversed(path.parts[:-1]):
+        if part in AUDIO_TYPES:
+            return part
+    return "sfx"
+
+
+def sidecar_path(path: Path) -> Path:
+    return path.with_name(path.stem + SIDECAR_SUFFIX)
+
+
+# --- Loudness (ITU-R BS.1770-4) ---
+
+def _biquad_response(b, a, w: np.ndarray) -> np.ndarray:
+    z = np.exp(-1j * w)
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+
+def _k_weighting(sample_rate: int, w: np.ndarray) -> np.ndarray:
+    """Frequency response of the BS.1770 pre-filter (high shelf) and RLB high-pass at this rate."""
+    # High shelf: +4 dB above ~1.5 kHz
+    gain_db, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = np.tan(np.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    # High-pass at ~38 Hz
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = np.tan(np.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    hp_b = [1.0, -2.0, 1.0]
+    hp_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return _biquad_response(shelf_b, shelf_a, w) * _biquad_response(hp_b, hp_a, w)
+
+
+def integrated_loudness(samples: np.ndarray, sample_rate: int) -> Optional[float]:
+    """
+    Integrated loudness in LUFS, or None for clips that are silent or shorter than one block.
+
+    The K-weighting filters are applied in the frequency domain (one FFT over the
+    whole clip, zero-padded so the IIR tails don't wrap around) instead of a
+    per-sample filter loop.
+    """
+    block = int(0.4 * sample_rate)
+    if len(samples) < block:
+        # Short SFX: measure them as one block, padded with silence
+        samples = np.pad(samples, ((0, block - len(samples)), (0, 0)))
+    n = len(samples) + sample_rate // 2
+    size = 1 << (n - 1).bit_length()
+    w = 2 * np.pi * np.fft.rfftfreq(size)
+    response = _k_weighting(sample_rate, w)
+    filtered = np.fft.irfft(np.fft.rfft(samples, n=size, axis=0) * response[:, None], n=size, axis=0)[:len(samples)]
+
+    # Mean square per 400 ms block with 75% overlap, summed over channels (L/R weights are 1.0)
+    step = block // 4
+    cumulative = np.concatenate([np.zeros((1, filtered.shape[1])), np.cumsum(filtered ** 2, axis=0)])
+    starts = np.arange(0, len(filtered) - block + 1, step)
+    power = ((cumulative[starts + block] - cumulative[starts]) / block).sum(axis=1)
+
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(power)
+    gated = power[loudness > -70.0]
+    if not len(gated):
+        return None
+    relative = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+    gated = power[(loudness > -70.0) & (loudness > relative)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+# --- Trim ---
+
+def trim_bounds(samples: np.ndarray, sample_rate: int) -> Tuple[int, int]:
+    """Sample range [start, end) holding everything above the silence threshold, plus padding."""
+    frame = max(1, sample_rate // 100)   # 10 ms
+    peak = np.abs(samples).max(axis=1)
+    frames = len(peak) // frame
+    if frames == 0:
+        return 0, len(samples)
+    levels = peak[:frames * frame].reshape(frames, frame).max(axis=1)
+    loud = np.flatnonzero(levels > 10 ** (AUDIO_PROCESS["silence_dbfs"] / 20))
+    if not len(loud):
+        return 0, len(samples)
+    pad = int(AUDIO_PROCESS["pad_ms"] * sample_rate / 1000)
+    start = max(0, loud[0] * frame - pad)
+    end = len(samples) if loud[-1] == frames - 1 else min(len(samples), (loud[-1] + 1) * frame + pad)
+    return int(start), int(end)
+
+
+def _fade(samples: np.ndarray, sample_rate: int, fade_in: bool, fade_out: bool) -> np.ndarray:
+    length = min(len(samples) // 2, int(AUDIO_PROCESS["fade_ms"] * sample_rate / 1000))
+    if length < 2:
+        return samples
+    ramp = np.linspace(0.0, 1.0, length, dtype=samples.dtype)[:, None]
+    samples = samples.copy()
+    if fade_in:
+        samples[:length] *= ramp
+    if fade_out:
+        samples[-length:] *= ramp[::-1]
+    return samples
+
+
+# --- Loop points ---
+
+def find_loop(samples: np.ndarray, sample_rate: int) -> Optional[dict]:
+    """
+    Find the loop end whose audio best continues into the start of the clip.
+
+    Slides the first AUDIO_PROCESS["loop_window_ms"] of the (mono) clip across the
+    last part of the track; the best normalized cross-correlation, weighted by how
+    closely the energies match (so a fade-out tail doesn't win), marks the point
+    where jumping back to the start is least audible.
+
+    Returns:
+        {"start": seconds, "end": seconds, "score": 0..1}, or None for clips too short to
+        loop or without a clean loop point
+    """
+    mono = samples.mean(axis=1).astype(np.float64)
+    window = int(AUDIO_PROCESS["loop_window_ms"] * sample_rate / 1000)
+    earliest = max(int(AUDIO_PROCESS["loop_min_seconds"] * sample_rate), len(mono) // 2)
+    latest = len(mono) - window
+    if window < 2 or latest <= earliest:
+        return None
+
+    reference = mono[:window]
+    reference_energy = float(reference @ reference)
+    if reference_energy <= 0:
+        return None
+    region = mono[earliest:]
+    size = 1 << (len(region) + window - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(region, size) * np.conj(np.fft.rfft(reference, size)), size)
+    correlation = correlation[:latest - earliest + 1]
+    cumulative = np.concatenate([[0.0], np.cumsum(region ** 2)])
+    energy = cumulative[window:window + len(correlation)] - cumulative[:len(correlation)]
+    energy = np.maximum(energy, 1e-12)
+    ncc = correlation / np.sqrt(energy * reference_energy)
+    balance = np.minimum(energy, reference_energy) / np.maximum(energy, reference_energy)
+    score = ncc * balance
+    best = int(np.argmax(score))
+    if score[best] < AUDIO_PROCESS["loop_min_score"]:
+        return None
+    return {
+        "start": 0.0,
+        "end": round((earliest + best) / sample_rate, 6),
+        "score": round(float(np.clip(score[best], 0.0, 1.0)), 4),
+    }
+
+
+# --- Processing ---
+
+def _encode(path: Path, samples: np.ndarray, sample_rate: int) -> None:
+    buffer = io.BytesIO()
+    load_soundfile().write(buffer, samples, sample_rate, **encoder_params(path))
+    with AtomicFile(str(path)) as f:
+        f.write(buffer.getvalue())
+
+
+def _settings(audio_type: str, cut_loops: bool) -> dict:
+    settings = {
+        "target_lufs": AUDIO_PROCESS["target_lufs"][audio_type],
+        "peak_dbfs": AUDIO_PROCESS["peak_dbfs"],
+        "max_gain_db": AUDIO_PROCESS["max_gain_db"],
+        "silence_dbfs": AUDIO_PROCESS["silence_dbfs"],
+    }
+    if audio_type == "music":
+        settings["cut_loops"] = cut_loops
+    return settings
+
+
+def _read_sidecar(path: Path) -> dict:
+    try:
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _is_processed(path: Path, settings: dict) -> bool:
+    sidecar = _read_sidecar(path)
+    return bool(sidecar) and sidecar.get("settings") == settings and sidecar.get("sha256") == file_sha256(str(path))
+
+
+def process_audio(
+    path: str,
+    audio_type: Optional[str] = None,
+    write: bool = True,
+    force: bool = False,
+    cut_loops: bool = False,
+    seamless: bool = False,
+) -> AudioResult:
+    """
+    Trim, normalize and (for music) find loop points for one clip.
+
+    Args:
+        path: Audio file (.mp3, .wav, .ogg, .flac)
+        audio_type: music, sfx or voice (default: from the folder name)
+        write: Rewrite the clip and its sidecar (False only measures)
+        force: Process even if the sidecar says the clip is already done
+        cut_loops: Music only - cut the clip to [loop start, loop end] so plain
+            <audio loop> playback is seamless
+        seamless: Music already built to loop end-to-start (stitched tracks): keep every
+            sample, skip the loop search and loop the whole clip. Remembered in the
+            sidecar, so later runs over the folder keep it
+
+    Returns:
+        AudioResult (errors are recorded on it rather than raised)
+    """
+    source = Path(path)
+    audio_type = audio_type or audio_type_for(source)
+    result = AudioResult(path=str(source), audio_type=audio_type)
+    try:
+        result.original_bytes = result.final_bytes = source.stat().st_size
+        seamless = seamless or bool(_read_sidecar(source).get("seamless"))
+        settings = _settings(audio_type, cut_loops)
+        if seamless:
+            settings["seamless"] = True
+        if write and not force and _is_processed(source, settings):
+            result.action = "skipped"
+            return result
+
+        samples, sample_rate = load_soundfile().read(str(source), dtype="float32", always_2d=True)
+        result.original_seconds = len(samples) / sample_rate
+
+        start, end = (0, len(samples)) if seamless else trim_bounds(samples, sample_rate)
+        trimmed = samples[start:end]
+        loudness = integrated_loudness(trimmed, sample_rate)
+        gain_db = 0.0
+        if loudness is not None:
+            gain_db = settings["target_lufs"] - loudness
+            peak = float(np.abs(trimmed).max())
+            headroom = settings["peak_dbfs"] - 20 * np.log10(peak) if peak > 0 else gain_db
+            gain_db = min(gain_db, headroom, AUDIO_PROCESS["max_gain_db"])
+        if abs(gain_db) < AUDIO_PROCESS["gain_tolerance_db"]:
+            gain_db = 0.0
+        result.gain_db = round(gain_db, 2)
+        result.loudness_lufs = None if loudness is None else round(loudness + gain_db, 2)
+
+        output = trimmed * np.float32(10 ** (gain_db / 20)) if gain_db else trimmed
+        if seamless:
+            loop = {"start": 0.0, "end": round(len(output) / sample_rate, 6), "score": 1.0}
+        else:
+            loop = find_loop(output, sample_rate) if audio_type == "music" else None
+        if loop and cut_loops:
+            output = output[:int(round(loop["end"] * sample_rate))]
+            loop["end"] = round(len(output) / sample_rate, 6)
+        result.loop = loop
+        result.final_seconds = len(output) / sample_rate
+
+        trimmed_samples = len(samples) - len(output)
+        changed = gain_db != 0.0 or trimmed_samples > sample_rate * AUDIO_PROCESS["pad_ms"] / 1000
+        if changed:
+            output = _fade(output, sample_rate, fade_in=start > 0, fade_out=end < len(samples) and not loop)
+        result.action = "rewritten" if changed else "measured"
+        if not write:
+            return result
+
+        if changed:
+            _encode(source, output, sample_rate)
+            result.final_bytes = source.stat().st_size
+        sidecar = {
+            "source": source.name,
+            "sha256": file_sha256(str(source)),
+            "type": audio_type,
+            "sample_rate": sample_rate,
+            "channels": samples.shape[1],
+            "duration": round(result.final_seconds, 6),
+            "loudness_lufs": result.loudness_lufs,
+            "gain_db": result.gain_db,
+            "trimmed": {"start": round(start / sample_rate, 6), "end": round((len(samples) - end) / sample_rate, 6)},
+            "loop": loop,
+            "settings": settings,
+        }
+        if seamless:
+            sidecar["seamless"] = True
+        with AtomicFile(str(sidecar_path(source))) as f:
+            f.write(json.dumps(sidecar, indent=2).encode("utf-8"))
+    except SystemExit:
+        raise
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+def process_saved(path: str, audio_type: Optional[str] = None, seamless: bool = False) -> None:
+    """Post-generation hook: process one freshly saved clip in place and say what changed."""
+    result = process_audio(path, audio_type=audio_type, seamless=seamless)
+    if result.error:
+        print(f"  Warning: could not process {path}: {result.error}")
+    elif result.action == "rewritten":
+        loop = f", loop end {result.loop['end']:.2f}s" if result.loop else ""
+        print(f"  Processed: {result.original_seconds:.2f}s -> {result.final_seconds:.2f}s, "
+              f"{result.gain_db:+.1f} dB -> {result.loudness_lufs} LUFS{loop}")
+
+
+def find_audio(paths: Iterable[str]) -> List[str]:
+    """Expand files and directories (recursively) into a sorted list of audio clips."""
+    found = set()
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            found.update(str(f) for f in p.rglob("*") if f.suffix.lower() in AUDIO_EXTENSIONS)
+        elif p.suffix.lower() in AUDIO_EXTENSIONS and p.exists():
+            found.add(str(p))
+        else:
+            print(f"  Warning: skipping {path} (not an audio file or directory)")
+    return sorted(found)
+
+
+def process_paths(
+    paths: List[str],
+    audio_type: Optional[str] = None,
+    write: bool = True,
+    force: bool = False,
+    cut_loops: bool = False,
+    workers: Optional[int] = None,
+) -> List[AudioResult]:
+    """Process many clips across a process pool (decode/encode is CPU-bound)."""
+    if not paths:
+        return []
+    load_soundfile()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) == 1:
+        return [process_audio(path, audio_type, write, force, cut_loops) for path in paths]
+    count = len(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(
+            process_audio, paths, [audio_type] * count, [write] * count, [force] * count, [cut_loops] * count,
+        ))
+
+
+def print_report(results: List[AudioResult]) -> None:
+    """Per-clip loudness, gain, trim and loop quality, then totals."""
+    print(f"\n{'File':<56} {'Type':<6} {'LUFS':>6} {'Gain':>6} {'Length':>13} {'Loop':>15}")
+    for r in results:
+        if r.error or r.action == "skipped":
+            continue
+        lufs = f"{r.loudness_lufs:6.1f}" if r.loudness_lufs is not None else "   n/a"
+        length = f"{r.original_seconds:5.2f}->{r.final_seconds:5.2f}s"
+        loop = f"{r.loop['end']:6.2f}s ({r.loop['score']:.2f})" if r.loop else ""
+        print(f"{r.path:<56} {r.audio_type:<6} {lufs} {r.gain_db:+6.1f} {length:>13} {loop:>15}")
+
+    before = sum(r.original_seconds for r in results)
+    after = sum(r.final_seconds for r in results)
+    size_before = sum(r.original_bytes for r in results)
+    size_after = sum(r.final_bytes for r in results)
+    print(f"Total: {before:.1f}s -> {after:.1f}s of audio, {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+
+    actions = {}
+    for result in results:
+        key = "error" if result.error else result.action
+        actions[key] = actions.get(key, 0) + 1
+    print("Actions: " + ", ".join(f"{count} {action}" for action, count in sorted(actions.items())))
+    for result in results:
+        if result.error:
+            print(f"  Error ({result.path}): {result.error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trim silence, normalize loudness and find loop points for audio clips")
+    parser.add_argument("paths", nargs="+", help="Audio files or directories (e.g. assets/audio/<game>)")
+    parser.add_argument("--type", choices=AUDIO_TYPES, help="Treat every input as this type (default: from the folder name)")
+    parser.add_argument("--cut-loops", action="store_true", help="Cut music to its loop region so <audio loop> is seamless")
+    parser.add_argument("--dry-run", action="store_true", help="Measure without writing anything")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Re-process clips whose sidecar is up to date")
+    args = parser.parse_args()
+
+    clips = find_audio(args.paths)
+    if not clips:
+        print("No audio files found")
+        sys.exit(1)
+
+    print(f"Processing {len(clips)} clip(s){' (dry run)' if args.dry_run else ''}...")
+    start = time.perf_counter()
+    results = process_paths(
+        clips,
+        audio_type=args.type,
+        write=not args.dry_run,
+        force=args.force,
+        cut_loops=args.cut_loops,
+        workers=args.workers,
+    )
+    print_report(results)
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    if any(result.error for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Exceptions raised by provider clients.
+
+The generate_* functions (sync wrappers included) raise these instead of
+calling sys.exit(), so a batch can catch a failed asset and keep going.
+Only the CLIs' main() turn them into an exit code.
+
+Subclasses say what kind of failure it was. `retryable` errors (rate limits,
+5xx, dropped connections) are retried by the shared request layer
+(request_policy.py) before they ever reach the caller:
+
+    ProviderError
+    ├── ConfigurationError    missing API key or package; fix the setup
+    ├── AuthenticationError   401/403
+    ├── RequestError          other 4xx: the request itself is wrong
+    ├── RateLimitError        429 (retryable, honours Retry-After)
+    ├── TransientError        408/5xx, timeouts, connection errors (retryable)
+    └── CircuitOpenError      too many recent failures; provider paused
+"""
+from typing import Optional
+
+
+class ProviderError(Exception):
+    """A provider request failed (bad status, missing key, empty response...)."""
+
+    retryable = False
+
+    def __init__(self, message: str, provider: str = None, status: int = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ConfigurationError(ProviderError):
+    """Missing API key, credentials or optional package."""
+
+
+class AuthenticationError(ProviderError):
+    """The provider rejected our credentials (401/403)."""
+
+
+class RequestError(ProviderError):
+    """The provider rejected the request itself (4xx other than auth and rate limits)."""
+
+
+class RateLimitError(ProviderError):
+    """429 Too Many Requests. `retry_after` holds the server's Retry-After, if any."""
+
+    retryable = True
+
+
+class TransientError(ProviderError):
+    """Server error, timeout or dropped connection; worth retrying."""
+
+    retryable = True
+
+
+class CircuitOpenError(ProviderError):
+    """The provider's circuit breaker is open; `retry_after` is the remaining cooldown."""
+
+
+# Statuses worth retrying: timeouts, rate limits and server-side failures
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def error_for_status(status: int, message: str, provider: str = None, retry_after: Optional[float] = None) -> ProviderError:
+    """The ProviderError subclass matching an HTTP status (for `raise error_for_status(...)`)."""
+    if status == 429:
+        cls = RateLimitError
+    elif status in RETRYABLE_STATUSES:
+        cls = TransientError
+    elif status in (401, 403):
+        cls = AuthenticationError
+    elif 400 <= status < 500:
+        cls = RequestError
+    else:
+        cls = ProviderError
+    return cls(message, provider=provider, status=status, retry_after=retry_after)
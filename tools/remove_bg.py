@@ -12,6 +12,15 @@ Setup:
 Usage:
   py -3.13 tools/remove_bg.py -i path/to/input.png -o path/to/output.png --verify
 
+Engines (--engine):
+  auto    chroma-key the dominant border colour (NumPy, no model); rembg only when the key confidence is low
+  chroma  chroma key only (no rembg/onnxruntime needed)
+  rembg   u2net for every image
+
+Batch (one model load for the whole run; outputs newer than their input are skipped):
+  py -3.13 tools/remove_bg.py -i assets/sprites/pixel-quest --output-dir build/nobg --verify
+  py -3.13 tools/remove_bg.py -i "generated/**/*.png" -i extra.png --output-dir build/nobg --workers 4
+
 Tips:
 - Best results come from generating with a SOLID, high-contrast background (pure green/magenta).
 """
@@ -19,26 +28,167 @@ Tips:
 from __future__ import annotations
 
 import argparse
+import glob
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from chroma_key import MIN_CONFIDENCE, chroma_key
 
-def _verify_alpha(output_path: Path) -> None:
-    from PIL import Image
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+def _alpha_stats(img) -> Tuple[int, int, float]:
+    """Return (min alpha, max alpha, transparent fraction) of an in-memory RGBA image in one numpy pass."""
+    import numpy as np
 
-    img = Image.open(output_path)
+    alpha = np.asarray(img.getchannel("A"))
+    return int(alpha.min()), int(alpha.max()), float(np.count_nonzero(alpha == 0)) / alpha.size
+
+
+def _verify_alpha(img, label: str = "Verify") -> Optional[str]:
+    """Check a cut-out image. Returns an error message, or None if it has real transparency."""
     has_alpha = ("A" in img.getbands())
-    print(f"Verify: mode={img.mode}, bands={img.getbands()}, size={img.size}")
     if not has_alpha:
-        raise SystemExit("❌ Output has no alpha channel (not RGBA).")
+        return f"❌ {label}: output has no alpha channel (not RGBA)."
 
-    alpha = img.getchannel("A")
-    lo, hi = alpha.getextrema()
-    print(f"Verify: alpha extrema = ({lo}, {hi})")
+    lo, hi, transparent = _alpha_stats(img)
+    print(f"{label}: mode={img.mode}, size={img.size}, alpha extrema = ({lo}, {hi}), {transparent:.0%} transparent")
     if lo == 255 and hi == 255:
-        raise SystemExit("❌ Output alpha is fully opaque (no transparency detected).")
+        return f"❌ {label}: output alpha is fully opaque (no transparency detected)."
+    return None
+
+
+def _glob_base(pattern: str) -> Path:
+    """The leading part of a glob with no wildcards ("generated/**/*.png" -> "generated")."""
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+
+def _expand_inputs(patterns: List[str], output: Optional[str], output_dir: Optional[str]) -> List[Tuple[Path, Path]]:
+    """Resolve files, directories and globs into (input, output) pairs."""
+    if output:
+        if len(patterns) != 1 or not Path(patterns[0]).is_file():
+            raise SystemExit("--output only works with a single input file; use --output-dir for batches.")
+        return [(Path(patterns[0]), Path(output))]
+    if not output_dir:
+        raise SystemExit("Give --output for a single file or --output-dir for directories/globs.")
+
+    pairs = []
+    seen = set()
+    targets: Dict[Path, Path] = {}
+    out_root = Path(output_dir)
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            # Keep the directory structure below the input folder
+            matches = [(p, p.relative_to(path)) for p in sorted(path.rglob("*"))]
+        elif glob.has_magic(pattern):
+            # Keep the structure below the glob's fixed prefix, like a directory input
+            base = _glob_base(pattern)
+            matches = [(Path(p), Path(p).relative_to(base)) for p in sorted(glob.glob(pattern, recursive=True))]
+        elif path.is_file():
+            matches = [(path, Path(path.name))]
+        else:
+            raise SystemExit(f"Input not found: {pattern}")
+
+        for in_path, relative in matches:
+            if in_path.suffix.lower() not in IMAGE_EXTENSIONS or in_path in seen:
+                continue
+            seen.add(in_path)
+            out_path = (out_root / relative).with_suffix(".png")
+            if out_path in targets:
+                raise SystemExit(f"{targets[out_path]} and {in_path} would both be written to {out_path}; rename one or run them separately.")
+            targets[out_path] = in_path
+            pairs.append((in_path, out_path))
+    return pairs
+
+
+def _is_up_to_date(in_path: Path, out_path: Path) -> bool:
+    try:
+        return out_path.stat().st_mtime >= in_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+class _RembgSession:
+    """rembg session created on first use, so chroma-keyed batches never load the model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.load_seconds = 0.0
+        self._session = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            # A failed load (e.g. model download offline) fails every later image fast
+            if self._error is not None:
+                raise self._error
+            if self._session is None:
+                try:
+                    from rembg import new_session
+                except ImportError:
+                    raise SystemExit(
+                        "rembg is not installed.\n"
+                        "Install with:\n"
+                        "  py -3.13 -m pip install --user -r tools/requirements-rembg.txt\n"
+                        "(or use --engine chroma for solid-colour backgrounds)"
+                    )
+                start = time.perf_counter()
+                # One ONNX model load for the whole batch; onnxruntime sessions are safe to share across threads
+                try:
+                    self._session = new_session(self.model)
+                except Exception as e:
+                    self._error = RuntimeError(f"could not load rembg model '{self.model}': {e}")
+                    raise self._error
+                self.load_seconds = time.perf_counter() - start
+            return self._session
+
+
+def _cut_out(src, engine: str, rembg_session: _RembgSession, min_confidence: float, label: str):
+    """Run the selected engine. Returns (RGBA image, engine actually used)."""
+    if engine in ("auto", "chroma"):
+        keyed = chroma_key(src)
+        if engine == "chroma" or keyed.confidence >= min_confidence:
+            return keyed.image, "chroma"
+        print(f"{label}: chroma key confidence {keyed.confidence:.2f} < {min_confidence:.2f}, using rembg")
+
+    from rembg import remove
+
+    return remove(src, session=rembg_session.get()), "rembg"
+
+
+def _process(rembg_session: _RembgSession, in_path: Path, out_path: Path, verify: bool,
+             engine: str = "auto", min_confidence: float = MIN_CONFIDENCE) -> Tuple[Optional[str], Optional[str]]:
+    """Cut out one image. Returns (engine used, error message or None)."""
+    from PIL import Image
 
-    print("OK: Output has real transparency (alpha channel present and not fully opaque).")
+    try:
+        with Image.open(in_path) as src:
+            src.load()
+            result, used = _cut_out(src, engine, rembg_session, min_confidence, str(in_path))
+    except Exception as e:
+        return None, f"❌ {in_path}: {e}"
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f".{out_path.name}.part")
+    result.save(tmp_path, format="PNG")
+    os.replace(tmp_path, out_path)
+    print(f"OK: Wrote transparent PNG ({used}): {out_path}")
+
+    # Checked on the in-memory result; no need to re-open the file
+    return used, (_verify_alpha(result, label=str(out_path)) if verify else None)
 
 
 def main() -> None:
@@ -48,35 +198,51 @@ def main() -> None:
         # Don't hard-exit; user might have a working setup, but warn loudly.
 
     parser = argparse.ArgumentParser(description="Remove background using rembg and save RGBA PNG.")
-    parser.add_argument("--input", "-i", required=True, help="Input image path (png/jpg/webp).")
-    parser.add_argument("--output", "-o", required=True, help="Output PNG path.")
+    parser.add_argument("--input", "-i", required=True, action="append",
+                        help="Input image, directory or glob (png/jpg/webp). Repeat for several.")
+    parser.add_argument("--output", "-o", help="Output PNG path (single input file).")
+    parser.add_argument("--output-dir", help="Output folder for directories/globs (structure is kept).")
     parser.add_argument("--verify", action="store_true", help="Verify output has real transparency.")
     parser.add_argument("--model", default="u2net", help="rembg model name (default: u2net).")
+    parser.add_argument("--engine", choices=["auto", "chroma", "rembg"], default="auto",
+                        help="auto: chroma key, rembg only on low confidence (default); chroma; rembg.")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE,
+                        help=f"Chroma key confidence needed in auto mode (default: {MIN_CONFIDENCE}).")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Images processed in parallel with the shared model (default: up to 4).")
+    parser.add_argument("--force", action="store_true", help="Reprocess even if the output is newer than the input.")
     args = parser.parse_args()
 
-    in_path = Path(args.input)
-    out_path = Path(args.output)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    try:
-        from rembg import new_session, remove
-    except ImportError:
-        raise SystemExit(
-            "rembg is not installed.\n"
-            "Install with:\n"
-            "  py -3.13 -m pip install --user -r tools/requirements-rembg.txt"
-        )
-
-    data = in_path.read_bytes()
-    session = new_session(args.model)
-    out = remove(data, session=session)
-    out_path.write_bytes(out)
-    print(f"OK: Wrote transparent PNG: {out_path}")
-
+    pairs = _expand_inputs(args.input, args.output, args.output_dir)
+    todo = [(i, o) for i, o in pairs if args.force or not _is_up_to_date(i, o)]
+    skipped = len(pairs) - len(todo)
+    if skipped:
+        print(f"Skipping {skipped} up-to-date output(s) (use --force to redo)")
+    if not todo:
+        print("Nothing to do.")
+        return
+
+    session = _RembgSession(args.model)
+    if args.engine == "rembg":
+        session.get()
+
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(todo)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda pair: _process(session, pair[0], pair[1], args.verify, args.engine, args.min_confidence), todo
+        ))
+    errors = [error for _, error in results if error]
+
+    elapsed = time.perf_counter() - start
+    if len(pairs) > 1:
+        engines = ", ".join(f"{sum(1 for used, _ in results if used == name)} {name}" for name in ("chroma", "rembg"))
+        print(f"Processed {len(todo)} image(s) in {elapsed:.1f}s ({engines}; model load {session.load_seconds:.1f}s, {workers} worker(s))")
+    if errors:
+        raise SystemExit("\n".join(errors))
     if args.verify:
-        _verify_alpha(out_path)
+        print("OK: Output has real transparency (alpha channel present and not fully opaque).")
 
 
 if __name__ == "__main__":
     main()
-
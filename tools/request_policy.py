@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Rate limiting, retries and circuit breaking shared by every provider request.
+
+- TokenBucket: one per provider, refilled at PROVIDER_LIMITS requests_per_minute
+  with room for `burst` back-to-back starts. A Retry-After from the server
+  pauses the whole bucket, so every in-flight worker backs off, not just the
+  one that got the 429.
+- ConcurrencyLimit: one per provider, capping requests in flight at PROVIDER_LIMITS
+  concurrency across every thread and event loop. async_http holds a slot for
+  each attempt, so nested fan-out (stitched music segments inside scheduler
+  jobs) can't multiply it.
+- Retries: RateLimitError / TransientError (429, 408, 5xx, dropped connections)
+  are retried up to REQUEST_POLICY["max_attempts"] times with exponential
+  backoff and full jitter, never sooner than Retry-After.
+- CircuitBreaker: after `breaker_failures` consecutive retryable failures the
+  provider is open; requests fail fast with CircuitOpenError for
+  `breaker_cooldown_seconds`, then one trial request decides whether it closes.
+
+Async callers (async_http) use call_with_retry(); blocking SDK calls (google-genai)
+use call_with_retry_sync(). Both take a zero-argument callable that performs one
+attempt and raises a typed ProviderError on failure.
+
+Usage:
+    response = await call_with_retry("elevenlabs", attempt)
+    result = call_with_retry_sync("gemini", lambda: client.models.generate_content(...), classify=genai_error)
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import PROVIDER_LIMITS, REQUEST_POLICY
+from provider_errors import CircuitOpenError, ProviderError
+
+T = TypeVar("T")
+
+# Fallback for providers missing from PROVIDER_LIMITS
+DEFAULT_LIMITS = {"concurrency": 2, "requests_per_minute": 30}
+
+_registry_lock = threading.Lock()
+_buckets: Dict[str, "TokenBucket"] = {}
+_breakers: Dict[str, "CircuitBreaker"] = {}
+_limits: Dict[str, "ConcurrencyLimit"] = {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(retry: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff before retry number `retry` (1-based), at least Retry-After."""
+    ceiling = min(REQUEST_POLICY["backoff_max_seconds"], REQUEST_POLICY["backoff_base_seconds"] * 2 ** (retry - 1))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, REQUEST_POLICY["max_retry_after_seconds"]))
+    return delay
+
+
+class TokenBucket:
+    """Thread-safe token bucket; usable from threads (acquire) and event loops (acquire_async)."""
+
+    def __init__(self, requests_per_minute: Optional[float], burst: int = 1):
+        self.rate = requests_per_minute / 60.0 if requests_per_minute else 0.0
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token now; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            pause = max(0.0, self._paused_until - now)
+            if not self.rate:
+                return pause
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            debt = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(debt, pause)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds` (the server asked us to slow down)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ConcurrencyLimit:
+    """
+    Cap on requests in flight, shared by every thread and event loop.
+
+    An asyncio.Semaphore belongs to one loop and one caller; this one is
+    process-wide, so scheduler threads, the run_sync portal and per-track
+    fan-out all draw from the same slots.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self.in_flight = 0
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            waiters, self._waiters = self._waiters, []
+        # Wake every waiter to re-check, so a cancelled one can't swallow the freed slot
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass  # That loop has closed
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open (one trial) after the cooldown."""
+
+    def __init__(self, provider: str, failures: int = None, cooldown: float = None):
+        self.provider = provider
+        self.threshold = failures or REQUEST_POLICY["breaker_failures"]
+        self.cooldown = cooldown if cooldown is not None else REQUEST_POLICY["breaker_cooldown_seconds"]
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self._trial or time.monotonic() >= self._opened_at + self.cooldown else "open"
+
+    def before_request(self) -> bool:
+        """
+        Raise CircuitOpenError unless a request may go out now.
+
+        Returns:
+            True if this request is the half-open trial; the caller must end it with
+            record_success(), record_failure() or end_trial()
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(
+                    f"{self.provider}: circuit open after {self.failures} consecutive failures "
+                    f"(retry in {max(remaining, 0):.1f}s)",
+                    provider=self.provider,
+                    retry_after=max(remaining, 0.0),
+                )
+            self._trial = True
+            return True
+
+    def end_trial(self) -> None:
+        """
+        Free the trial slot if its request ended without an outcome being recorded.
+
+        Cancellation, non-provider exceptions and rejected requests with no status
+        say nothing about the provider's health; the circuit stays open and the next
+        request becomes the new trial.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"  [{self.provider}] circuit closed, provider is responding again")
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self._opened_at is None and self.failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                print(f"  [{self.provider}] circuit open after {self.failures} consecutive failures; "
+                      f"pausing requests for {self.cooldown:g}s")
+
+
+def provider_limits(provider: str) -> dict:
+    return {**DEFAULT_LIMITS, **PROVIDER_LIMITS.get(provider, {})}
+
+
+def get_bucket(provider: str) -> TokenBucket:
+    """The process-wide token bucket for `provider` (shared by every thread and loop)."""
+    with _registry_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            limits = provider_limits(provider)
+            bucket = TokenBucket(limits.get("requests_per_minute"), limits.get("burst", limits["concurrency"]))
+            _buckets[provider] = bucket
+        return bucket
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """The process-wide circuit breaker for `provider`."""
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def get_limit(provider: str) -> ConcurrencyLimit:
+    """The process-wide in-flight limit for `provider` (PROVIDER_LIMITS concurrency)."""
+    with _registry_lock:
+        limit = _limits.get(provider)
+        if limit is None:
+            limit = _limits[provider] = ConcurrencyLimit(provider_limits(provider)["concurrency"])
+        return limit
+
+
+def reset(provider: str = None) -> None:
+    """Forget buckets, breakers and limits (one provider, or all), e.g. after changing PROVIDER_LIMITS."""
+    with _registry_lock:
+        for registry in (_buckets, _breakers, _limits):
+            if provider is None:
+                registry.clear()
+            else:
+                registry.pop(provider, None)
+
+
+def _next_delay(provider: str, error: ProviderError, attempt: int, max_attempts: int) -> float:
+    """Record a failed attempt; return the delay before the next one, or re-raise if we're done."""
+    breaker = get_breaker(provider)
+    if not error.retryable:
+        # The provider answered; a rejected request says nothing about its health
+        if error.status is not None:
+            breaker.record_success()
+        raise error
+    breaker.record_failure()
+    if attempt >= max_attempts or breaker.state != "closed":
+        raise error
+    delay = backoff_delay(attempt, error.retry_after)
+    if error.retry_after is not None:
+        get_bucket(provider).pause(delay)
+    print(f"  [{provider}] {error} - retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+    return delay
+
+
+async def call_with_retry(provider: str, attempt: Callable[[], Awaitable[T]], max_attempts: int = None) -> T:
+    """
+    Run `attempt()` under the provider's token bucket, retry policy and circuit breaker.
+
+    Raises:
+        ProviderError: The last attempt's error, or CircuitOpenError while the provider is paused
+    """
+    max_attempts = max_attempts or REQUEST_POLICY["max_attempts"]
+    bucket, breaker = get_bucket(provider), get_breaker(provider)
+    for number in range(1, max_attempts + 1):
+        trial = breaker.before_request()
+        try:
+            await bucket.acquire_async()
+            try:
+                result = await attempt()
+            except ProviderError as e:
+                delay = _next_delay(provider, e, number, max_attempts)
+            else:
+                breaker.record_success()
+                return result
+        finally:
+            if trial:
+                breaker.end_trial()
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def call_with_retry_sync(
+    provider: str,
+    attempt: Callable[[], T],
+    classify: Callable[[Exception], Optional[ProviderError]] = None,
+    max_attempts: int = None,
+) -> T:
+    """
+    Blocking call_with_retry() for SDK calls that don't go through async_http.
+
+    `classify` maps SDK exceptions to typed ProviderErrors (None = not ours, re-raise as is).
+    """
+    max_attempts = max_attempts or REQUEST_POLICY["max_attempts"]
+    bucket, breaker = get_bucket(provider), get_breaker(provider)
+    for number in range(1, max_attempts + 1):
+        trial = breaker.before_request()
+        try:
+            bucket.acquire()
+            try:
+                result = attempt()
+            except ProviderError as e:
+                delay = _next_delay(provider, e, number, max_attempts)
+            except Exception as e:
+                error = classify(e) if classify else None
+                if error is None:
+                    raise
+                try:
+                    delay = _next_delay(provider, error, number, max_attempts)
+                except ProviderError:
+                    raise error from e
+            else:
+                breaker.record_success()
+                return result
+        finally:
+            if trial:
+                breaker.end_trial()
+        time.sleep(delay)
+    raise AssertionError("unreachable")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Downscale generated images to the size their asset type is displayed at.
+
+The image model returns ~1024px images whatever they are for; a 64px icon
+slot does not need them. Target sizes come from IMAGE_DEFAULTS (per asset
+type, with pixel_art_size for pixel-style sprites/tiles) unless a size is
+given. Images are fitted inside the target box keeping their aspect ratio
+and are never upscaled.
+
+- Pixel styles (pixel-art / 8-bit / 16-bit) use nearest-neighbour so pixels
+  stay hard-edged; everything else uses Lanczos.
+- --hidpi also writes name@2x.png at twice the target size for high-DPI
+  screens (skipped if the source is too small for it).
+
+Usage:
+    python tools/resize_images.py assets/sprites/spell-wizard --type sprite --style pixel-art
+    python tools/resize_images.py assets/ui/icons --type icon --hidpi
+    python tools/resize_images.py assets/backgrounds/forest.png --size 1280x720
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import IMAGE_DEFAULTS, IMAGE_OPTIMIZE
+from streaming import AtomicFile
+
+PIXEL_STYLES = set(IMAGE_OPTIMIZE["palette_sizes"])
+ASSET_TYPES = ["sprite", "background", "ui", "icon", "tileset"]
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    """'512x512' -> (512, 512)."""
+    try:
+        width, height = (int(part) for part in size.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid size '{size}' (expected WIDTHxHEIGHT, e.g. 512x512)")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid size '{size}' (must be positive)")
+    return width, height
+
+
+def target_size(asset_type: str = "sprite", style: Optional[str] = None, size: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Display size for an asset.
+
+    Args:
+        asset_type: One of ASSET_TYPES (see TYPE_MODIFIERS in generate_image.py)
+        style: Art style; pixel-style sprites and tiles use IMAGE_DEFAULTS["pixel_art_size"]
+        size: Explicit WIDTHxHEIGHT, overrides the defaults
+
+    Returns:
+        (width, height) box the image is fitted into
+    """
+    if size:
+        return parse_size(size)
+    if style in PIXEL_STYLES and asset_type in ("sprite", "tileset"):
+        return parse_size(IMAGE_DEFAULTS["pixel_art_size"])
+    if asset_type == "sprite":
+        return parse_size(IMAGE_DEFAULTS["game_sprite_size"])
+    return parse_size(IMAGE_DEFAULTS["type_sizes"].get(asset_type, IMAGE_DEFAULTS["size"]))
+
+
+def _fit(source: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size inside `box` with the source aspect ratio, never larger than the source."""
+    scale = min(box[0] / source[0], box[1] / source[1], 1.0)
+    return max(1, round(source[0] * scale)), max(1, round(source[1] * scale))
+
+
+def hidpi_path(path: str) -> str:
+    """assets/ui/star.png -> assets/ui/star@2x.png"""
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}@2x{p.suffix}"))
+
+
+def _resized(img, size: Tuple[int, int], pixel: bool):
+    from PIL import Image
+
+    if pixel:
+        return img.resize(size, Image.Resampling.NEAREST)
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        has_alpha = "transparency" in img.info or img.mode == "PA"
+        img = img.convert("RGBA" if has_alpha else "RGB")
+    # reducing_gap does a cheap box reduce first on big downscales; no visible difference at 3.0
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def _save(img, path: str, fmt: str) -> None:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    with AtomicFile(path) as f:
+        f.write(buffer.getvalue())
+
+
+def resize_image(
+    path: str,
+    asset_type: str = "sprite",
+    style: Optional[str] = None,
+    size: Optional[str] = None,
+    hidpi: bool = False,
+) -> List[str]:
+    """
+    Downscale an image in place to its target size.
+
+    Args:
+        path: Image to resize (overwritten)
+        asset_type: Asset type, selects the default target size
+        style: Art style; pixel styles use nearest-neighbour
+        size: Explicit WIDTHxHEIGHT target, overrides the type default
+        hidpi: Also write path@2x at twice the target size
+
+    Returns:
+        Paths of the files written (empty if the image was already small enough)
+    """
+    from PIL import Image
+
+    box = target_size(asset_type, style, size)
+    pixel = style in PIXEL_STYLES
+    written = []
+    with Image.open(path) as img:
+        img.load()
+    fmt = img.format or "PNG"
+
+    if hidpi:
+        box_2x = (box[0] * 2, box[1] * 2)
+        size_2x = _fit(img.size, box_2x)
+        if size_2x == _fit(img.size, box):
+            if not Path(hidpi_path(path)).exists():
+                print(f"  Note: {path} is {img.width}x{img.height}, too small for an @2x variant")
+        else:
+            # Often the 2x box is the source itself: copy without resampling
+            _save(img if size_2x == img.size else _resized(img, size_2x, pixel), hidpi_path(path), fmt)
+            written.append(hidpi_path(path))
+
+    new_size = _fit(img.size, box)
+    if new_size != img.size:
+        _save(_resized(img, new_size, pixel), path, fmt)
+        written.insert(0, path)
+    return written
+
+
+def main():
+    from optimize_images import find_pngs
+
+    parser = argparse.ArgumentParser(description="Downscale images to their asset type's display size")
+    parser.add_argument("paths", nargs="+", help="PNG files or directories (searched recursively)")
+    parser.add_argument("--type", "-t", dest="asset_type", choices=ASSET_TYPES, default="sprite", help="Asset type")
+    parser.add_argument("--style", "-s", help="Art style (pixel-art, 8-bit and 16-bit use nearest-neighbour)")
+    parser.add_argument("--size", help="Target box, e.g. 256x256 (default: from IMAGE_DEFAULTS for the type)")
+    parser.add_argument("--hidpi", action="store_true", help="Also write name@2x.png at twice the size")
+    args = parser.parse_args()
+
+    # Don't resize @2x variants again when re-running over a folder
+    paths = [p for p in find_pngs(args.paths) if not Path(p).stem.endswith("@2x")]
+    if not paths:
+        print("No PNG files found")
+        sys.exit(1)
+
+    box = target_size(args.asset_type, args.style, args.size)
+    print(f"Resizing {len(paths)} image(s) to fit {box[0]}x{box[1]}...")
+    changed = 0
+    for path in paths:
+        try:
+            written = resize_image(path, args.asset_type, args.style, args.size, args.hidpi)
+        except (OSError, ValueError) as e:
+            print(f"  Error ({path}): {e}")
+            continue
+        if written:
+            changed += 1
+            print(f"  Resized: {', '.join(written)}")
+    print(f"\n{changed} resized, {len(paths) - changed} already at or below target size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Streaming write helpers for provider downloads.
+
+AtomicFile writes to a hidden temp file next to the target and renames it
+into place on commit, so a crash or failed request never leaves a truncated
+asset behind. PredictionStreamDecoder pulls base64 audio out of a Vertex AI
+:predict JSON response chunk by chunk, decoding each "audioContent" /
+"bytesBase64Encoded" string straight into its own AtomicFile. Peak memory
+stays at one network chunk regardless of clip length or sample count.
+PredictionSpool instead spools the body to disk and records each clip's
+byte span, so batch mode can decode clips in parallel with decode_span().
+PcmWriter turns streamed 16-bit PCM into a .wav (or any soundfile format)
+as it arrives.
+"""
+from __future__ import annotations
+
+import base64
+import functools
+import os
+import io
+import re
+import struct
+import tempfile
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Network read size for streamed bodies
+CHUNK_SIZE = 64 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def _new_file_mode() -> int:
+    """
+    Permission bits a plain open() would give a new file under the current umask.
+
+    mkstemp creates 0600 files; committed files get this mode so the site can
+    serve them. Probed with a throwaway file rather than by toggling os.umask(),
+    which would briefly change it for every thread.
+    """
+    probe = os.path.join(tempfile.gettempdir(), f".mode-probe-{os.getpid()}-{uuid.uuid4().hex}")
+    os.close(os.open(probe, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+    try:
+        return os.stat(probe).st_mode & 0o777
+    finally:
+        os.unlink(probe)
+
+
+class AtomicFile:
+    """Write-then-rename file. The target only appears once commit() succeeds."""
+
+    def __init__(self, target: str):
+        self.target = Path(target)
+        self.target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.target.parent, prefix=f".{self.target.name}.", suffix=".part")
+        self.tmp_path = Path(tmp)
+        self._file = os.fdopen(fd, "wb")
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def reset(self) -> None:
+        """Throw away everything written so far (e.g. before retrying a download)."""
+        self._file.seek(0)
+        self._file.truncate()
+        self.bytes_written = 0
+
+    def patch(self, offset: int, data: bytes) -> None:
+        """Overwrite already-written bytes (e.g. a header whose sizes are only known at the end)."""
+        position = self._file.tell()
+        self._file.seek(offset)
+        self._file.write(data)
+        self._file.seek(position)
+
+    def commit(self, target: Optional[str] = None) -> str:
+        """Flush and move into place. `target` overrides the path given at creation."""
+        if target is not None:
+            self.target = Path(target)
+            self.target.parent.mkdir(parents=True, exist_ok=True)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if os.name == "posix":
+            os.chmod(self.tmp_path, _new_file_mode())
+        os.replace(self.tmp_path, self.target)
+        return str(self.target)
+
+    def discard(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            self.tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "AtomicFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None and not self._file.closed:
+            self.commit()
+        elif exc_type is not None:
+            self.discard()
+
+
+class Base64StreamDecoder:
+    """Decode base64 text incrementally, always in whole 4-character groups."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._pending = b""
+
+    def feed(self, text: bytes) -> None:
+        # JSON may escape "/" as "\/"; base64 itself never contains a backslash
+        data = self._pending + text.replace(b"\\", b"")
+        usable = len(data) - (len(data) % 4)
+        if usable:
+            self.sink.write(base64.b64decode(data[:usable]))
+        self._pending = data[usable:]
+
+    def close(self) -> None:
+        if self._pending:
+            padded = self._pending + b"=" * (-len(self._pending) % 4)
+            self.sink.write(base64.b64decode(padded))
+            self._pending = b""
+
+
+class PredictionScanner:
+    """
+    Incrementally locate base64 audio strings in a Vertex :predict JSON body.
+
+    Subclasses receive clip_start(offset), clip_data(data) and clip_end(offset)
+    callbacks with absolute byte offsets into the body. Everything outside the
+    audio strings is kept (up to HEAD_LIMIT) in `head` for error messages.
+    """
+
+    AUDIO_KEY = re.compile(rb'"(?:audioContent|bytesBase64Encoded)"\s*:\s*"')
+    # Longest possible partial key match we must carry between chunks
+    CARRY = 64
+    # Non-audio JSON kept for error messages
+    HEAD_LIMIT = 4096
+
+    def __init__(self):
+        self.head = b""
+        self.clip_count = 0
+        self._buffer = b""
+        self._total = 0
+        self._in_clip = False
+
+    def feed(self, chunk: bytes) -> None:
+        offset = self._total - len(self._buffer)
+        self._total += len(chunk)
+        data = self._buffer + chunk
+        self._buffer = b""
+        while data:
+            if self._in_clip:
+                end = data.find(b'"')
+                if end == -1:
+                    self.clip_data(data)
+                    return
+                self.clip_data(data[:end])
+                self.clip_end(offset + end)
+                self._in_clip = False
+                data = data[end + 1:]
+                offset += end + 1
+                continue
+
+            match = self.AUDIO_KEY.search(data)
+            if match is None:
+                # Keep a tail in case the key straddles the chunk boundary
+                self._keep_head(data[:-self.CARRY])
+                self._buffer = data[-self.CARRY:]
+                return
+            self._keep_head(data[:match.end()])
+            self._in_clip = True
+            self.clip_start(offset + match.end())
+            self.clip_count += 1
+            data = data[match.end():]
+            offset += match.end()
+
+    def _keep_head(self, text: bytes) -> None:
+        if len(self.head) < self.HEAD_LIMIT:
+            self.head = (self.head + text)[:self.HEAD_LIMIT]
+
+    def check_complete(self) -> None:
+        """Raise ValueError if the body ended inside an audio payload."""
+        if self._in_clip:
+            raise ValueError("Response ended inside an audio payload")
+        self._keep_head(self._buffer)
+
+    def clip_start(self, offset: int) -> None:
+        pass
+
+    def clip_data(self, data: bytes) -> None:
+        pass
+
+    def clip_end(self, offset: int) -> None:
+        pass
+
+
+class PredictionStreamDecoder(PredictionScanner):
+    """
+    Decode each audio clip into its own AtomicFile (in `output_dir`) as bytes arrive.
+
+    Call finish() and then commit the returned files to their final names
+    once the clip count is known.
+    """
+
+    def __init__(self, output_dir: str, name: str = "clip"):
+        super().__init__()
+        self.output_dir = output_dir
+        self.name = name
+        self.clips: List[AtomicFile] = []
+        self._decoder: Optional[Base64StreamDecoder] = None
+
+    def clip_start(self, offset: int) -> None:
+        clip = AtomicFile(os.path.join(self.output_dir, f"{self.name}_{len(self.clips)}"))
+        self.clips.append(clip)
+        self._decoder = Base64StreamDecoder(clip)
+
+    def clip_data(self, data: bytes) -> None:
+        self._decoder.feed(data)
+
+    def clip_end(self, offset: int) -> None:
+        self._decoder.close()
+        self._decoder = None
+
+    def finish(self) -> List[AtomicFile]:
+        """Return the decoded clips (uncommitted). Raises ValueError on a truncated body."""
+        try:
+            self.check_complete()
+        except ValueError:
+            self.discard()
+            raise
+        return self.clips
+
+    def discard(self) -> None:
+        for clip in self.clips:
+            clip.discard()
+        self.clips = []
+
+
+class PredictionSpool(PredictionScanner):
+    """
+    Spool a :predict body to a temp file and record where each clip's base64 lives.
+
+    Decoding is deferred so the clips can be decoded and written in parallel
+    with decode_span(); memory stays flat because nothing is held in RAM.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        super().__init__()
+        fd, path = tempfile.mkstemp(dir=spool_dir, prefix=".predict.", suffix=".json")
+        self.path = path
+        self._file = os.fdopen(fd, "wb")
+        self.spans: List[Tuple[int, int]] = []
+        self._start = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        super().feed(chunk)
+
+    def clip_start(self, offset: int) -> None:
+        self._start = offset
+
+    def clip_end(self, offset: int) -> None:
+        self.spans.append((self._start, offset))
+
+    def finish(self) -> List[Tuple[int, int]]:
+        """Close the spool and return (start, end) byte spans, one per clip."""
+        self._file.close()
+        self.check_complete()
+        return self.spans
+
+    def cleanup(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def decode_span(spool_path: str, start: int, end: int, output_path: str) -> int:
+    """Base64-decode bytes [start, end) of a spool file into output_path. Returns bytes written."""
+    with AtomicFile(output_path) as target:
+        decoder = Base64StreamDecoder(target)
+        with open(spool_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = f.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    raise ValueError(f"Spool truncated at byte {end - remaining}")
+                decoder.feed(data)
+                remaining -= len(data)
+        decoder.close()
+    return target.bytes_written
+
+
+def wav_header(frames: int, rate: int, channels: int = 1) -> bytes:
+    """44-byte header for 16-bit PCM WAV data."""
+    data_bytes = frames * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, channels, rate,
+        rate * channels * 2, channels * 2, 16, b"data", data_bytes,
+    )
+
+
+def require_encoder(path: str) -> None:
+    """
+    Raise ConfigurationError if PcmWriter needs soundfile for `path` and it isn't installed.
+
+    .wav is written directly; every other extension is encoded by soundfile
+    (tools/requirements-audio.txt). Batch callers check before sending any
+    request, so a missing optional dependency fails fast with a normal error.
+    """
+    if Path(path).suffix.lower() == ".wav":
+        return
+    try:
+        import soundfile  # noqa: F401
+    except ImportError:
+        from provider_errors import ConfigurationError
+        raise ConfigurationError(
+            f"soundfile is not installed (needed to write {Path(path).suffix} audio). "
+            "Run: pip install -r tools/requirements-audio.txt"
+        )
+
+
+class PcmWriter:
+    """
+    Write 16-bit little-endian PCM chunks into an audio file as they arrive.
+
+    .wav goes straight to disk and the header sizes are patched on commit, so
+    the total length doesn't need to be known up front. Other extensions go
+    through soundfile's encoder (tools/process_audio.py), which only buffers
+    the compressed bytes. Chunks may split a sample; the remainder is carried.
+    """
+
+    def __init__(self, target: str, rate: int, channels: int = 1):
+        self.target = AtomicFile(target)
+        self.rate = rate
+        self.channels = channels
+        self.frames = 0
+        self._carry = b""
+        self._encoder = None
+        if self.target.target.suffix.lower() == ".wav":
+            self.target.write(wav_header(0, rate, channels))
+        else:
+            require_encoder(target)
+            from process_audio import encoder_params, load_soundfile
+            self._buffer = io.BytesIO()
+            params = encoder_params(self.target.target)
+            self._encoder = load_soundfile().SoundFile(self._buffer, "w", rate, channels, **params)
+
+    def write(self, data: bytes) -> None:
+        frame_bytes = 2 * self.channels
+        data = self._carry + data
+        usable = len(data) - len(data) % frame_bytes
+        self._carry = data[usable:]
+        if not usable:
+            return
+        self.frames += usable // frame_bytes
+        if self._encoder is None:
+            self.target.write(data[:usable])
+        else:
+            import numpy as np
+            self._encoder.write(np.frombuffer(data[:usable], dtype="<i2").reshape(-1, self.channels))
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.rate
+
+    def commit(self) -> str:
+        """Finish the file and move it into place. Returns the path."""
+        if self._encoder is not None:
+            self._encoder.close()
+            self.target.write(self._buffer.getvalue())
+        else:
+            self.target.patch(0, wav_header(self.frames, self.rate, self.channels))
+        return self.target.commit()
+
+    def discard(self) -> None:
+        if self._encoder is not None and not self._encoder.closed:
+            self._encoder.close()
+        self.target.discard()